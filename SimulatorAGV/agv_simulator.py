@@ -3,18 +3,54 @@ import time
 from datetime import datetime
 from typing import Optional, Dict, Any
 import random
+from itertools import chain
 
-from vda5050.state import State, AgvPosition, ActionState
+from vda5050.state import State, AgvPosition, ActionState, NodeState, EdgeState
 from vda5050.connection import Connection
 from vda5050.visualization import Visualization
 from vda5050.order import Order
 from vda5050.instant_actions import InstantActions
-from utils import get_timestamp, get_distance
+from utils import get_timestamp
+from utils_numba import step_toward
 from shared import setup_logger
 
 logger = setup_logger()
 
 
+def _make_node_state(node) -> NodeState:
+    """根据订单节点创建节点状态"""
+    position = node.node_position
+    if position and not isinstance(position, AgvPosition):
+        position = AgvPosition(
+            x=position.x,
+            y=position.y,
+            theta=position.theta,
+            map_id=position.map_id
+        )
+    return NodeState(
+        node_id=node.node_id,
+        sequence_id=node.sequence_id,
+        node_description=node.node_description,
+        released=node.released,
+        node_position=position
+    )
+
+
+def _make_edge_state(edge) -> EdgeState:
+    """根据订单边创建边状态"""
+    return EdgeState(
+        edge_id=edge.edge_id,
+        sequence_id=edge.sequence_id,
+        edge_description=edge.edge_description,
+        released=edge.released
+    )
+
+
+def _make_action_state(action) -> ActionState:
+    """根据订单动作创建动作状态"""
+    return ActionState(action_id=action.action_id, action_type=action.action_type)
+
+
 class AgvSimulator:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
@@ -28,6 +64,8 @@ class AgvSimulator:
         # 初始化VDA5050消息对象
         self.connection = self._create_initial_connection()
         self.state = self._create_initial_state()
+        # 状态消息中不变字段的JSON前缀（去掉结尾的 "}"），只序列化一次
+        self._state_prefix = json.dumps(self.state.to_static_dict(), separators=(',', ':'))[:-1]
         self.visualization = self._create_initial_visualization()
         
         # 当前订单和即时动作
@@ -36,6 +74,10 @@ class AgvSimulator:
         
         # 动作执行状态
         self.action_start_time: Optional[float] = None
+        
+        # 最近一次序列化结果缓存: (缓存键, JSON字符串)
+        self._connection_cache: tuple = (None, None)
+        self._visualization_cache: tuple = (None, None)
 
     def _generate_base_topic(self) -> str:
         """生成基础MQTT主题"""
@@ -135,21 +177,17 @@ class AgvSimulator:
         """处理位置初始化动作"""
         logger.info(f"执行位置初始化动作: {action.action_id}")
         
-        # 提取参数
-        x, y, theta, map_id, last_node_id = 0.0, 0.0, 0.0, "", ""
-        
-        if action.action_parameters:
-            for param in action.action_parameters:
-                if param.key == "x":
-                    x = float(param.value) if isinstance(param.value, str) else param.value
-                elif param.key == "y":
-                    y = float(param.value) if isinstance(param.value, str) else param.value
-                elif param.key == "theta":
-                    theta = float(param.value) if isinstance(param.value, str) else param.value
-                elif param.key == "mapId":
-                    map_id = str(param.value)
-                elif param.key == "lastNodeId":
-                    last_node_id = str(param.value)
+        # 提取参数（float() 可同时处理字符串与数值，缺失或为 null 的参数按 0 处理）
+        params = {param.key: param.value for param in (action.action_parameters or ())}
+        try:
+            x = float(params.get("x") or 0.0)
+            y = float(params.get("y") or 0.0)
+            theta = float(params.get("theta") or 0.0)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"位置初始化动作 {action.action_id} 的坐标参数无效，忽略该动作: {e}")
+            return
+        map_id = str(params.get("mapId", ""))
+        last_node_id = str(params.get("lastNodeId", ""))
         
         # 更新位置
         if not self.state.agv_position:
@@ -170,42 +208,29 @@ class AgvSimulator:
     def _process_order(self):
         """处理订单"""
         # 简单模拟：更新车辆位置向第一个节点移动
-        if self.state.node_states and self.state.agv_position and self.state.agv_position.position_initialized:
+        position = self.state.agv_position
+        if self.state.node_states and position and position.position_initialized:
             target_node = self.state.node_states[0]
-            if target_node.node_position:
-                # 计算距离
-                distance = get_distance(
-                    self.state.agv_position.x,
-                    self.state.agv_position.y,
-                    target_node.node_position.x,
-                    target_node.node_position.y
+            target = target_node.node_position
+            if target:
+                nx, ny, arrived, driving = step_toward(
+                    position.x, position.y, target.x, target.y,
+                    self.config['settings']['speed']
                 )
                 
                 # 如果距离很近，认为已到达节点
-                if distance < 0.1:
+                if arrived:
                     self.state.last_node_id = target_node.node_id
                     self.state.last_node_sequence_id = target_node.sequence_id
                     logger.info(f"到达节点: {target_node.node_id}")
                 else:
                     # 向目标节点移动
-                    speed = self.config['settings']['speed']
-                    direction_x = target_node.node_position.x - self.state.agv_position.x
-                    direction_y = target_node.node_position.y - self.state.agv_position.y
+                    position.x = nx
+                    position.y = ny
+                    self.state.driving = bool(driving)
                     
-                    # 归一化方向向量
-                    length = (direction_x ** 2 + direction_y ** 2) ** 0.5
-                    if length > 0:
-                        direction_x /= length
-                        direction_y /= length
-                        
-                        # 更新位置
-                        self.state.agv_position.x += direction_x * speed
-                        self.state.agv_position.y += direction_y * speed
-                        self.state.driving = True
-                        
-                        logger.debug(f"向节点 {target_node.node_id} 移动: ({self.state.agv_position.x:.2f}, {self.state.agv_position.y:.2f})")
-                    else:
-                        self.state.driving = False
+                    if driving:
+                        logger.debug(f"向节点 {target_node.node_id} 移动: ({nx:.2f}, {ny:.2f})")
 
     def accept_order(self, order: Order):
         """接受订单"""
@@ -216,43 +241,16 @@ class AgvSimulator:
         self.state.order_id = order.order_id
         self.state.order_update_id = order.order_update_id
         
-        # 清除之前的状态
-        self.state.node_states.clear()
-        self.state.edge_states.clear()
-        self.state.action_states.clear()
-        
-        # 处理节点
-        for node in order.nodes:
-            from vda5050.state import NodeState
-            node_state = NodeState(node_id=node.node_id, sequence_id=node.sequence_id)
-            node_state.released = node.released
-            node_state.node_description = node.node_description
-            if node.node_position:
-                node_state.node_position = AgvPosition(
-                    x=node.node_position.x,
-                    y=node.node_position.y,
-                    map_id=node.node_position.map_id
-                )
-                node_state.node_position.theta = node.node_position.theta
-            self.state.node_states.append(node_state)
-            
-            # 添加动作状态
-            for action in node.actions:
-                action_state = ActionState(action_id=action.action_id, action_type=action.action_type)
-                self.state.action_states.append(action_state)
-        
-        # 处理边
-        for edge in order.edges:
-            from vda5050.state import EdgeState
-            edge_state = EdgeState(edge_id=edge.edge_id, sequence_id=edge.sequence_id)
-            edge_state.released = edge.released
-            edge_state.edge_description = edge.edge_description
-            self.state.edge_states.append(edge_state)
-            
-            # 添加动作状态
-            for action in edge.actions:
-                action_state = ActionState(action_id=action.action_id, action_type=action.action_type)
-                self.state.action_states.append(action_state)
+        # 一次性重建节点、边和动作状态列表（动作顺序：先节点动作，后边动作）
+        self.state.node_states = [_make_node_state(node) for node in order.nodes]
+        self.state.edge_states = [_make_edge_state(edge) for edge in order.edges]
+        self.state.action_states = [
+            _make_action_state(action)
+            for action in chain(
+                chain.from_iterable(node.actions for node in order.nodes),
+                chain.from_iterable(edge.actions for edge in order.edges)
+            )
+        ]
 
     def accept_instant_actions(self, instant_actions: InstantActions):
         """接受即时动作"""
@@ -266,16 +264,32 @@ class AgvSimulator:
             self.state.action_states.append(action_state)
 
     def get_connection_message(self) -> str:
-        """获取连接消息"""
-        return json.dumps(self.connection.to_dict())
+        """获取连接消息（header_id 未变化时复用上次序列化结果）"""
+        header_id = self.connection.header_id
+        cached_key, message = self._connection_cache
+        if cached_key != header_id:
+            message = json.dumps(self.connection.to_dict())
+            self._connection_cache = (header_id, message)
+        return message
 
     def get_state_message(self) -> str:
-        """获取状态消息"""
-        return self.state.to_json()
+        """获取状态消息（不变字段使用预先序列化的前缀，仅序列化变化字段）"""
+        dynamic = json.dumps(self.state.to_dynamic_dict(), separators=(',', ':'))
+        return f"{self._state_prefix},{dynamic[1:]}"
 
     def get_visualization_message(self) -> str:
-        """获取可视化消息"""
-        return json.dumps(self.visualization.to_dict())
+        """获取可视化消息（header_id 与位置未变化时复用上次序列化结果）"""
+        # 位置会在不递增 header_id 的情况下被直接修改，因此一并纳入缓存键
+        position = self.visualization.agv_position
+        position_key = (
+            position.x, position.y, position.theta, position.map_id, position.position_initialized
+        ) if position else None
+        key = (self.visualization.header_id, self.visualization.timestamp, position_key)
+        cached_key, message = self._visualization_cache
+        if cached_key != key:
+            message = json.dumps(self.visualization.to_dict())
+            self._visualization_cache = (key, message)
+        return message
 
     def set_connection_state(self, state: str):
         """设置连接状态"""
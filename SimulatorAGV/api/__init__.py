@@ -16,6 +16,8 @@ def register_all_routes(instance_manager):
     register_order_routes(instance_manager)
     register_system_routes(instance_manager)
     register_map_routes(instance_manager)
+    # 全部路由注册完成后预先构建路由匹配结构
+    get_api_server().get_registry().finalize()
 
 
 __all__ = [
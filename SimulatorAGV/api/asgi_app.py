@@ -0,0 +1,247 @@
+"""
+API注册表的ASGI适配
+将 APIRegistry 中的路由以ASGI应用的形式提供，由 uvicorn 等ASGI服务器承载，
+HTTP解析和连接管理在C实现的解析器与事件循环中完成，处理器本身仍在线程池中同步执行
+"""
+
+import asyncio
+import functools
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .registry import (
+    APIRegistry, JSONListStream, RawJSON, RawResponse, _LazyQueryParams, _dumps_bytes, _encode_body,
+    _etag_matches, _iter_encoded, _loads_bytes, _make_etag, _negotiate_encoding, logger
+)
+
+class _StreamAborted(Exception):
+    """流式响应在响应头发出后失败，需由ASGI服务器中断连接，不能再发送错误响应"""
+
+
+# CORS响应头
+_CORS_HEADERS: List[Tuple[bytes, bytes]] = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-methods', b'GET, POST, PUT, DELETE, OPTIONS'),
+    (b'access-control-allow-headers', b'Content-Type, Authorization'),
+]
+
+
+def create_asgi_app(registry: APIRegistry):
+    """
+    创建分发到指定注册表的ASGI应用
+
+    Args:
+        registry: API路由注册表
+
+    Returns:
+        ASGI应用可调用对象
+    """
+
+    async def app(scope: Dict[str, Any], receive, send):
+        if scope['type'] == 'lifespan':
+            await _handle_lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        method = scope['method']
+        if method == 'OPTIONS':
+            await _send(send, 200, b'', content_type=None)
+            return
+
+        query = scope.get('query_string', b'').decode('latin-1')
+        query_params = _LazyQueryParams(query) if query else {}
+        pretty = 'pretty=' in query and query_params.get('pretty', ['0'])[0] == '1'
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        accept_encoding = headers.get('accept-encoding')
+        encoding = _negotiate_encoding(accept_encoding) if accept_encoding else None
+        if_none_match = headers.get('if-none-match')
+
+        try:
+            path = scope['path']
+            route_match = registry.find_route(method, path)
+            if not route_match:
+                await _send_error(send, 404, "API endpoint not found", pretty)
+                return
+
+            route, path_params = route_match
+            if route.const_bytes is not None and not pretty:
+                payload, content_encoding = _encode_body(route.const_bytes, encoding)
+                await _send(send, 200, payload, content_encoding=content_encoding,
+                            etag=route.const_etag, if_none_match=if_none_match)
+                return
+
+            cache_key = f"{path}?{query}" if query else path
+            if not pretty:
+                cached = registry.get_cached_response(route, method, cache_key, encoding)
+                if cached is not None:
+                    await _send(send, 200, cached[0], content_encoding=cached[1],
+                                etag=cached[2], if_none_match=if_none_match)
+                    return
+
+            request_data = {
+                'method': method,
+                'path': path,
+                'path_params': path_params,
+                'query_params': query_params,
+                'headers': headers
+            }
+
+            if method in ('POST', 'PUT'):
+                body = await _read_body(receive)
+                if body:
+                    try:
+                        request_data['body'] = _loads_bytes(body)
+                    except ValueError:
+                        request_data['body'] = body.decode('utf-8', errors='replace')
+
+            # 处理器可能访问锁和文件，放到线程池中执行，避免阻塞事件循环
+            loop = asyncio.get_running_loop()
+            failure = None
+            try:
+                response = await loop.run_in_executor(
+                    None, functools.partial(route.handler, request_data, **path_params)
+                )
+            except Exception as e:
+                logger.error("API处理器执行失败: %s", e)
+                failure = f"Internal server error: {str(e)}"
+
+            if failure is not None:
+                # 处理器抛出异常时返回最近一次成功的缓存响应
+                stale = None if pretty else registry.get_stale_response(route, method, cache_key, encoding)
+                if stale is not None:
+                    await _send(send, 200, stale[0], content_encoding=stale[1], cache_status=b'stale',
+                                etag=stale[2], if_none_match=if_none_match)
+                    return
+                await _send_error(send, 500, failure, pretty)
+                return
+
+            registry.invalidate_responses(method, path, response)
+            if isinstance(response, JSONListStream) and not pretty:
+                await _send_stream(send, response, encoding, if_none_match)
+                return
+
+            content_type = b'application/json; charset=utf-8'
+            try:
+                payload = None if pretty else registry.cache_response(route, method, cache_key, response, encoding)
+                if payload is None and isinstance(response, RawJSON) and not pretty:
+                    payload = _encode_body(response.payload, encoding) + (response.etag,)
+                elif payload is None and isinstance(response, RawResponse):
+                    content_type = response.content_type.encode('latin-1')
+                    etag = _make_etag(response.body) if method == 'GET' else None
+                    payload = _encode_body(response.body, encoding) + (etag,)
+                elif payload is None:
+                    body = _dumps_bytes(response, pretty)
+                    etag = _make_etag(body) if method == 'GET' else None
+                    payload = _encode_body(body, encoding) + (etag,)
+            except Exception as e:
+                logger.error("发送JSON响应失败: %s", e)
+                await _send_error(send, 500, "Failed to serialize response", pretty)
+                return
+            await _send(send, 200, payload[0], content_type=content_type, content_encoding=payload[1],
+                        etag=payload[2], if_none_match=if_none_match)
+
+        except _StreamAborted:
+            raise
+        except Exception as e:
+            logger.error("处理API请求失败: %s", e)
+            await _send_error(send, 500, "Internal server error", pretty)
+
+    return app
+
+
+async def _handle_lifespan(receive, send):
+    """响应ASGI生命周期事件"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def _read_body(receive) -> bytes:
+    """读取完整的请求体"""
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        more_body = message.get('more_body', False)
+    return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+
+async def _send(send, status_code: int, payload: bytes,
+                content_type: Any = b'application/json; charset=utf-8',
+                content_encoding: Optional[str] = None, cache_status: Optional[bytes] = None,
+                etag: Optional[str] = None, if_none_match: Optional[str] = None):
+    """发送完整响应；提供 etag 且与 If-None-Match 匹配时改为发送不带响应体的 304"""
+    headers = list(_CORS_HEADERS)
+    if etag:
+        headers.append((b'etag', etag.encode('latin-1')))
+        headers.append((b'cache-control', b'no-cache'))
+        if status_code == 200 and _etag_matches(if_none_match, etag):
+            headers.append((b'vary', b'Accept-Encoding'))
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+    if content_type:
+        headers.append((b'content-type', content_type))
+        headers.append((b'vary', b'Accept-Encoding'))
+    if content_encoding:
+        headers.append((b'content-encoding', content_encoding.encode('latin-1')))
+    if cache_status:
+        headers.append((b'x-cache', cache_status))
+    headers.append((b'content-length', str(len(payload)).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status_code, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def _send_stream(send, stream: JSONListStream, encoding: Optional[str] = None,
+                       if_none_match: Optional[str] = None):
+    """
+    逐块发送流式JSON响应（服务器自动使用分块传输编码）
+    带有ETag且与 If-None-Match 匹配时改为发送不带响应体的 304；
+    生成过程中出错时不发送结束消息而是抛出异常，由服务器中断连接，
+    客户端不会把截断的JSON当作完整响应
+    """
+    headers = list(_CORS_HEADERS)
+    if stream.etag:
+        headers.append((b'etag', stream.etag.encode('latin-1')))
+        headers.append((b'cache-control', b'no-cache'))
+        if _etag_matches(if_none_match, stream.etag):
+            headers.append((b'vary', b'Accept-Encoding'))
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+    headers.append((b'content-type', b'application/json; charset=utf-8'))
+    headers.append((b'vary', b'Accept-Encoding'))
+    if encoding:
+        headers.append((b'content-encoding', encoding.encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    loop = asyncio.get_running_loop()
+    chunks = _iter_encoded(stream.iter_chunks(), encoding)
+    try:
+        # 列表元素的生成可能访问锁，同样放到线程池中执行
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    except Exception as e:
+        # 响应头已发出，只能中断连接
+        logger.error("流式发送JSON响应失败: %s", e)
+        raise _StreamAborted(str(e)) from e
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _send_error(send, status_code: int, message: str, pretty: bool = False):
+    """发送错误响应"""
+    error_data = {
+        "error": True,
+        "status_code": status_code,
+        "message": message,
+        "timestamp": datetime.now().isoformat()
+    }
+    await _send(send, status_code, _dumps_bytes(error_data, pretty))
@@ -20,7 +20,7 @@ import sys
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from shared import setup_logger
+from shared import setup_logger, to_json_bytes
 
 logger = setup_logger()
 
@@ -217,8 +217,8 @@ class APIRequestHandler(BaseHTTPRequestHandler):
     def _send_json_response(self, data: Any, status_code: int = 200):
         """发送JSON响应"""
         try:
-            json_data = json.dumps(safe_json_serialize(data), ensure_ascii=False, indent=2)
-            json_bytes = json_data.encode('utf-8')
+            # 编码器在遍历中直接转换无法编码的对象，不再预先遍历整个结果
+            json_bytes = to_json_bytes(data, indent=2)
             
             self.send_response(status_code)
             self._send_cors_headers()
@@ -241,8 +241,7 @@ class APIRequestHandler(BaseHTTPRequestHandler):
                 "status": status_code,
                 "timestamp": datetime.now().isoformat()
             }
-            json_data = json.dumps(error_data, ensure_ascii=False, indent=2)
-            json_bytes = json_data.encode('utf-8')
+            json_bytes = to_json_bytes(error_data, indent=2)
             
             self.send_response(status_code)
             self._send_cors_headers()
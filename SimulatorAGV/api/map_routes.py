@@ -4,13 +4,24 @@
 
 import json
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 from .registry import get_api_server
-from shared import setup_logger
+from shared import setup_logger, from_json_bytes
 
 logger = setup_logger()
 
+# 地图文件目录及扩展名
+_MAP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "map_flie")
+_SCENE_SUFFIX = ".scene"
+
+# 地图目录列表缓存 (目录 mtime_ns, 响应数据)，目录 mtime 未变化时直接复用上次结果
+# 以单个元组整体替换，保证多线程处理请求时两者始终配对
+_maps_cache: Tuple[int, Optional[Dict[str, Any]]] = (-1, None)
+
+# 地图站点解析结果缓存: 文件路径 -> (文件 mtime_ns, 响应数据)
+_station_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
 
 def register_map_routes(instance_manager):
     """注册地图相关的API路由"""
@@ -22,56 +33,63 @@ def register_map_routes(instance_manager):
     def get_map_files(request: Dict[str, Any]) -> Dict[str, Any]:
         """获取map_flie目录下的所有地图文件"""
         try:
-            # 获取map_flie目录路径
-            current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            map_dir = os.path.join(current_dir, "map_flie")
-            
-            if not os.path.exists(map_dir):
+            global _maps_cache
+            try:
+                st = os.stat(_MAP_DIR)
+            except FileNotFoundError:
                 return {"error": "地图目录不存在"}
+            cached_mtime_ns, cached_payload = _maps_cache
+            if st.st_mtime_ns == cached_mtime_ns:
+                return cached_payload
             
-            # 获取所有.scene文件
+            # 获取所有.scene文件（scandir 的 DirEntry 自带 stat 结果）
             map_files = []
-            for file in os.listdir(map_dir):
-                if file.endswith('.scene'):
-                    file_path = os.path.join(map_dir, file)
-                    file_name = os.path.splitext(file)[0]  # 去掉扩展名
-                    
-                    # 获取文件信息
-                    stat = os.stat(file_path)
-                    map_files.append({
-                        "id": file_name,
-                        "name": file_name,
-                        "filename": file,
-                        "size": stat.st_size,
-                        "modified": stat.st_mtime
-                    })
+            suffix_len = len(_SCENE_SUFFIX)
+            with os.scandir(_MAP_DIR) as entries:
+                for entry in entries:
+                    if entry.name.endswith(_SCENE_SUFFIX):
+                        file_name = entry.name[:-suffix_len]  # 去掉扩展名
+                        
+                        # 获取文件信息
+                        stat = entry.stat()
+                        map_files.append({
+                            "id": file_name,
+                            "name": file_name,
+                            "filename": entry.name,
+                            "size": stat.st_size,
+                            "modified": stat.st_mtime
+                        })
             
-            return {
+            payload = {
                 "success": True,
                 "maps": map_files,
                 "total": len(map_files)
             }
+            _maps_cache = (st.st_mtime_ns, payload)
+            return payload
             
         except Exception as e:
-            logger.error(f"获取地图文件列表失败: {e}")
+            logger.error("获取地图文件列表失败: %s", e)
             return {"error": str(e)}
     
     @registry.get("/api/maps/{map_id}/stations", "获取指定地图的所有站点")
-    def get_map_stations(request: Dict[str, Any]) -> Dict[str, Any]:
+    def get_map_stations(request: Dict[str, Any], map_id: str) -> Dict[str, Any]:
         """获取指定地图文件的所有站点信息"""
         try:
-            map_id = request["path_params"]["map_id"]
-            
-            # 获取map_flie目录路径
-            current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            map_file_path = os.path.join(current_dir, "map_flie", f"{map_id}.scene")
+            map_file_path = os.path.join(_MAP_DIR, f"{map_id}{_SCENE_SUFFIX}")
             
-            if not os.path.exists(map_file_path):
+            try:
+                st = os.stat(map_file_path)
+            except FileNotFoundError:
                 return {"error": f"地图文件 {map_id}.scene 不存在"}
             
+            cached = _station_cache.get(map_file_path)
+            if cached and cached[0] == st.st_mtime_ns:
+                return cached[1]
+            
             # 读取并解析地图文件
-            with open(map_file_path, 'r', encoding='utf-8') as f:
-                map_data = json.load(f)
+            with open(map_file_path, 'rb') as f:
+                map_data = from_json_bytes(f.read())
             
             # 提取站点信息
             stations = []
@@ -86,18 +104,20 @@ def register_map_routes(instance_manager):
                             "type": point.get('type', 0)
                         })
             
-            return {
+            result = {
                 "success": True,
                 "map_id": map_id,
                 "stations": stations,
                 "total": len(stations)
             }
+            _station_cache[map_file_path] = (st.st_mtime_ns, result)
+            return result
             
         except json.JSONDecodeError as e:
-            logger.error(f"解析地图文件失败: {e}")
+            logger.error("解析地图文件失败: %s", e)
             return {"error": f"地图文件格式错误: {str(e)}"}
         except Exception as e:
-            logger.error(f"获取地图站点失败: {e}")
+            logger.error("获取地图站点失败: %s", e)
             return {"error": str(e)}
     
-    logger.info("地图API路由注册完成")
\ No newline at end of file
+    registry.flush_log("地图")
\ No newline at end of file
@@ -2,9 +2,8 @@
 订单相关API路由
 """
 
-import json
 from typing import Dict, Any
-from .registry import get_api_server
+from .registry import get_api_server, supports
 from shared import setup_logger
 
 logger = setup_logger()
@@ -17,10 +16,9 @@ def register_order_routes(instance_manager):
     registry = server.get_registry()
     
     @registry.post("/api/robots/{robot_id}/orders", "发送订单给机器人")
-    def send_order(request: Dict[str, Any]) -> Dict[str, Any]:
+    def send_order(request: Dict[str, Any], robot_id: str) -> Dict[str, Any]:
         """发送订单给机器人"""
         try:
-            robot_id = request["path_params"]["robot_id"]
             order_data = request.get("body", {})
             
             if not order_data:
@@ -38,14 +36,13 @@ def register_order_routes(instance_manager):
                 return {"error": f"发送订单给机器人 {robot_id} 失败"}
                 
         except Exception as e:
-            logger.error(f"发送订单失败: {e}")
+            logger.error("发送订单失败: %s", e)
             return {"error": str(e)}
     
     @registry.post("/api/robots/{robot_id}/instant-actions", "发送即时动作给机器人")
-    def send_instant_action(request: Dict[str, Any]) -> Dict[str, Any]:
+    def send_instant_action(request: Dict[str, Any], robot_id: str) -> Dict[str, Any]:
         """发送即时动作给机器人"""
         try:
-            robot_id = request["path_params"]["robot_id"]
             action_data = request.get("body", {})
             
             if not action_data:
@@ -63,22 +60,20 @@ def register_order_routes(instance_manager):
                 return {"error": f"发送即时动作给机器人 {robot_id} 失败"}
                 
         except Exception as e:
-            logger.error(f"发送即时动作失败: {e}")
+            logger.error("发送即时动作失败: %s", e)
             return {"error": str(e)}
     
     @registry.get("/api/robots/{robot_id}/orders", "获取机器人订单历史")
-    def get_robot_orders(request: Dict[str, Any]) -> Dict[str, Any]:
+    def get_robot_orders(request: Dict[str, Any], robot_id: str) -> Dict[str, Any]:
         """获取机器人订单历史"""
         try:
-            robot_id = request["path_params"]["robot_id"]
-            
             robot_instance = instance_manager.get_robot_instance(robot_id)
             if not robot_instance:
                 return {"error": f"机器人 {robot_id} 不存在"}
             
             # 获取订单历史（如果机器人实例支持）
             orders = []
-            if hasattr(robot_instance, 'get_order_history'):
+            if supports(robot_instance, 'get_order_history'):
                 orders = robot_instance.get_order_history()
             
             return {
@@ -88,22 +83,20 @@ def register_order_routes(instance_manager):
             }
             
         except Exception as e:
-            logger.error(f"获取机器人订单历史失败: {e}")
+            logger.error("获取机器人订单历史失败: %s", e)
             return {"error": str(e)}
     
     @registry.get("/api/robots/{robot_id}/current-order", "获取机器人当前订单")
-    def get_current_order(request: Dict[str, Any]) -> Dict[str, Any]:
+    def get_current_order(request: Dict[str, Any], robot_id: str) -> Dict[str, Any]:
         """获取机器人当前订单"""
         try:
-            robot_id = request["path_params"]["robot_id"]
-            
             robot_instance = instance_manager.get_robot_instance(robot_id)
             if not robot_instance:
                 return {"error": f"机器人 {robot_id} 不存在"}
             
             # 获取当前订单（如果机器人实例支持）
             current_order = None
-            if hasattr(robot_instance, 'get_current_order'):
+            if supports(robot_instance, 'get_current_order'):
                 current_order = robot_instance.get_current_order()
             
             return {
@@ -112,23 +105,20 @@ def register_order_routes(instance_manager):
             }
             
         except Exception as e:
-            logger.error(f"获取机器人当前订单失败: {e}")
+            logger.error("获取机器人当前订单失败: %s", e)
             return {"error": str(e)}
     
     @registry.delete("/api/robots/{robot_id}/orders/{order_id}", "取消机器人订单")
-    def cancel_order(request: Dict[str, Any]) -> Dict[str, Any]:
+    def cancel_order(request: Dict[str, Any], robot_id: str, order_id: str) -> Dict[str, Any]:
         """取消机器人订单"""
         try:
-            robot_id = request["path_params"]["robot_id"]
-            order_id = request["path_params"]["order_id"]
-            
             robot_instance = instance_manager.get_robot_instance(robot_id)
             if not robot_instance:
                 return {"error": f"机器人 {robot_id} 不存在"}
             
             # 取消订单（如果机器人实例支持）
             success = False
-            if hasattr(robot_instance, 'cancel_order'):
+            if supports(robot_instance, 'cancel_order'):
                 success = robot_instance.cancel_order(order_id)
             
             if success:
@@ -140,7 +130,7 @@ def register_order_routes(instance_manager):
                 return {"error": f"取消订单 {order_id} 失败"}
             
         except Exception as e:
-            logger.error(f"取消订单失败: {e}")
+            logger.error("取消订单失败: %s", e)
             return {"error": str(e)}
     
-    logger.info("订单API路由注册完成")
\ No newline at end of file
+    registry.flush_log("订单")
\ No newline at end of file
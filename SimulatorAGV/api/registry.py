@@ -6,13 +6,19 @@ API注册表 - 统一实现
 此文件提供向后兼容的接口
 """
 
-import re
+import functools
+import gzip
+import hashlib
 import json
+import zlib
 import threading
-from typing import Dict, List, Callable, Optional, Any
-from urllib.parse import urlparse, parse_qs
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from dataclasses import is_dataclass
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, List, Callable, Optional, Any, Tuple, Iterable, Iterator
+from urllib.parse import parse_qs, quote
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
+from dataclasses import is_dataclass, asdict
 from datetime import datetime
 
 # 尝试导入共享模块
@@ -23,88 +29,155 @@ except ImportError:
     import logging
     logger = logging.getLogger(__name__)
 
-# 导入统一API服务器实现
+# 可选的高性能JSON编码器
 try:
-    from .unified_api_server import (
-        UnifiedAPIServer, APIRegistry, APIRoute,
-        get_api_server as get_unified_server,
-        start_api_server as start_unified_server,
-        stop_api_server as stop_unified_server,
-        register_route,
-        get, post, put, delete
-    )
-    
-    # 为了向后兼容，创建别名
-    APIServer = UnifiedAPIServer
-    get_api_server = get_unified_server
-    start_api_server = start_unified_server
-    stop_api_server = stop_unified_server
-    
-    # 导出所有需要的符号
-    __all__ = [
-        'APIRegistry', 'APIRoute', 'APIServer', 'UnifiedAPIServer',
-        'get_api_server', 'start_api_server', 'stop_api_server',
-        'register_route', 'get', 'post', 'put', 'delete'
-    ]
-    
+    import orjson
+    _use_orjson = True
+except ImportError:
+    _use_orjson = False
+
+# 可选的Brotli压缩，未安装时仅支持gzip
+try:
+    import brotli
+    _use_brotli = True
+except ImportError:
+    _use_brotli = False
+
+# 可选的ASGI服务器，安装后由 uvicorn 承载API（HTTP解析在C扩展中完成）
+try:
+    import uvicorn
+    _use_uvicorn = True
+except ImportError:
+    _use_uvicorn = False
+
+from .routing import Route, RouteTable
+
+# 统一API服务器的全局注册函数（APIRegistry、APIRoute、APIServer 及服务器单例函数由本模块定义）
+try:
+    from .unified_api_server import UnifiedAPIServer, register_route, get, post, put, delete
 except ImportError:
     # 如果统一服务器不可用，回退到传统实现
-    from .legacy_registry import (
-        APIRegistry, APIRoute, APIServer,
-        get_api_server, start_api_server, stop_api_server,
-        get, post, put, delete
-    )
+    from .legacy_registry import get, post, put, delete
     
     def register_route(method: str, path: str, handler, description: str = ""):
         """注册路由到全局服务器"""
         server = get_api_server()
         server.registry.register(method, path, handler, description)
+
+__all__ = [
+    'APIRegistry', 'APIRoute', 'APIServer',
+    'get_api_server', 'start_api_server', 'stop_api_server',
+    'register_route', 'get', 'post', 'put', 'delete'
+]
+
+
+class APIRoute(Route):
+    """
+    API路由定义
+
+    路径模式中的 {param} 匹配单个路径段（不含 '/'），整条路径须完全匹配，
+    末尾多出的 '/' 不会被忽略。
+    处理器以 handler(request, **path_params) 调用，路径参数按名称作为关键字参数传入，
+    例如 /api/robots/{robot_id} 的处理器签名为 handler(request, robot_id)。
+    """
+    def __init__(self, method: str, path: str, handler: Callable, description: str = "",
+                 cache_ttl: Optional[float] = None, const: Optional[Dict[str, Any]] = None):
+        super().__init__(method, path, handler, description)
+        # GET响应的缓存有效期（秒），None 表示不缓存
+        self.cache_ttl = cache_ttl
+        # 固定不变的响应在注册时编码一次，请求时直接写出，不再调用处理器
+        self.const_bytes: Optional[bytes] = _dumps_bytes(const) if const is not None else None
+        self.const_etag: Optional[str] = _make_etag(self.const_bytes) if const is not None else None
+
+# 可缓存GET路由的默认缓存有效期（秒）
+RESPONSE_CACHE_TTL = 0.25
+# 处理器抛出异常时，过期不超过该时长（秒）的缓存响应仍可作为陈旧响应返回；
+# 处理器返回的错误信息（如机器人不存在）是正常应答，照常返回
+RESPONSE_STALE_TTL = 30.0
+
+
+class _ResponseCache:
+    """已编码GET响应的LRU缓存，条目按有效期过期"""
+    
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        # 请求路径(含查询字符串) -> (过期时间, 响应字节串, 内容编码 -> 压缩后的响应, ETag)
+        self._entries: "OrderedDict[str, Tuple[float, bytes, Dict[str, Tuple[bytes, Optional[str], str]], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, encoding: Optional[str] = None,
+            max_stale: float = 0.0) -> Optional[Tuple[bytes, Optional[str], str]]:
+        """
+        获取缓存响应
+        
+        Args:
+            key: 请求路径(含查询字符串)
+            encoding: 协商出的内容编码
+            max_stale: 允许返回已过期不超过该时长（秒）的响应
+        
+        Returns:
+            (响应字节串, 实际使用的内容编码, ETag)；压缩结果随缓存条目保存，每种编码只压缩一次
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            # 过期条目保留到被淘汰或失效为止，供处理器出错时作为陈旧响应返回
+            if entry[0] + max_stale < time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            if not encoding:
+                return entry[1], None, entry[3]
+            encoded = entry[2].get(encoding)
+        if encoded is None:
+            # 压缩在锁外进行，并发请求最多重复压缩一次
+            encoded = _encode_body(entry[1], encoding) + (entry[3],)
+            entry[2][encoding] = encoded
+        return encoded
+    
+    def put(self, key: str, ttl: float, payload: bytes):
+        """写入缓存响应，超出容量时淘汰最久未使用的条目"""
+        etag = _make_etag(payload)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, payload, {}, etag)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
     
-    __all__ = [
-        'APIRegistry', 'APIRoute', 'APIServer',
-        'get_api_server', 'start_api_server', 'stop_api_server',
-        'register_route', 'get', 'post', 'put', 'delete'
-    ]
-
-
-class APIRoute:
-    """API路由定义"""
-    def __init__(self, method: str, path: str, handler: Callable, description: str = ""):
-        self.method = method.upper()
-        self.path = path
-        self.handler = handler
-        self.description = description
-        self.path_pattern = self._compile_path_pattern(path)
-    
-    def _compile_path_pattern(self, path: str):
-        """将路径模式编译为正则表达式"""
-        # 将 {param} 替换为命名捕获组
-        pattern = re.sub(r'\{([^}]+)\}', r'(?P<\1>[^/]+)', path)
-        return re.compile(f'^{pattern}$')
-    
-    def match(self, path: str) -> Optional[Dict[str, str]]:
-        """检查路径是否匹配，返回路径参数"""
-        match = self.path_pattern.match(path)
-        if match:
-            return match.groupdict()
-        return None
-
-
-class APIRegistry:
+    def invalidate(self, prefix: str = ""):
+        """删除路径以 prefix 开头的缓存响应，prefix 为空时清空缓存"""
+        with self._lock:
+            if not prefix:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+
+class APIRegistry(RouteTable):
     """API路由注册表"""
     def __init__(self):
-        self.routes: List[APIRoute] = []
+        super().__init__()
+        # 可缓存GET路由的响应缓存
+        self.response_cache = _ResponseCache()
+        # 预先编码的路由信息响应，注册新路由时失效
+        self._routes_info: Optional[RawJSON] = None
     
-    def register(self, method: str, path: str, handler: Callable, description: str = ""):
-        """注册API路由"""
-        route = APIRoute(method, path, handler, description)
-        self.routes.append(route)
-        logger.info(f"注册API路由: {method} {path}")
+    def register(self, method: str, path: str, handler: Callable, description: str = "",
+                 cache_ttl: Optional[float] = None, const: Optional[Dict[str, Any]] = None):
+        """
+        注册API路由
+        cache_ttl 不为 None 时缓存该GET路由的响应；const 为该路由固定不变的响应，
+        注册时预先编码，请求时直接写出（?pretty=1 时仍调用处理器）
+        """
+        self.add_route(APIRoute(method, path, handler, description, cache_ttl, const))
+        self._routes_info = None
     
-    def get(self, path: str, description: str = ""):
+    def get(self, path: str, description: str = "", cache_ttl: Optional[float] = None,
+            const: Optional[Dict[str, Any]] = None):
         """GET方法装饰器"""
         def decorator(handler: Callable):
-            self.register("GET", path, handler, description)
+            self.register("GET", path, handler, description, cache_ttl, const)
             return handler
         return decorator
     
@@ -129,55 +202,318 @@ class APIRegistry:
             return handler
         return decorator
     
-    def find_route(self, method: str, path: str) -> Optional[tuple]:
-        """查找匹配的路由，返回(route, path_params)"""
-        for route in self.routes:
-            if route.method == method.upper():
-                path_params = route.match(path)
-                if path_params is not None:
-                    return route, path_params
-        return None
-    
-    def get_routes(self) -> List[Dict[str, str]]:
-        """获取所有注册的路由信息"""
-        return [
-            {
-                "method": route.method,
-                "path": route.path,
-                "description": route.description
-            }
-            for route in self.routes
-        ]
-
-
-def safe_json_serialize(obj):
-    """安全的JSON序列化，处理dataclass和其他复杂对象"""
-    if is_dataclass(obj):
-        if hasattr(obj, 'to_dict'):
-            return obj.to_dict()
-        else:
-            # 如果没有to_dict方法，使用dataclass的字段
-            from dataclasses import asdict
-            return asdict(obj)
-    elif hasattr(obj, 'to_dict'):
-        return obj.to_dict()
-    elif hasattr(obj, '__dict__'):
-        return obj.__dict__
-    elif isinstance(obj, (list, tuple)):
-        return [safe_json_serialize(item) for item in obj]
-    elif isinstance(obj, dict):
-        return {key: safe_json_serialize(value) for key, value in obj.items()}
+    def get_cached_response(self, route: APIRoute, method: str, key: str,
+                            encoding: Optional[str] = None) -> Optional[Tuple[bytes, Optional[str], str]]:
+        """获取可缓存GET路由的缓存响应，返回 (响应字节串, 内容编码, ETag)"""
+        if route.cache_ttl is None or method != 'GET':
+            return None
+        return self.response_cache.get(key, encoding)
+    
+    def cache_response(self, route: APIRoute, method: str, key: str, response: Any,
+                       encoding: Optional[str] = None) -> Optional[Tuple[bytes, Optional[str], str]]:
+        """
+        编码并缓存可缓存GET路由的响应
+        
+        Returns:
+            (响应字节串, 内容编码, ETag)；不可缓存（含错误信息的响应等）时返回 None
+        """
+        if route.cache_ttl is None or method != 'GET':
+            return None
+        if not isinstance(response, dict) or 'error' in response:
+            return None
+        self.response_cache.put(key, route.cache_ttl, _dumps_bytes(response))
+        return self.response_cache.get(key, encoding)
+    
+    def get_stale_response(self, route: APIRoute, method: str, key: str,
+                           encoding: Optional[str] = None) -> Optional[Tuple[bytes, Optional[str], str]]:
+        """处理器抛出异常时获取可缓存GET路由最近一次成功的响应（可能已过期），返回 (响应字节串, 内容编码, ETag)"""
+        if route.cache_ttl is None or method != 'GET':
+            return None
+        return self.response_cache.get(key, encoding, max_stale=RESPONSE_STALE_TTL)
+    
+    def invalidate_responses(self, method: str, path: str, response: Any):
+        """
+        修改类请求成功后使相关的缓存响应失效
+        /api/robots/{robot_id}/... 只使该机器人下的缓存失效，其他路径清空全部缓存；
+        汇总类接口（如 /api/robots）依靠较短的有效期保持更新
+        """
+        if method == 'GET' or (isinstance(response, dict) and 'error' in response):
+            return
+        segments = path.split('/')
+        self.response_cache.invalidate('/'.join(segments[:4]) if len(segments) > 4 else "")
+    
+    def invalidate_robot_responses(self, robot_id: str):
+        """机器人被移除后删除其下的缓存响应，避免已删除的机器人在陈旧有效期内仍被返回"""
+        self.response_cache.invalidate(f"/api/robots/{robot_id}/")
+        quoted = quote(robot_id, safe='')
+        if quoted != robot_id:
+            # 请求路径中的序列号可能是百分号编码的形式
+            self.response_cache.invalidate(f"/api/robots/{quoted}/")
+    
+    def get_routes_info(self) -> 'RawJSON':
+        """获取路由信息响应 {"routes": [...], "total": n}，首次调用时构建并编码，之后直接复用"""
+        routes_info = self._routes_info
+        if routes_info is None:
+            routes = self.get_routes()
+            routes_info = self._routes_info = RawJSON({"routes": routes, "total": len(routes)})
+        return routes_info
+
+
+# 类型 -> 转换函数 的缓存，编码器只对无法原生处理的对象回调 _json_default
+_DEFAULT_DISPATCH: Dict[type, Callable[[Any], Any]] = {}
+
+
+def _resolve_default(obj: Any) -> Callable[[Any], Any]:
+    """为对象类型选择转换函数并缓存（to_dict、dataclass、datetime、元组/集合、__dict__ 依次优先）"""
+    cls = type(obj)
+    if hasattr(cls, 'to_dict'):
+        handler = cls.to_dict
+    elif is_dataclass(obj):
+        handler = asdict
     elif isinstance(obj, datetime):
-        return obj.isoformat()
+        handler = cls.isoformat
+    elif isinstance(obj, (tuple, set, frozenset)):
+        handler = list
+    elif hasattr(obj, '__dict__'):
+        handler = vars
     else:
-        return obj
+        raise TypeError(f"Object of type {cls.__name__} is not JSON serializable")
+    _DEFAULT_DISPATCH[cls] = handler
+    return handler
+
+
+def _json_default(obj: Any) -> Any:
+    """json/orjson 的 default 回调"""
+    handler = _DEFAULT_DISPATCH.get(type(obj))
+    if handler is None:
+        handler = _resolve_default(obj)
+    return handler(obj)
+
+
+def _dumps_bytes(obj: Any, pretty: bool = False) -> bytes:
+    """将对象序列化为UTF-8编码的JSON字节串，pretty 为 True 时使用标准库缩进输出"""
+    if pretty:
+        return json.dumps(obj, default=_json_default, ensure_ascii=False, indent=2).encode('utf-8')
+    if _use_orjson:
+        # dataclass 交给 default 处理，以便使用其 to_dict 输出的字段名
+        return orjson.dumps(
+            obj, default=_json_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+    return json.dumps(obj, default=_json_default, ensure_ascii=False).encode('utf-8')
+
+
+@functools.lru_cache(maxsize=None)
+def _class_supports(cls: type, name: str) -> bool:
+    return callable(getattr(cls, name, None))
+
+
+def supports(obj: Any, name: str) -> bool:
+    """
+    判断对象是否提供指定方法，结果按 (类, 方法名) 缓存，避免每次请求都做反射查找；
+    只识别定义在类上的方法
+    """
+    return _class_supports(type(obj), name)
+
+
+class RawJSON:
+    """
+    已预先编码的JSON响应，写出时直接使用 payload，不再序列化；
+    ?pretty=1 等需要重新编码的场合通过 to_dict 取回原对象
+    """
+    __slots__ = ('data', 'payload', 'etag')
+    
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.payload = _dumps_bytes(data)
+        self.etag = _make_etag(self.payload)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return self.data
+
+
+class RawResponse:
+    """非JSON的原始响应体（如纯文本、msgpack），按指定的 Content-Type 原样写出"""
+    __slots__ = ('body', 'content_type')
+    
+    def __init__(self, body: bytes, content_type: str):
+        self.body = body
+        self.content_type = content_type
+
+
+class JSONListStream:
+    """
+    流式输出的JSON对象响应，形如 {key: [items...], **extra}
+    列表元素在写出响应时才逐个生成和编码，服务端不需要构造完整的响应缓冲区；
+    响应头须在内容生成前发出，因此ETag只能由调用方按数据版本提供
+    """
+    __slots__ = ('key', 'items', 'extra', 'etag')
+    
+    # 累计到该字节数后作为一个分块写出
+    chunk_size = 16384
+    
+    def __init__(self, key: str, items: Iterable[Any], extra: Optional[Dict[str, Any]] = None,
+                 etag: Optional[str] = None):
+        self.key = key
+        self.items = items
+        self.extra = extra or {}
+        # 与内容版本对应的ETag，为 None 时流式响应不带ETag
+        self.etag = etag
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """一次性展开为完整的字典（用于 ?pretty=1 或不支持分块传输的客户端）"""
+        return {self.key: list(self.items), **self.extra}
+    
+    def iter_chunks(self) -> Iterator[bytes]:
+        """按 chunk_size 生成已编码的JSON片段，拼接后即为完整的JSON对象"""
+        # 由 {"key":[]} 去掉末尾的 ]} 得到开头部分
+        buffer = bytearray(_dumps_bytes({self.key: []})[:-2])
+        first = True
+        for item in self.items:
+            if not first:
+                buffer += b','
+            first = False
+            buffer += _dumps_bytes(item)
+            if len(buffer) >= self.chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b']'
+        # extra 去掉开头的 { 后直接接在列表之后
+        buffer += b',' + _dumps_bytes(self.extra)[1:] if self.extra else b'}'
+        yield bytes(buffer)
+
+
+# 响应体超过该字节数时才压缩，更小的响应压缩收益不抵开销
+COMPRESS_MIN_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=64)
+def _negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    根据 Accept-Encoding 请求头选择响应的内容编码
+
+    Returns:
+        'br'（已安装 brotli 时优先）、'gzip'，客户端不接受压缩时返回 None
+    """
+    accepted = set()
+    for item in accept_encoding.lower().split(','):
+        coding, _, params = item.partition(';')
+        name, _, value = params.partition('=')
+        if name.strip() == 'q':
+            # q=0 表示明确拒绝该编码
+            try:
+                if float(value) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip())
+    if _use_brotli and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def _make_etag(payload: bytes) -> str:
+    """
+    由未压缩的响应体计算ETag
+    同一内容的各种压缩形式共用该值，因此使用弱ETag
+    """
+    return 'W/"%s"' % hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断 If-None-Match 请求头是否与ETag匹配（弱比较）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:]
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _encode_body(payload: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """按内容编码压缩响应体，返回 (响应字节串, 实际使用的内容编码)"""
+    if not encoding or len(payload) <= COMPRESS_MIN_SIZE:
+        return payload, None
+    if encoding == 'br':
+        return brotli.compress(payload, quality=1), 'br'
+    # 压缩级别1的速度约为默认级别的3倍，压缩率相差不大；mtime固定使相同内容的输出一致
+    return gzip.compress(payload, compresslevel=1, mtime=0), 'gzip'
+
+
+def _iter_encoded(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """对流式响应的分块逐块压缩，encoding 为空时原样输出"""
+    if not encoding:
+        yield from chunks
+        return
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=1)
+        compress, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(1, zlib.DEFLATED, 31)
+        compress, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    data = finish()
+    if data:
+        yield data
+
+
+def _loads_bytes(data: bytes) -> Any:
+    """将JSON字节串解析为Python对象，解析失败时抛出 ValueError"""
+    if _use_orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class _LazyQueryParams(Mapping):
+    """查询参数，首次访问时才调用 parse_qs 解析，格式与 parse_qs 结果一致"""
+    __slots__ = ('_query', '_params')
+
+    def __init__(self, query: str):
+        self._query = query
+        self._params: Optional[Dict[str, List[str]]] = None
+
+    def _parsed(self) -> Dict[str, List[str]]:
+        if self._params is None:
+            self._params = parse_qs(self._query)
+        return self._params
+
+    def __getitem__(self, key: str) -> List[str]:
+        return self._parsed()[key]
+
+    def __iter__(self):
+        return iter(self._parsed())
+
+    def __len__(self) -> int:
+        return len(self._parsed())
 
 
 class APIRequestHandler(BaseHTTPRequestHandler):
-    """API请求处理器"""
+    """API请求处理器（HTTP/1.1，支持长连接复用）"""
+    
+    # HTTP/1.1 默认保持连接，每个响应都必须带 Content-Length
+    protocol_version = 'HTTP/1.1'
+    # 空闲长连接的超时时间（秒），超时后关闭连接并释放处理线程
+    timeout = 30
+    # 小响应立即发送，不等待 Nagle 合并
+    disable_nagle_algorithm = True
     
     def __init__(self, registry: APIRegistry, *args, **kwargs):
         self.registry = registry
+        # 请求带 ?pretty=1 时输出缩进格式的JSON，便于调试
+        self._pretty = False
+        # 根据 Accept-Encoding 协商出的响应内容编码
+        self._encoding: Optional[str] = None
         super().__init__(*args, **kwargs)
     
     def do_GET(self):
@@ -194,26 +530,54 @@ class APIRequestHandler(BaseHTTPRequestHandler):
     
     def do_OPTIONS(self):
         """处理CORS预检请求"""
-        self._send_cors_headers()
         self.send_response(200)
+        self._send_cors_headers()
+        self.send_header('Content-Length', '0')
         self.end_headers()
     
     def _handle_request(self, method: str):
         """处理HTTP请求"""
         try:
-            # 解析URL
-            parsed_url = urlparse(self.path)
-            path = parsed_url.path
-            query_params = parse_qs(parsed_url.query)
+            # 解析URL，没有查询字符串的请求不做任何解析
+            path, sep, query = self.path.partition('?')
+            if sep:
+                query_params = _LazyQueryParams(query)
+                self._pretty = 'pretty=' in query and query_params.get('pretty', ['0'])[0] == '1'
+            else:
+                query_params = {}
+                # 长连接上的处理器实例会被复用，需重置上一个请求的设置
+                self._pretty = False
+            accept_encoding = self.headers.get('Accept-Encoding')
+            self._encoding = _negotiate_encoding(accept_encoding) if accept_encoding else None
+            
+            # 长连接上未读取的请求体会被当作下一个请求解析，这类请求处理完后关闭连接
+            content_length = int(self.headers.get('Content-Length') or 0)
+            if 'Transfer-Encoding' in self.headers or (content_length > 0 and method not in ('POST', 'PUT')):
+                self.close_connection = True
             
             # 查找匹配的路由
             route_match = self.registry.find_route(method, path)
             if not route_match:
+                if content_length > 0:
+                    self.close_connection = True
                 self._send_error(404, "API endpoint not found")
                 return
             
             route, path_params = route_match
             
+            # 固定响应直接写出预先编码的字节串
+            if route.const_bytes is not None and not self._pretty:
+                payload, content_encoding = _encode_body(route.const_bytes, self._encoding)
+                self._send_json_bytes(payload, content_encoding=content_encoding, etag=route.const_etag)
+                return
+            
+            # 可缓存的GET路由命中缓存时直接返回已编码的响应
+            if not self._pretty:
+                cached = self.registry.get_cached_response(route, method, self.path, self._encoding)
+                if cached is not None:
+                    self._send_json_bytes(cached[0], content_encoding=cached[1], etag=cached[2])
+                    return
+            
             # 准备请求数据
             request_data = {
                 'method': method,
@@ -225,41 +589,135 @@ class APIRequestHandler(BaseHTTPRequestHandler):
             
             # 读取请求体（对于POST和PUT请求）
             if method in ['POST', 'PUT']:
-                content_length = int(self.headers.get('Content-Length', 0))
                 if content_length > 0:
-                    body = self.rfile.read(content_length).decode('utf-8')
+                    # JSON解析器直接接受bytes，只有非JSON请求体才需要解码为文本
+                    body = self.rfile.read(content_length)
                     try:
-                        request_data['body'] = json.loads(body)
-                    except json.JSONDecodeError:
-                        request_data['body'] = body
+                        request_data['body'] = _loads_bytes(body)
+                    except ValueError:
+                        request_data['body'] = body.decode('utf-8', errors='replace')
             
             # 调用路由处理器
             try:
-                response = route.handler(request_data)
-                self._send_json_response(response)
+                response = route.handler(request_data, **path_params)
+                payload = None if self._pretty else self.registry.cache_response(
+                    route, method, self.path, response, self._encoding
+                )
+                if payload is not None:
+                    self._send_json_bytes(payload[0], content_encoding=payload[1], etag=payload[2])
+                else:
+                    self._send_json_response(response)
+                self.registry.invalidate_responses(method, path, response)
             except Exception as e:
-                logger.error(f"API处理器执行失败: {e}")
-                self._send_error(500, f"Internal server error: {str(e)}")
+                logger.error("API处理器执行失败: %s", e)
+                if not self._send_stale(route, method):
+                    self._send_error(500, f"Internal server error: {str(e)}")
             
         except Exception as e:
-            logger.error(f"处理API请求失败: {e}")
+            logger.error("处理API请求失败: %s", e)
+            self.close_connection = True
             self._send_error(500, "Internal server error")
     
+    def _send_stale(self, route: APIRoute, method: str) -> bool:
+        """处理器抛出异常时返回最近一次成功的缓存响应（带 X-Cache: stale 头），没有可用的缓存时返回 False"""
+        if self._pretty:
+            return False
+        stale = self.registry.get_stale_response(route, method, self.path, self._encoding)
+        if stale is None:
+            return False
+        self._send_json_bytes(stale[0], content_encoding=stale[1], cache_status='stale', etag=stale[2])
+        return True
+    
     def _send_json_response(self, data: Any, status_code: int = 200):
         """发送JSON响应"""
+        if isinstance(data, JSONListStream) and not self._pretty and self.request_version == 'HTTP/1.1':
+            self._send_json_stream(data, status_code)
+            return
+        content_type = 'application/json; charset=utf-8'
         try:
-            # 使用安全的JSON序列化
-            json_data = json.dumps(safe_json_serialize(data), ensure_ascii=False, indent=2)
-            
+            # 复杂对象由编码器回调 _json_default 转换
+            if isinstance(data, RawJSON) and not self._pretty:
+                json_data, etag = data.payload, data.etag
+            elif isinstance(data, RawResponse):
+                json_data, content_type = data.body, data.content_type
+                etag = _make_etag(json_data) if self.command == 'GET' else None
+            else:
+                json_data = _dumps_bytes(data, self._pretty)
+                # GET响应附带ETag，客户端轮询时内容未变化可返回 304
+                etag = _make_etag(json_data) if self.command == 'GET' else None
+            json_data, content_encoding = _encode_body(json_data, self._encoding)
+        except Exception as e:
+            logger.error("发送JSON响应失败: %s", e)
+            self._send_error(500, "Failed to serialize response")
+            return
+        self._send_json_bytes(json_data, status_code, content_encoding, etag=etag, content_type=content_type)
+    
+    def _send_json_bytes(self, json_data: bytes, status_code: int = 200,
+                         content_encoding: Optional[str] = None, cache_status: Optional[str] = None,
+                         etag: Optional[str] = None, content_type: str = 'application/json; charset=utf-8'):
+        """
+        发送已编码（及按需压缩）的JSON响应（RawResponse 的响应体同样经此发送）
+        提供 etag 且与请求的 If-None-Match 匹配时改为发送不带响应体的 304
+        """
+        try:
+            if etag and status_code == 200 and _etag_matches(self.headers.get('If-None-Match'), etag):
+                self._send_not_modified(etag)
+                return
             self.send_response(status_code)
             self._send_cors_headers()
-            self.send_header('Content-Type', 'application/json; charset=utf-8')
-            self.send_header('Content-Length', str(len(json_data.encode('utf-8'))))
-            self.end_headers()
-            self.wfile.write(json_data.encode('utf-8'))
+            self.send_header('Content-Type', content_type)
+            if content_encoding:
+                self.send_header('Content-Encoding', content_encoding)
+            if cache_status:
+                self.send_header('X-Cache', cache_status)
+            if etag:
+                self.send_header('ETag', etag)
+                # 允许客户端保存响应，但每次使用前须用 If-None-Match 重新验证
+                self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('Content-Length', str(len(json_data)))
+            if self.close_connection:
+                self.send_header('Connection', 'close')
+            self._end_headers_with_body(json_data)
         except Exception as e:
-            logger.error(f"发送JSON响应失败: {e}")
-            self._send_error(500, "Failed to serialize response")
+            logger.error("发送JSON响应失败: %s", e)
+    
+    def _send_not_modified(self, etag: str):
+        """发送 304 Not Modified 响应"""
+        self.send_response(304)
+        self._send_cors_headers()
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self._end_headers_with_body(b'')
+    
+    def _send_json_stream(self, stream: JSONListStream, status_code: int = 200):
+        """以分块传输编码流式发送JSON响应；带有ETag且与请求的 If-None-Match 匹配时改为发送 304"""
+        etag = stream.etag if self.command == 'GET' else None
+        if etag and status_code == 200 and _etag_matches(self.headers.get('If-None-Match'), etag):
+            self._send_not_modified(etag)
+            return
+        self.send_response(status_code)
+        self._send_cors_headers()
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if self._encoding:
+            self.send_header('Content-Encoding', self._encoding)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for chunk in _iter_encoded(stream.iter_chunks(), self._encoding):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+        except Exception as e:
+            # 响应头已发出，无法再返回错误状态，只能中断连接
+            logger.error("流式发送JSON响应失败: %s", e)
+            self.close_connection = True
     
     def _send_error(self, status_code: int, message: str):
         """发送错误响应"""
@@ -271,16 +729,26 @@ class APIRequestHandler(BaseHTTPRequestHandler):
         }
         
         try:
-            json_data = json.dumps(error_data, ensure_ascii=False, indent=2)
+            json_data = _dumps_bytes(error_data, self._pretty)
             
             self.send_response(status_code)
             self._send_cors_headers()
             self.send_header('Content-Type', 'application/json; charset=utf-8')
-            self.send_header('Content-Length', str(len(json_data.encode('utf-8'))))
-            self.end_headers()
-            self.wfile.write(json_data.encode('utf-8'))
+            self.send_header('Content-Length', str(len(json_data)))
+            if self.close_connection:
+                self.send_header('Connection', 'close')
+            self._end_headers_with_body(json_data)
         except Exception as e:
-            logger.error(f"发送错误响应失败: {e}")
+            logger.error("发送错误响应失败: %s", e)
+    
+    def _end_headers_with_body(self, body: bytes):
+        """结束响应头，并与响应体合并为一次写入，每个响应只需一次 send 系统调用"""
+        if self.request_version == 'HTTP/0.9':
+            self.wfile.write(body)
+            return
+        self._headers_buffer.append(b"\r\n")
+        self._headers_buffer.append(body)
+        self.flush_headers()
     
     def _send_cors_headers(self):
         """发送CORS头"""
@@ -290,7 +758,13 @@ class APIRequestHandler(BaseHTTPRequestHandler):
     
     def log_message(self, format, *args):
         """重写日志方法，使用我们的logger"""
-        logger.info(f"[API] {format % args}")
+        logger.info("[API] " + format, *args)
+
+
+class ThreadedAPIHTTPServer(ThreadingHTTPServer):
+    """多线程HTTP服务器，每个请求在独立的守护线程中处理，避免慢请求阻塞其他请求"""
+    daemon_threads = True
+    request_queue_size = 128
 
 
 class APIServer:
@@ -298,48 +772,92 @@ class APIServer:
     def __init__(self):
         self.registry = APIRegistry()
         self.server: Optional[HTTPServer] = None
+        # 使用 uvicorn 承载时的ASGI服务器实例
+        self.asgi_server = None
         self.server_thread: Optional[threading.Thread] = None
         self.running = False
     
     def start(self, host: str = 'localhost', port: int = 8000):
-        """启动API服务器"""
+        """启动API服务器（安装了 uvicorn 时使用ASGI服务器，否则使用多线程 http.server）"""
         if self.running:
             logger.warning("API服务器已在运行")
             return
         
+        if _use_uvicorn:
+            self._start_asgi(host, port)
+            return
+        
         def handler_factory(*args, **kwargs):
             return APIRequestHandler(self.registry, *args, **kwargs)
         
         try:
-            self.server = HTTPServer((host, port), handler_factory)
+            self.server = ThreadedAPIHTTPServer((host, port), handler_factory)
             self.running = True
             
-            logger.info(f"API服务器启动在 http://{host}:{port}")
+            logger.info("API服务器启动在 http://%s:%s", host, port)
             
             def run_server():
                 try:
                     self.server.serve_forever()
                 except Exception as e:
-                    logger.error(f"API服务器运行错误: {e}")
+                    logger.error("API服务器运行错误: %s", e)
                 finally:
                     self.running = False
             
             self.server_thread = threading.Thread(target=run_server, daemon=True)
             self.server_thread.start()
             
-            logger.info(f"API服务器已启动，地址: http://{host}:{port}")
+            logger.info("API服务器已启动，地址: http://%s:%s", host, port)
             
         except Exception as e:
-            logger.error(f"启动API服务器失败: {e}")
+            logger.error("启动API服务器失败: %s", e)
             self.running = False
             raise
     
+    def _start_asgi(self, host: str, port: int):
+        """以 uvicorn 启动ASGI应用，uvloop/httptools 已安装时自动启用"""
+        from .asgi_app import create_asgi_app
+        
+        config = uvicorn.Config(
+            create_asgi_app(self.registry), host=host, port=port,
+            loop='auto', http='auto', log_level='warning'
+        )
+        self.asgi_server = uvicorn.Server(config)
+        self.running = True
+        
+        def run_server():
+            try:
+                self.asgi_server.run()
+            except BaseException as e:
+                logger.error("API服务器运行错误: %s", e)
+            finally:
+                self.running = False
+        
+        self.server_thread = threading.Thread(target=run_server, daemon=True)
+        self.server_thread.start()
+        
+        # 等待监听端口就绪，绑定失败时与 http.server 一样抛出异常
+        deadline = time.monotonic() + 5
+        while not self.asgi_server.started and self.server_thread.is_alive() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        if not self.asgi_server.started:
+            self.running = False
+            self.asgi_server = None
+            logger.error("启动API服务器失败: 无法监听 %s:%s", host, port)
+            raise OSError(f"无法启动ASGI服务器: {host}:{port}")
+        
+        logger.info("API服务器已启动(ASGI)，地址: http://%s:%s", host, port)
+    
     def stop(self):
         """停止API服务器"""
         if not self.running:
             return
         
         try:
+            if self.asgi_server:
+                self.asgi_server.should_exit = True
+                self.asgi_server = None
+            
             if self.server:
                 self.server.shutdown()
                 self.server.server_close()
@@ -347,11 +865,18 @@ class APIServer:
             if self.server_thread and self.server_thread.is_alive():
                 self.server_thread.join(timeout=5)
             
+            # 写回API修改过但尚未保存的注册文件（与 update_robot 使用同一导入路径）
+            try:
+                from ..services.registry_file_cache import flush_registry_file_caches
+                flush_registry_file_caches()
+            except ImportError:
+                pass
+            
             self.running = False
             logger.info("API服务器已停止")
             
         except Exception as e:
-            logger.error(f"停止API服务器失败: {e}")
+            logger.error("停止API服务器失败: %s", e)
     
     def get_registry(self) -> APIRegistry:
         """获取路由注册表"""
@@ -360,14 +885,20 @@ class APIServer:
 
 # 全局API服务器实例（单例模式）
 _api_server: Optional[APIServer] = None
+# 保护单例的创建和销毁，已创建后的读取不需要加锁
+_api_server_lock = threading.Lock()
 
 
 def get_api_server() -> APIServer:
-    """获取API服务器实例"""
+    """获取API服务器实例（线程安全，多个线程同时调用时只创建一个实例）"""
     global _api_server
-    if _api_server is None:
-        _api_server = APIServer()
-    return _api_server
+    server = _api_server
+    if server is not None:
+        return server
+    with _api_server_lock:
+        if _api_server is None:
+            _api_server = APIServer()
+        return _api_server
 
 
 def start_api_server(host: str = 'localhost', port: int = 8000) -> APIServer:
@@ -380,6 +911,7 @@ def start_api_server(host: str = 'localhost', port: int = 8000) -> APIServer:
 def stop_api_server():
     """停止API服务器"""
     global _api_server
-    if _api_server:
-        _api_server.stop()
-        _api_server = None
\ No newline at end of file
+    with _api_server_lock:
+        server, _api_server = _api_server, None
+    if server:
+        server.stop()
@@ -2,13 +2,55 @@
 机器人相关API路由
 """
 
-import json
-from typing import Dict, Any
-from .registry import get_api_server
-from shared import setup_logger
+import functools
+import os
+import threading
+from typing import Dict, Any, Tuple
+from .registry import get_api_server, supports, JSONListStream, RESPONSE_CACHE_TTL
+from shared import setup_logger, from_json_bytes
 
 logger = setup_logger()
 
+# 机器人数量达到该值时，机器人列表以分块传输流式输出
+ROBOTS_STREAM_THRESHOLD = 32
+
+# 健康检查的固定响应，注册时预先编码
+HEALTH_RESPONSE: Dict[str, Any] = {
+    "status": "healthy",
+    "service": "SimulatorAGV",
+    "version": "1.0.0"
+}
+
+
+# 按序列号分片的锁：同一机器人的更新串行执行，不同机器人的更新可以并行
+_SERIAL_LOCK_STRIPES = 16
+_serial_locks = tuple(threading.Lock() for _ in range(_SERIAL_LOCK_STRIPES))
+
+
+def _serial_lock(serial_number: str) -> threading.Lock:
+    """获取序列号对应的分片锁"""
+    return _serial_locks[hash(serial_number) & (_SERIAL_LOCK_STRIPES - 1)]
+
+
+@functools.lru_cache(maxsize=1024)
+def _state_file_path(base_path: Any, serial_number: str) -> str:
+    """机器人当前状态文件的路径，按 (存储根目录, 序列号) 缓存"""
+    return os.path.join(base_path, serial_number, "state", "current_state.json")
+
+
+def _project_robot(item: Tuple[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """将 (机器人ID, 状态) 投影为机器人列表中的摘要条目"""
+    robot_id, status = item
+    get = status.get
+    return {
+        "id": robot_id,
+        "status": get("status", "unknown"),
+        "position": get("position") or {},
+        "battery": get("battery", 0),
+        "is_warning": get("is_warning", False),
+        "is_fault": get("is_fault", False)
+    }
+
 
 def register_robot_routes(instance_manager):
     """注册机器人相关的API路由"""
@@ -16,48 +58,71 @@ def register_robot_routes(instance_manager):
     server = get_api_server()
     registry = server.get_registry()
     
-    @registry.get("/api/status", "获取系统状态")
+    # 实例管理器的可选方法在注册时解析一次，处理器中不再逐次检查
+    get_timestamp = getattr(instance_manager, '_get_timestamp', None)
+    get_robot_summaries = getattr(instance_manager, 'get_robot_summaries', None)
+    get_robot_summaries_versioned = getattr(instance_manager, 'get_robot_summaries_versioned', None)
+    # 机器人被移除（包括注册文件热加载移除）后清除其缓存响应
+    if hasattr(instance_manager, 'removal_listener'):
+        instance_manager.removal_listener = registry.invalidate_robot_responses
+    
+    @registry.get("/api/status", "获取系统状态", cache_ttl=RESPONSE_CACHE_TTL)
     def get_system_status(request: Dict[str, Any]) -> Dict[str, Any]:
         """获取系统状态"""
         try:
             return {
                 "status": "running" if instance_manager.is_running() else "stopped",
                 "robot_count": instance_manager.get_robot_count(),
-                "timestamp": instance_manager._get_timestamp() if hasattr(instance_manager, '_get_timestamp') else None
+                "timestamp": get_timestamp() if get_timestamp else None
             }
         except Exception as e:
-            logger.error(f"获取系统状态失败: {e}")
+            logger.error("获取系统状态失败: %s", e)
             return {"error": str(e)}
     
-    @registry.get("/api/robots", "获取所有机器人列表")
+    @registry.get("/api/robots", "获取所有机器人列表", cache_ttl=RESPONSE_CACHE_TTL)
     def get_robots(request: Dict[str, Any]) -> Dict[str, Any]:
         """获取所有机器人列表"""
         try:
-            robots = []
-            for robot_id in instance_manager.get_robot_list():
-                robot_status = instance_manager.get_robot_status(robot_id)
-                robots.append({
-                    "id": robot_id,
-                    "status": robot_status.get("status", "unknown"),
-                    "position": robot_status.get("position", {}),
-                    "battery": robot_status.get("battery", 0),
-                    "is_warning": robot_status.get("is_warning", False),
-                    "is_fault": robot_status.get("is_fault", False)
-                })
+            if get_robot_summaries:
+                # 摘要由机器人实例在状态变化时预先构造，这里直接引用，不再逐个重组字典
+                if get_robot_summaries_versioned:
+                    robots, version = get_robot_summaries_versioned()
+                else:
+                    robots, version = get_robot_summaries(), None
+                if len(robots) >= ROBOTS_STREAM_THRESHOLD:
+                    # 流式输出前无法得到内容摘要，ETag按摘要版本计算，内容未变化时可返回 304
+                    etag = f'W/"{version}"' if version else None
+                    return JSONListStream("robots", robots, {"total": len(robots)}, etag=etag)
+                return {
+                    "robots": robots,
+                    "total": len(robots)
+                }
+            
+            # 一次取回全部机器人状态；实例管理器不支持批量查询时逐个查询
+            statuses = instance_manager.get_robot_status().get("robots")
+            if isinstance(statuses, dict):
+                items = list(statuses.items())
+            else:
+                items = [(robot_id, instance_manager.get_robot_status(robot_id))
+                         for robot_id in instance_manager.get_robot_list()]
             
+            if len(items) >= ROBOTS_STREAM_THRESHOLD:
+                # 大型车队边投影边输出，不必先构造完整列表
+                return JSONListStream("robots", map(_project_robot, items), {"total": len(items)})
+            
+            robots = list(map(_project_robot, items))
             return {
                 "robots": robots,
                 "total": len(robots)
             }
         except Exception as e:
-            logger.error(f"获取机器人列表失败: {e}")
+            logger.error("获取机器人列表失败: %s", e)
             return {"error": str(e)}
     
-    @registry.get("/api/robots/{robot_id}/status", "获取指定机器人状态")
-    def get_robot_status(request: Dict[str, Any]) -> Dict[str, Any]:
+    @registry.get("/api/robots/{robot_id}/status", "获取指定机器人状态", cache_ttl=RESPONSE_CACHE_TTL)
+    def get_robot_status(request: Dict[str, Any], robot_id: str) -> Dict[str, Any]:
         """获取指定机器人状态"""
         try:
-            robot_id = request["path_params"]["robot_id"]
             status = instance_manager.get_robot_status(robot_id)
             
             if not status:
@@ -65,17 +130,13 @@ def register_robot_routes(instance_manager):
             
             return status
         except Exception as e:
-            logger.error(f"获取机器人状态失败: {e}")
+            logger.error("获取机器人状态失败: %s", e)
             return {"error": str(e)}
     
-    @registry.get("/api/health", "健康检查")
+    @registry.get("/api/health", "健康检查", const=HEALTH_RESPONSE)
     def health_check(request: Dict[str, Any]) -> Dict[str, Any]:
         """健康检查"""
-        return {
-            "status": "healthy",
-            "service": "SimulatorAGV",
-            "version": "1.0.0"
-        }
+        return HEALTH_RESPONSE
     
     @registry.post("/api/robots", "创建新机器人")
     def create_robot(request: Dict[str, Any]) -> Dict[str, Any]:
@@ -97,117 +158,101 @@ def register_robot_routes(instance_manager):
                 return {"error": "创建机器人失败"}
                 
         except Exception as e:
-            logger.error(f"创建机器人失败: {e}")
+            logger.error("创建机器人失败: %s", e)
             return {"error": str(e)}
     
     @registry.put("/api/robots/{robot_id}", "更新机器人信息")
-    def update_robot(request: Dict[str, Any]) -> Dict[str, Any]:
+    def update_robot(request: Dict[str, Any], robot_id: str) -> Dict[str, Any]:
         """更新机器人信息：
         - 将名称、类型、IP、厂商写入 registered_robots.json
         - 其余配置合并写入 robot_data/<serial>/state/current_state.json
         """
         try:
-            import os
-            from pathlib import Path
             from ..services.file_storage_manager import get_file_storage_manager
+            from ..services.registry_file_cache import get_registry_file_cache
 
 
-            robot_id = request["path_params"]["robot_id"]
             update_data = request.get("body", {}) or {}
 
             # 允许 body 中提供 serialNumber，但以路径参数为准
             serial_number = str(update_data.get("serialNumber") or robot_id)
 
-            # 1) 更新注册文件 registered_robots.json
-            registry_path = instance_manager.registry_path or os.path.join(os.getcwd(), "registered_robots.json")
-            robots_list = []
-            try:
-                if os.path.exists(registry_path):
-                    with open(registry_path, 'r', encoding='utf-8') as f:
-                        robots_list = json.load(f) or []
-            except Exception as e:
-                logger.warning(f"读取注册文件失败，使用空列表: {e}")
-                robots_list = []
-
-            # 查找并更新或追加条目
-            found = False
-            for robot in robots_list:
-                if robot.get("serialNumber") == serial_number:
-                    # 基本信息同步
-                    name_val = update_data.get("name") or update_data.get("robot_name")
-                    if name_val:
-                        robot["name"] = name_val
-                    if "type" in update_data:
-                        robot["type"] = update_data["type"]
-                    if "ip" in update_data:
-                        robot["ip"] = update_data["ip"]
-                    if "manufacturer" in update_data:
-                        robot["manufacturer"] = update_data["manufacturer"]
-                    found = True
-                    break
-            if not found:
-                # 若不存在则追加
-                new_entry = {
-                    "serialNumber": serial_number,
-                    "manufacturer": update_data.get("manufacturer", "SimulatorAGV"),
-                    "type": update_data.get("type", "AGV"),
-                    "ip": update_data.get("ip", "127.0.0.1"),
-                }
-                name_val = update_data.get("name") or update_data.get("robot_name")
-                if name_val:
-                    new_entry["name"] = name_val
-                robots_list.append(new_entry)
-
-            # 写回注册文件
-            try:
-                with open(registry_path, 'w', encoding='utf-8') as f:
-                    json.dump(robots_list, f, ensure_ascii=False, indent=2)
-            except Exception as e:
-                logger.error(f"写入注册文件失败: {e}")
-                return {"error": f"注册文件写入失败: {str(e)}"}
+            # 同一机器人的注册信息和状态文件更新在分片锁内串行执行，
+            # 避免并发的读取-合并-写入互相覆盖；不同机器人的更新互不阻塞
+            with _serial_lock(serial_number):
+                # 1) 更新注册文件 registered_robots.json
+                # 在内存视图中修改，由缓存延迟合并写回（临时文件 + 原子替换）
+                registry_path = instance_manager.registry_path or os.path.join(os.getcwd(), "registered_robots.json")
+                registry_cache = get_registry_file_cache(registry_path)
+                with registry_cache.edit():
+                    # 按序列号索引查找并更新或追加条目
+                    robot = registry_cache.find(serial_number)
+                    if robot is not None:
+                        # 基本信息同步
+                        name_val = update_data.get("name") or update_data.get("robot_name")
+                        if name_val:
+                            robot["name"] = name_val
+                        if "type" in update_data:
+                            robot["type"] = update_data["type"]
+                        if "ip" in update_data:
+                            robot["ip"] = update_data["ip"]
+                        if "manufacturer" in update_data:
+                            robot["manufacturer"] = update_data["manufacturer"]
+                    else:
+                        # 若不存在则追加
+                        new_entry = {
+                            "serialNumber": serial_number,
+                            "manufacturer": update_data.get("manufacturer", "SimulatorAGV"),
+                            "type": update_data.get("type", "AGV"),
+                            "ip": update_data.get("ip", "127.0.0.1"),
+                        }
+                        name_val = update_data.get("name") or update_data.get("robot_name")
+                        if name_val:
+                            new_entry["name"] = name_val
+                        registry_cache.append(new_entry)
 
-            # 2) 合并其他配置到 current_state.json
-            fs = get_file_storage_manager()
-            state_file = Path(fs.base_path) / serial_number / "state" / "current_state.json"
+                # 2) 合并其他配置到 current_state.json
+                fs = get_file_storage_manager()
+                state_file = _state_file_path(fs.base_path, serial_number)
 
-            existing_state = {}
-            try:
-                if state_file.exists():
-                    with open(state_file, 'r', encoding='utf-8') as f:
-                        existing_state = json.load(f) or {}
-            except Exception as e:
-                logger.warning(f"读取现有状态文件失败，使用空状态: {e}")
                 existing_state = {}
+                try:
+                    if os.path.exists(state_file):
+                        with open(state_file, 'rb') as f:
+                            existing_state = from_json_bytes(f.read()) or {}
+                except Exception as e:
+                    logger.warning("读取现有状态文件失败，使用空状态: %s", e)
+                    existing_state = {}
 
-            # 准备待合并的配置字段
-            merged_state = dict(existing_state)
-            if "battery" in update_data:
-                merged_state["battery"] = update_data["battery"]
-            if "maxSpeed" in update_data:
-                merged_state["maxSpeed"] = update_data["maxSpeed"]
-            # orientation 可能在 config.orientation 或直接提供
-            orientation = None
-            if isinstance(update_data.get("config"), dict) and "orientation" in update_data["config"]:
-                orientation = update_data["config"]["orientation"]
-            elif "orientation" in update_data:
-                orientation = update_data["orientation"]
-            if orientation is not None:
-                merged_state["orientation"] = orientation
-            # 初始位置：保存其 ID 以便追踪
-            if "initialPosition" in update_data:
-                merged_state["initialPositionId"] = update_data["initialPosition"]
-            # 版本
-            if "version" in update_data:
-                merged_state["version"] = update_data["version"]
-            # 标识冗余保存，便于外部关联
-            merged_state["serialNumber"] = serial_number
+                # 准备待合并的配置字段
+                merged_state = dict(existing_state)
+                if "battery" in update_data:
+                    merged_state["battery"] = update_data["battery"]
+                if "maxSpeed" in update_data:
+                    merged_state["maxSpeed"] = update_data["maxSpeed"]
+                # orientation 可能在 config.orientation 或直接提供
+                orientation = None
+                if isinstance(update_data.get("config"), dict) and "orientation" in update_data["config"]:
+                    orientation = update_data["config"]["orientation"]
+                elif "orientation" in update_data:
+                    orientation = update_data["orientation"]
+                if orientation is not None:
+                    merged_state["orientation"] = orientation
+                # 初始位置：保存其 ID 以便追踪
+                if "initialPosition" in update_data:
+                    merged_state["initialPositionId"] = update_data["initialPosition"]
+                # 版本
+                if "version" in update_data:
+                    merged_state["version"] = update_data["version"]
+                # 标识冗余保存，便于外部关联
+                merged_state["serialNumber"] = serial_number
 
-            # 保存合并后的状态
-            try:
-                fs.save_state(serial_number, merged_state)
-            except Exception as e:
-                logger.error(f"保存状态文件失败: {e}")
-                return {"error": f"状态文件保存失败: {str(e)}"}
+                # 保存合并后的状态
+                try:
+                    fs.save_state(serial_number, merged_state)
+                except Exception as e:
+                    logger.error("保存状态文件失败: %s", e)
+                    return {"error": f"状态文件保存失败: {str(e)}"}
 
             return {
                 "success": True,
@@ -215,15 +260,13 @@ def register_robot_routes(instance_manager):
             }
         
         except Exception as e:
-            logger.error(f"更新机器人失败: {e}")
+            logger.error("更新机器人失败: %s", e)
             return {"error": str(e)}
     
     @registry.delete("/api/robots/{robot_id}", "删除机器人")
-    def delete_robot(request: Dict[str, Any]) -> Dict[str, Any]:
+    def delete_robot(request: Dict[str, Any], robot_id: str) -> Dict[str, Any]:
         """删除机器人"""
         try:
-            robot_id = request["path_params"]["robot_id"]
-            
             success = instance_manager.remove_robot(robot_id)
             
             if success:
@@ -235,15 +278,13 @@ def register_robot_routes(instance_manager):
                 return {"error": f"删除机器人 {robot_id} 失败"}
                 
         except Exception as e:
-            logger.error(f"删除机器人失败: {e}")
+            logger.error("删除机器人失败: %s", e)
             return {"error": str(e)}
     
     @registry.post("/api/robots/{robot_id}/start", "启动机器人")
-    def start_robot(request: Dict[str, Any]) -> Dict[str, Any]:
+    def start_robot(request: Dict[str, Any], robot_id: str) -> Dict[str, Any]:
         """启动机器人"""
         try:
-            robot_id = request["path_params"]["robot_id"]
-            
             success = instance_manager.start_robot(robot_id)
             
             if success:
@@ -255,15 +296,13 @@ def register_robot_routes(instance_manager):
                 return {"error": f"启动机器人 {robot_id} 失败"}
                 
         except Exception as e:
-            logger.error(f"启动机器人失败: {e}")
+            logger.error("启动机器人失败: %s", e)
             return {"error": str(e)}
     
     @registry.post("/api/robots/{robot_id}/stop", "停止机器人")
-    def stop_robot(request: Dict[str, Any]) -> Dict[str, Any]:
+    def stop_robot(request: Dict[str, Any], robot_id: str) -> Dict[str, Any]:
         """停止机器人"""
         try:
-            robot_id = request["path_params"]["robot_id"]
-            
             success = instance_manager.stop_robot(robot_id)
             
             if success:
@@ -275,15 +314,13 @@ def register_robot_routes(instance_manager):
                 return {"error": f"停止机器人 {robot_id} 失败"}
                 
         except Exception as e:
-            logger.error(f"停止机器人失败: {e}")
+            logger.error("停止机器人失败: %s", e)
             return {"error": str(e)}
     
     @registry.post("/api/robots/{robot_id}/restart", "重启机器人")
-    def restart_robot(request: Dict[str, Any]) -> Dict[str, Any]:
+    def restart_robot(request: Dict[str, Any], robot_id: str) -> Dict[str, Any]:
         """重启机器人"""
         try:
-            robot_id = request["path_params"]["robot_id"]
-            
             success = instance_manager.restart_robot(robot_id)
             
             if success:
@@ -295,21 +332,19 @@ def register_robot_routes(instance_manager):
                 return {"error": f"重启机器人 {robot_id} 失败"}
                 
         except Exception as e:
-            logger.error(f"重启机器人失败: {e}")
+            logger.error("重启机器人失败: %s", e)
             return {"error": str(e)}
     
-    @registry.get("/api/robots/{robot_id}/config", "获取机器人配置")
-    def get_robot_config(request: Dict[str, Any]) -> Dict[str, Any]:
+    @registry.get("/api/robots/{robot_id}/config", "获取机器人配置", cache_ttl=RESPONSE_CACHE_TTL)
+    def get_robot_config(request: Dict[str, Any], robot_id: str) -> Dict[str, Any]:
         """获取机器人配置"""
         try:
-            robot_id = request["path_params"]["robot_id"]
-            
             robot_instance = instance_manager.get_robot_instance(robot_id)
             if not robot_instance:
                 return {"error": f"机器人 {robot_id} 不存在"}
             
             # 获取机器人配置
-            config = robot_instance.get_config() if hasattr(robot_instance, 'get_config') else {}
+            config = robot_instance.get_config() if supports(robot_instance, 'get_config') else {}
             
             return {
                 "robot_id": robot_id,
@@ -317,14 +352,13 @@ def register_robot_routes(instance_manager):
             }
             
         except Exception as e:
-            logger.error(f"获取机器人配置失败: {e}")
+            logger.error("获取机器人配置失败: %s", e)
             return {"error": str(e)}
     
     @registry.put("/api/robots/{robot_id}/config", "更新机器人配置")
-    def update_robot_config(request: Dict[str, Any]) -> Dict[str, Any]:
+    def update_robot_config(request: Dict[str, Any], robot_id: str) -> Dict[str, Any]:
         """更新机器人配置"""
         try:
-            robot_id = request["path_params"]["robot_id"]
             config_data = request.get("body", {})
             
             robot_instance = instance_manager.get_robot_instance(robot_id)
@@ -332,7 +366,7 @@ def register_robot_routes(instance_manager):
                 return {"error": f"机器人 {robot_id} 不存在"}
             
             # 更新机器人配置
-            if hasattr(robot_instance, 'update_config'):
+            if supports(robot_instance, 'update_config'):
                 success = robot_instance.update_config(config_data)
                 if success:
                     return {
@@ -345,7 +379,7 @@ def register_robot_routes(instance_manager):
                 return {"error": "机器人不支持配置更新"}
             
         except Exception as e:
-            logger.error(f"更新机器人配置失败: {e}")
+            logger.error("更新机器人配置失败: %s", e)
             return {"error": str(e)}
     
-    logger.info("机器人API路由注册完成")
\ No newline at end of file
+    registry.flush_log("机器人")
\ No newline at end of file
@@ -0,0 +1,273 @@
+"""
+API路由匹配
+registry.py 与 unified_api_server.py 共用的路由定义和查找结构：
+静态路由按字典查找，每个参数独占一段的路由由前缀树匹配，其余参数化路由合并为单个正则
+"""
+
+import functools
+import re
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from shared import setup_logger
+    logger = setup_logger(__name__)
+except ImportError:
+    import logging
+    logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_path_pattern(path: str) -> re.Pattern:
+    """将路径模式编译为正则表达式，相同的路径模板共享同一个编译结果"""
+    # 将 {param} 替换为命名捕获组
+    pattern = re.sub(r'\{([^}]+)\}', r'(?P<\1>[^/]+)', path)
+    # 配合 fullmatch 使用，无需 ^$ 锚点；[^/]+ 不会跨段回溯
+    return re.compile(pattern, re.ASCII)
+
+
+# 静态路由共享的空路径参数（只读）
+_NO_PARAMS: Mapping[str, str] = MappingProxyType({})
+
+
+class Route:
+    """
+    路由定义中与匹配相关的部分
+
+    路径模式中的 {param} 匹配单个路径段（不含 '/'），整条路径须完全匹配，
+    末尾多出的 '/' 不会被忽略。
+    """
+    def __init__(self, method: str, path: str, handler: Callable, description: str = ""):
+        self.method = method.upper()
+        self.path = path
+        self.handler = handler
+        self.description = description
+        # 不含 {param} 占位符的静态路由可直接按字典查找，无需正则匹配
+        self.is_static = '{' not in path
+        # 路径参数名，按在路径中出现的顺序
+        self.param_names: Tuple[str, ...] = tuple(re.findall(r'\{([^}]+)\}', path))
+        # 按 '/' 切分的路径段；每个参数都独占一整段时可由前缀树匹配
+        self.segments: Tuple[str, ...] = tuple(path.split('/'))
+        self.is_segmented = all(
+            '{' not in segment or (segment[0] == '{' and segment[-1] == '}' and segment.count('{') == 1)
+            for segment in self.segments
+        )
+        # 按路由形状选用匹配方式：静态路由直接比较字符串，每个参数独占一段的路由按段比较，
+        # 其余路由才使用正则
+        if self.is_static:
+            self.match = self._match_static
+        elif self.is_segmented:
+            self._literal_segments = tuple(
+                (index, segment) for index, segment in enumerate(self.segments) if not segment.startswith('{')
+            )
+            self._param_segments = tuple(
+                (index, segment[1:-1]) for index, segment in enumerate(self.segments) if segment.startswith('{')
+            )
+            self.match = self._match_segments
+        else:
+            self.match = self._match_pattern
+
+    @property
+    def path_pattern(self) -> re.Pattern:
+        """路径模式对应的正则表达式（按需编译，相同模板共享）"""
+        return _compile_path_pattern(self.path)
+
+    def fused_pattern(self) -> str:
+        """返回用于合并正则的路径模式（参数段为无名捕获组，按 param_names 顺序）"""
+        return re.sub(r'\{([^}]+)\}', '([^/]+)', self.path)
+
+    def _match_static(self, path: str) -> Optional[Dict[str, str]]:
+        """检查路径是否匹配，返回路径参数（静态路由）"""
+        return {} if path == self.path else None
+
+    def _match_segments(self, path: str) -> Optional[Dict[str, str]]:
+        """检查路径是否匹配，返回路径参数（按段比较，参数段不能为空）"""
+        parts = path.split('/')
+        if len(parts) != len(self.segments):
+            return None
+        for index, segment in self._literal_segments:
+            if parts[index] != segment:
+                return None
+        params = {}
+        for index, name in self._param_segments:
+            value = parts[index]
+            if not value:
+                return None
+            params[name] = value
+        return params
+
+    def _match_pattern(self, path: str) -> Optional[Dict[str, str]]:
+        """检查路径是否匹配，返回路径参数（正则匹配）"""
+        match = self.path_pattern.fullmatch(path)
+        if match:
+            return match.groupdict()
+        return None
+
+
+class _TrieNode:
+    """路由前缀树节点：字面量子段、一个参数子段，以及在此结束的路由"""
+    __slots__ = ('literals', 'param', 'route')
+
+    def __init__(self):
+        self.literals: Dict[str, '_TrieNode'] = {}
+        self.param: Optional['_TrieNode'] = None
+        self.route: Optional[Route] = None
+
+    def insert(self, route: Route):
+        """按路径段插入路由，同一形状的路由保留先注册者"""
+        node = self
+        for segment in route.segments:
+            if segment.startswith('{'):
+                if node.param is None:
+                    node.param = _TrieNode()
+                node = node.param
+            else:
+                child = node.literals.get(segment)
+                if child is None:
+                    child = node.literals[segment] = _TrieNode()
+                node = child
+        if node.route is None:
+            node.route = route
+
+    def lookup(self, segments: List[str], index: int, values: List[str]) -> Optional[Route]:
+        """
+        逐段匹配路径，字面量段优先于参数段，字面量分支匹配失败时回溯到参数分支
+        匹配到的参数值按顺序追加到 values
+        """
+        if index == len(segments):
+            return self.route
+        segment = segments[index]
+        child = self.literals.get(segment)
+        if child is not None:
+            route = child.lookup(segments, index + 1, values)
+            if route is not None:
+                return route
+        # 参数段与 [^/]+ 一致，不匹配空段
+        if self.param is not None and segment:
+            values.append(segment)
+            route = self.param.lookup(segments, index + 1, values)
+            if route is not None:
+                return route
+            values.pop()
+        return None
+
+
+class RouteTable:
+    """路由表：保存已注册的路由并按 (方法, 路径) 查找，子类负责构造具体的路由对象"""
+    def __init__(self):
+        self.routes: List[Route] = []
+        # 尚未输出到日志的已注册路由，由 flush_log 汇总输出
+        self._pending_names: List[str] = []
+        # 按方法分组的参数化路由，以及 (method, path) -> 静态路由 的分发表
+        self._by_method: Dict[str, List[Route]] = {}
+        self._static: Dict[Tuple[str, str], Route] = {}
+        # 每个方法的参数化路由按路径段构建前缀树，在注册后首次查找时惰性重建
+        self._tries: Dict[str, _TrieNode] = {}
+        # 参数与字面量混在同一段内的路由（如 /files/{name}.json）无法按段匹配，合并为单个正则
+        self._fused: Dict[str, Optional[Tuple[re.Pattern, Dict[int, Tuple[Route, Tuple[int, ...]]]]]] = {}
+        # 参数化路由的查找结果缓存：轮询请求反复访问相同路径（如同一机器人的状态），
+        # 命中时只需一次C实现的缓存查找；注册新路由时清空
+        self._match_dynamic = functools.lru_cache(maxsize=1024)(self._find_dynamic_route)
+
+    def add_route(self, route: Route):
+        """加入路由，同一路径重复注册时保持先注册者优先"""
+        self.routes.append(route)
+        if route.is_static:
+            self._static.setdefault((route.method, route.path), route)
+        else:
+            self._by_method.setdefault(route.method, []).append(route)
+            self._tries.pop(route.method, None)
+            self._fused.pop(route.method, None)
+            self._match_dynamic.cache_clear()
+        self._pending_names.append(f"{route.method} {route.path}")
+
+    def flush_log(self, group: str = ""):
+        """将上次输出之后注册的路由汇总为一行日志输出，在各模块注册完路由后调用"""
+        names, self._pending_names = self._pending_names, []
+        if names:
+            logger.info("%sAPI路由注册完成，共 %d 个: %s", group, len(names), ", ".join(names))
+
+    def find_route(self, method: str, path: str) -> Optional[Tuple[Route, Mapping[str, str]]]:
+        """查找匹配的路由，返回 (route, path_params)，路径参数为只读映射"""
+        method = method.upper()
+        route = self._static.get((method, path))
+        if route is not None:
+            return route, _NO_PARAMS
+        return self._match_dynamic(method, path)
+
+    def _find_dynamic_route(self, method: str, path: str) -> Optional[Tuple[Route, Mapping[str, str]]]:
+        """在参数化路由中查找匹配的路由，结果由 _match_dynamic 缓存"""
+        trie = self._tries.get(method)
+        if trie is None:
+            trie = self._build_trie(method)
+        values: List[str] = []
+        route = trie.lookup(path.split('/'), 0, values)
+        if route is not None:
+            return route, MappingProxyType(dict(zip(route.param_names, values)))
+        if method not in self._fused:
+            self._build_fused(method)
+        fused = self._fused[method]
+        if fused is None:
+            return None
+        pattern, groups = fused
+        match = pattern.fullmatch(path)
+        if match is None:
+            return None
+        # 路由分组最后闭合，lastindex 即命中路由的分组序号；参数直接取自同一次匹配
+        route, indices = groups[match.lastindex]
+        return route, MappingProxyType(dict(zip(route.param_names, map(match.group, indices))))
+
+    def finalize(self):
+        """
+        路由注册完成后预先构建各方法的前缀树和合并正则，
+        避免首个请求承担构建开销；之后再注册路由时仍会惰性重建
+        """
+        for method in list(self._by_method):
+            self._build_trie(method)
+            self._build_fused(method)
+
+    def _build_trie(self, method: str) -> _TrieNode:
+        """将指定方法中可按段匹配的参数化路由构建为前缀树"""
+        root = _TrieNode()
+        for route in list(self._by_method.get(method, ())):
+            if route.is_segmented:
+                root.insert(route)
+        self._tries[method] = root
+        return root
+
+    def _build_fused(self, method: str) -> Optional[Tuple[re.Pattern, Dict[int, Tuple[Route, Tuple[int, ...]]]]]:
+        """
+        将指定方法中无法按段匹配的参数化路由合并为一个按注册顺序择一的正则
+
+        Returns:
+            (合并正则, 路由分组序号 -> (路由, 参数分组序号))；没有此类路由时为 None
+        """
+        routes = [route for route in list(self._by_method.get(method, ())) if not route.is_segmented]
+        if not routes:
+            self._fused[method] = None
+            return None
+        alternatives = []
+        groups = {}
+        group_index = 0
+        for route in routes:
+            # 每个路由占用一个外层分组，其后依次为该路由的参数分组
+            group_index += 1
+            param_count = len(route.param_names)
+            groups[group_index] = (route, tuple(range(group_index + 1, group_index + 1 + param_count)))
+            group_index += param_count
+            alternatives.append(f'({route.fused_pattern()})')
+        fused = (re.compile('|'.join(alternatives), re.ASCII), groups)
+        self._fused[method] = fused
+        return fused
+
+    def get_routes(self) -> List[Dict[str, str]]:
+        """获取所有注册的路由信息"""
+        return [
+            {
+                "method": route.method,
+                "path": route.path,
+                "description": route.description
+            }
+            for route in self.routes
+        ]
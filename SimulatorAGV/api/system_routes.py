@@ -2,14 +2,62 @@
 系统相关API路由
 """
 
-import json
 import os
-from typing import Dict, Any
-from .registry import get_api_server
+from collections import Counter
+from typing import Dict, Any, List
+from .registry import get_api_server, RawResponse
 from shared import setup_logger
 
+# 可选的msgpack编码，用于以二进制格式返回日志
+try:
+    import msgpack
+    _use_msgpack = True
+except ImportError:
+    _use_msgpack = False
+
 logger = setup_logger()
 
+# 从文件末尾向前读取日志时每次读取的字节数
+_TAIL_BLOCK_SIZE = 8192
+
+# 统计信息只含各状态的机器人数量，允许比其他接口更长的缓存时间（秒）
+STATS_CACHE_TTL = 1.0
+
+
+def _tail_lines(path: str, count: int) -> List[bytes]:
+    """
+    读取文件的最后 count 行（未解码的字节串，不含换行符）
+    只按换行符（LF）分行，行内单独的回车符（CR）不视为换行
+    从文件末尾按块向前读取，直到读到足够的换行符，读取量只与所需行数有关，与文件大小无关；
+    count 不大于0时返回全部行
+    """
+    with open(path, 'rb') as f:
+        if count <= 0:
+            data = f.read()
+        else:
+            pos = f.seek(0, os.SEEK_END)
+            blocks: List[bytes] = []
+            newlines = 0
+            # 多读一个换行符，保证最前面一行是完整的
+            while pos > 0 and newlines <= count:
+                size = min(_TAIL_BLOCK_SIZE, pos)
+                pos -= size
+                f.seek(pos)
+                block = f.read(size)
+                blocks.append(block)
+                newlines += block.count(b'\n')
+            data = b''.join(reversed(blocks))
+    lines = data.split(b'\n')
+    if lines[-1] == b'':
+        # 以换行符结尾的文件最后会多出一个空元素
+        lines.pop()
+    if count > 0:
+        if pos > 0:
+            # 第一行可能只读到一部分
+            lines = lines[1:]
+        lines = lines[-count:]
+    return lines
+
 
 def register_system_routes(instance_manager):
     """注册系统相关的API路由"""
@@ -17,6 +65,11 @@ def register_system_routes(instance_manager):
     server = get_api_server()
     registry = server.get_registry()
     
+    # 实例管理器的可选方法在注册时解析一次，处理器中不再逐次检查
+    get_robot_summaries = getattr(instance_manager, 'get_robot_summaries', None)
+    get_status_counts = getattr(instance_manager, 'get_status_counts', None)
+    reload_robots = getattr(instance_manager, '_reload_robots_from_registry', None)
+    
     @registry.get("/api/system/info", "获取系统信息")
     def get_system_info(request: Dict[str, Any]) -> Dict[str, Any]:
         """获取系统信息"""
@@ -30,36 +83,39 @@ def register_system_routes(instance_manager):
                 "working_directory": os.getcwd()
             }
         except Exception as e:
-            logger.error(f"获取系统信息失败: {e}")
+            logger.error("获取系统信息失败: %s", e)
             return {"error": str(e)}
     
-    @registry.get("/api/system/stats", "获取系统统计信息")
+    @registry.get("/api/system/stats", "获取系统统计信息", cache_ttl=STATS_CACHE_TTL)
     def get_system_stats(request: Dict[str, Any]) -> Dict[str, Any]:
         """获取系统统计信息"""
         try:
+            if get_status_counts:
+                # 实例管理器维护的状态码表直接给出各状态的数量
+                counts = get_status_counts()
+            elif get_robot_summaries:
+                # 一次加锁取得全部状态摘要，按状态计数
+                counts = Counter(
+                    summary.get("status", "unknown").lower()
+                    for summary in get_robot_summaries()
+                )
+            else:
+                counts = Counter(
+                    instance_manager.get_robot_status(robot_id).get("status", "unknown").lower()
+                    for robot_id in instance_manager.get_robot_list()
+                )
+            
             stats = {
                 "total_robots": instance_manager.get_robot_count(),
-                "running_robots": 0,
-                "idle_robots": 0,
-                "error_robots": 0
+                "running_robots": counts["running"],
+                "idle_robots": counts["idle"],
+                "error_robots": counts["error"] + counts["fault"]
             }
             
-            # 统计各状态机器人数量
-            for robot_id in instance_manager.get_robot_list():
-                robot_status = instance_manager.get_robot_status(robot_id)
-                status = robot_status.get("status", "unknown").lower()
-                
-                if status == "running":
-                    stats["running_robots"] += 1
-                elif status == "idle":
-                    stats["idle_robots"] += 1
-                elif status in ["error", "fault"]:
-                    stats["error_robots"] += 1
-            
             return stats
             
         except Exception as e:
-            logger.error(f"获取系统统计信息失败: {e}")
+            logger.error("获取系统统计信息失败: %s", e)
             return {"error": str(e)}
     
     @registry.get("/api/system/config", "获取系统配置")
@@ -78,7 +134,7 @@ def register_system_routes(instance_manager):
             }
             
         except Exception as e:
-            logger.error(f"获取系统配置失败: {e}")
+            logger.error("获取系统配置失败: %s", e)
             return {"error": str(e)}
     
     @registry.post("/api/system/reload-config", "重新加载配置")
@@ -86,8 +142,8 @@ def register_system_routes(instance_manager):
         """重新加载配置"""
         try:
             # 重新加载机器人注册信息
-            if hasattr(instance_manager, '_reload_robots_from_registry'):
-                instance_manager._reload_robots_from_registry()
+            if reload_robots:
+                reload_robots()
                 return {
                     "success": True,
                     "message": "配置重新加载成功"
@@ -96,7 +152,7 @@ def register_system_routes(instance_manager):
                 return {"error": "系统不支持配置重新加载"}
             
         except Exception as e:
-            logger.error(f"重新加载配置失败: {e}")
+            logger.error("重新加载配置失败: %s", e)
             return {"error": str(e)}
     
     @registry.post("/api/system/start-all", "启动所有机器人")
@@ -111,7 +167,7 @@ def register_system_routes(instance_manager):
             }
             
         except Exception as e:
-            logger.error(f"启动所有机器人失败: {e}")
+            logger.error("启动所有机器人失败: %s", e)
             return {"error": str(e)}
     
     @registry.post("/api/system/stop-all", "停止所有机器人")
@@ -126,7 +182,7 @@ def register_system_routes(instance_manager):
             }
             
         except Exception as e:
-            logger.error(f"停止所有机器人失败: {e}")
+            logger.error("停止所有机器人失败: %s", e)
             return {"error": str(e)}
     
     @registry.get("/api/system/logs", "获取系统日志")
@@ -135,16 +191,27 @@ def register_system_routes(instance_manager):
         try:
             query_params = request.get("query_params", {})
             lines = int(query_params.get("lines", [100])[0])
+            # 输出格式：json（默认）、raw（纯文本，逐行原样输出）、msgpack
+            output_format = query_params.get("format", ["json"])[0]
+            if output_format == "msgpack" and not _use_msgpack:
+                return {"error": "msgpack未安装，不支持 format=msgpack"}
             
             # 读取日志文件
             log_file = "logs/SimulatorAGV.logs"
-            logs = []
+            raw_lines = _tail_lines(log_file, lines) if os.path.exists(log_file) else []
+            
+            if output_format == "raw":
+                # 日志行不解码、不做JSON转义，直接拼接输出
+                body = b"\n".join(raw_lines)
+                return RawResponse(body + b"\n" if body else body, "text/plain; charset=utf-8")
             
-            if os.path.exists(log_file):
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    all_lines = f.readlines()
-                    logs = all_lines[-lines:] if len(all_lines) > lines else all_lines
-                    logs = [line.strip() for line in logs]
+            logs = [line.decode('utf-8', errors='replace').strip() for line in raw_lines]
+            
+            if output_format == "msgpack":
+                return RawResponse(
+                    msgpack.packb({"logs": logs, "total_lines": len(logs), "log_file": log_file}),
+                    "application/msgpack"
+                )
             
             return {
                 "logs": logs,
@@ -153,21 +220,18 @@ def register_system_routes(instance_manager):
             }
             
         except Exception as e:
-            logger.error(f"获取系统日志失败: {e}")
+            logger.error("获取系统日志失败: %s", e)
             return {"error": str(e)}
     
     @registry.get("/api/routes", "获取所有API路由")
     def get_api_routes(request: Dict[str, Any]) -> Dict[str, Any]:
         """获取所有API路由"""
         try:
-            routes = server.get_registry().get_routes()
-            return {
-                "routes": routes,
-                "total": len(routes)
-            }
+            # 路由表在启动后不再变化，直接返回注册表中预先编码的响应
+            return server.get_registry().get_routes_info()
             
         except Exception as e:
-            logger.error(f"获取API路由失败: {e}")
+            logger.error("获取API路由失败: %s", e)
             return {"error": str(e)}
     
-    logger.info("系统API路由注册完成")
\ No newline at end of file
+    registry.flush_log("系统")
\ No newline at end of file
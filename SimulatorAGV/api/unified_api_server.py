@@ -2,11 +2,14 @@
 统一的API服务器实现
 使用共享HTTP服务器基类，整合现有的API路由功能
 """
-import re
+import inspect
+import threading
 from typing import Dict, Any, List, Callable, Optional, Tuple
 from dataclasses import is_dataclass
 from datetime import datetime
 
+from .routing import Route, RouteTable
+
 try:
     from shared import BaseHTTPServer, setup_logger, safe_serialize
     _use_shared_base = True
@@ -19,39 +22,66 @@ if _use_shared_base:
     logger = setup_logger()
 
 
-class APIRoute:
-    """API路由定义"""
+# 处理器可按关键字接收的请求数据：形参名 -> 在 handle_custom_route 参数中的位置
+_HANDLER_EXTRAS = {'query': 0, 'body': 1, 'headers': 2}
+
+
+def _bind_handler(handler: Callable, param_names: Tuple[str, ...]) -> Callable:
+    """
+    根据处理器签名构造调用适配器，签名只在注册时解析一次
+
+    形参中含有路径参数名的处理器按关键字调用，如 handler(robot_id, body=None)；
+    不含路径参数名、但能接受四个位置参数的处理器沿用
+    handler(query_params, request_data, headers, path_params) 的调用方式（第三个形参通常名为 headers）；
+    其余含有 query/body/headers 形参的处理器按关键字调用
+
+    Returns:
+        以 (query_params, request_data, headers, path_params) 调用的可调用对象
+    """
+    try:
+        parameters = inspect.signature(handler).parameters
+    except (TypeError, ValueError):
+        return handler
+    if not any(name in parameters for name in param_names):
+        kinds = [parameter.kind for parameter in parameters.values()]
+        positional = sum(kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+                         for kind in kinds)
+        if positional >= 4 or inspect.Parameter.VAR_POSITIONAL in kinds:
+            return handler
+    extras = tuple((name, index) for name, index in _HANDLER_EXTRAS.items() if name in parameters)
+    if not extras and not any(name in parameters for name in param_names):
+        return handler
+    if not extras:
+        def invoke(query_params, request_data, headers, path_params):
+            return handler(**path_params)
+    else:
+        def invoke(*args):
+            kwargs = dict(args[3])
+            for name, index in extras:
+                kwargs[name] = args[index]
+            return handler(**kwargs)
+    return invoke
+
+
+class APIRoute(Route):
+    """API路由定义，路径匹配由 Route 实现，处理器调用方式按签名预先绑定"""
     def __init__(self, method: str, path: str, handler: Callable, description: str = ""):
-        self.method = method.upper()
-        self.path = path
-        self.handler = handler
-        self.description = description
-        self.path_pattern = self._compile_path_pattern(path)
-    
-    def _compile_path_pattern(self, path: str):
-        """将路径模式编译为正则表达式"""
-        # 将 {param} 替换为命名捕获组
-        pattern = re.sub(r'\{([^}]+)\}', r'(?P<\1>[^/]+)', path)
-        return re.compile(f'^{pattern}$')
-    
-    def match(self, path: str) -> Optional[Dict[str, str]]:
-        """检查路径是否匹配，返回路径参数"""
-        match = self.path_pattern.match(path)
-        if match:
-            return match.groupdict()
-        return None
+        super().__init__(method, path, handler, description)
+        # 按处理器签名预先绑定的调用方式
+        self.invoke = _bind_handler(handler, self.param_names)
 
 
-class APIRegistry:
+class APIRegistry(RouteTable):
     """API路由注册表"""
     def __init__(self):
-        self.routes: List[APIRoute] = []
+        super().__init__()
+        # 路由信息列表，首次查询时构建，注册新路由时失效
+        self._routes_info: Optional[List[Dict[str, str]]] = None
     
     def register(self, method: str, path: str, handler: Callable, description: str = ""):
         """注册API路由"""
-        route = APIRoute(method, path, handler, description)
-        self.routes.append(route)
-        logger.info(f"注册API路由: {method} {path}")
+        self.add_route(APIRoute(method, path, handler, description))
+        self._routes_info = None
     
     def get(self, path: str, description: str = ""):
         """注册GET路由的装饰器"""
@@ -81,25 +111,12 @@ class APIRegistry:
             return handler
         return decorator
     
-    def find_route(self, method: str, path: str) -> Optional[Tuple[APIRoute, Dict[str, str]]]:
-        """查找匹配的路由"""
-        for route in self.routes:
-            if route.method == method.upper():
-                params = route.match(path)
-                if params is not None:
-                    return route, params
-        return None
-    
     def get_routes_info(self) -> List[Dict[str, str]]:
-        """获取所有路由信息"""
-        return [
-            {
-                "method": route.method,
-                "path": route.path,
-                "description": route.description
-            }
-            for route in self.routes
-        ]
+        """获取所有路由信息（构建一次后复用，调用方只读）"""
+        routes_info = self._routes_info
+        if routes_info is None:
+            routes_info = self._routes_info = self.get_routes()
+        return routes_info
 
 
 def safe_json_serialize(obj):
@@ -153,13 +170,13 @@ if _use_shared_base:
                 route, path_params = route_match
                 try:
                     # 调用路由处理器
-                    result = route.handler(query_params, request_data, headers, path_params)
+                    result = route.invoke(query_params, request_data, headers, path_params)
                     if isinstance(result, tuple):
                         return result
                     else:
                         return result, 200
                 except Exception as e:
-                    self.logger.error(f"路由处理器执行失败: {e}")
+                    self.logger.error("路由处理器执行失败: %s", e)
                     return {"error": "路由处理失败", "message": str(e)}, 500
             
             return None
@@ -208,42 +225,51 @@ else:
         
         def start(self, blocking: bool = False):
             """启动服务器（简化实现）"""
-            logger.info(f"{self.server_name} 启动在 http://{self.host}:{self.port}")
+            logger.info("%s 启动在 http://%s:%s", self.server_name, self.host, self.port)
             logger.warning("请使用完整的共享模块以获得完整功能")
         
         def stop(self):
             """停止服务器"""
-            logger.info(f"{self.server_name} 已停止")
+            logger.info("%s 已停止", self.server_name)
 
 
 # 全局API服务器实例
 _api_server: Optional[UnifiedAPIServer] = None
+# 保护单例的创建和销毁，已创建后的读取不需要加锁
+_api_server_lock = threading.Lock()
 
 
 def get_api_server() -> UnifiedAPIServer:
-    """获取全局API服务器实例"""
+    """获取全局API服务器实例（线程安全，多个线程同时调用时只创建一个实例）"""
     global _api_server
-    if _api_server is None:
-        _api_server = UnifiedAPIServer()
-    return _api_server
+    server = _api_server
+    if server is not None:
+        return server
+    with _api_server_lock:
+        if _api_server is None:
+            _api_server = UnifiedAPIServer()
+        return _api_server
 
 
 def start_api_server(host: str = 'localhost', port: int = 8000, blocking: bool = False) -> UnifiedAPIServer:
     """启动API服务器"""
     global _api_server
-    if _api_server is None:
-        _api_server = UnifiedAPIServer(host, port)
+    with _api_server_lock:
+        if _api_server is None:
+            _api_server = UnifiedAPIServer(host, port)
+        server = _api_server
     
-    _api_server.start(blocking=blocking)
-    return _api_server
+    server.start(blocking=blocking)
+    return server
 
 
 def stop_api_server():
     """停止API服务器"""
     global _api_server
-    if _api_server:
-        _api_server.stop()
-        _api_server = None
+    with _api_server_lock:
+        server, _api_server = _api_server, None
+    if server:
+        server.stop()
 
 
 def register_route(method: str, path: str, handler: Callable, description: str = ""):
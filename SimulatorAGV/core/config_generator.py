@@ -1,9 +1,62 @@
-import json
-import copy
-from typing import Dict, Any
-from datetime import datetime
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
 import uuid
 
+from shared import to_json_bytes, from_json_bytes
+from ..services.registry_file_cache import get_registry_file_cache
+
+# 基础配置文件路径 -> (文件修改时间, 文件内容)，文件未变化时不再重复读取
+_base_config_cache: Dict[str, Tuple[int, bytes]] = {}
+_base_config_cache_lock = threading.Lock()
+
+# 机器人配置文件路径 -> 写入后的 (文件修改时间, 大小, 内容摘要)，内容未变化时跳过写入
+_written_configs: Dict[str, Tuple[int, int, bytes]] = {}
+
+# 机器人配置中各机器人相同的MQTT连接参数和车辆协议版本
+_MQTT_DEFAULTS: Dict[str, Any] = {
+    "host": "localhost",
+    "port": 1883,
+    "vda_interface": "uagv"
+}
+_VEHICLE_DEFAULTS: Dict[str, Any] = {
+    "vda_version": "v2",
+    "vda_full_version": "2.0.0"
+}
+
+# 机器人配置中与具体机器人无关的运行参数（值均为不可变对象，浅拷贝即得到独立副本）
+_ROBOT_SETTINGS: Dict[str, Any] = {
+    "map_id": "default",
+    "state_frequency": 1,
+    "visualization_frequency": 1,
+    "action_time": 1.0,
+    "robot_count": 1,
+    "speed": 0.05,
+    "initial_x": 0.0,
+    "initial_y": 0.0,
+    "initial_theta": 0.0,
+    "initial_battery": 100.0,
+    "max_speed": 2.0,
+    "initial_orientation": 0,
+    "initial_position": "0"
+}
+
+
+def _read_base_config(path: str) -> bytes:
+    """读取基础配置文件内容，文件修改时间未变时直接返回缓存的内容"""
+    key = os.path.abspath(path)
+    mtime_ns = os.stat(key).st_mtime_ns
+    cached = _base_config_cache.get(key)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    with open(key, 'rb') as f:
+        data = f.read()
+    with _base_config_cache_lock:
+        _base_config_cache[key] = (mtime_ns, data)
+    return data
+
 
 class ConfigGenerator:
     """配置生成器，为每个机器人实例生成独立的配置"""
@@ -30,8 +83,7 @@ class ConfigGenerator:
     def _load_base_config(self) -> Dict[str, Any]:
         """加载基础配置文件 (回退方法)"""
         try:
-            with open(self.base_config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return from_json_bytes(_read_base_config(self.base_config_path))
         except FileNotFoundError:
             # 如果配置文件不存在，返回默认配置
             return self._get_default_config()
@@ -60,46 +112,47 @@ class ConfigGenerator:
             }
         }
     
-    def generate_robot_config(self, robot_info: Dict[str, Any]) -> Dict[str, Any]:
+    def generate_robot_config(self, robot_info: Dict[str, Any], unsafe: bool = False,
+                              timestamp: Optional[int] = None) -> Dict[str, Any]:
         """
         为单个机器人生成配置
         
         Args:
             robot_info: 机器人信息，包含id, serialNumber, manufacturer, type, ip
+            unsafe: 为 True 时各机器人共享同一份 settings 字典而不复制，
+                返回的配置只能读取（如直接序列化），不能修改
+            timestamp: client_id 中使用的时间戳（秒），默认取当前时间；
+                批量生成时可传入同一个值
             
         Returns:
             机器人的完整配置
         """
+        # 随机的默认标识只在注册信息缺少对应字段时生成
+        if "serialNumber" in robot_info:
+            # 使用serialNumber作为robot_id
+            serial_number = robot_id = robot_info["serialNumber"]
+        else:
+            serial_number = f"AMB-{uuid.uuid4().hex[:6]}"
+            robot_id = robot_info["id"] if "id" in robot_info else str(uuid.uuid4())
+
+        manufacturer = robot_info.get("manufacturer", "SimulatorAGV")
+        if timestamp is None:
+            timestamp = int(time.time())
+        settings = _ROBOT_SETTINGS if unsafe else dict(_ROBOT_SETTINGS)
+
         # 使用新的配置格式
         robot_config = {
             "mqtt_broker": {
-                "host": "localhost",
-                "port": 1883,
-                "vda_interface": "uagv",
-                "client_id": f"{robot_info.get('manufacturer', 'SimulatorAGV')}_{robot_info.get('serialNumber', 'AMB-01')}_{int(datetime.now().timestamp())}"
+                **_MQTT_DEFAULTS,
+                "client_id": f"{manufacturer}_{robot_info.get('serialNumber', 'AMB-01')}_{timestamp}"
             },
             "vehicle": {
-                "serial_number": robot_info.get("serialNumber", f"AMB-{uuid.uuid4().hex[:6]}"),
-                "manufacturer": robot_info.get("manufacturer", "SimulatorAGV"),
-                "vda_version": "v2",
-                "vda_full_version": "2.0.0"
-            },
-            "settings": {
-                "map_id": "default",
-                "state_frequency": 1,
-                "visualization_frequency": 1,
-                "action_time": 1.0,
-                "robot_count": 1,
-                "speed": 0.05,
-                "initial_x": 0.0,
-                "initial_y": 0.0,
-                "initial_theta": 0.0,
-                "initial_battery": 100.0,
-                "max_speed": 2.0,
-                "initial_orientation": 0,
-                "initial_position": "0"
+                "serial_number": serial_number,
+                "manufacturer": manufacturer,
+                **_VEHICLE_DEFAULTS
             },
-            "robot_id": robot_info.get("id", str(uuid.uuid4())),
+            "settings": settings,
+            "robot_id": robot_id,
             "robot_type": robot_info.get("type", "AMR")
         }
         
@@ -107,45 +160,70 @@ class ConfigGenerator:
         if "ip" in robot_info:
             robot_config["robot_ip"] = robot_info["ip"]
         
-        # 使用serialNumber作为robot_id
-        robot_config["robot_id"] = robot_info.get("serialNumber", robot_config["robot_id"])
-        
         return robot_config
     
-    def generate_configs_from_registry(self, registry_path: str) -> Dict[str, Dict[str, Any]]:
+    def generate_configs_from_registry(self, registry_path: str, unsafe: bool = False) -> Dict[str, Dict[str, Any]]:
         """
         从注册文件生成所有机器人的配置
         
         Args:
             registry_path: 注册文件路径
+            unsafe: 为 True 时各配置共享同一份 settings 字典（见 generate_robot_config），
+                返回的配置只能读取，不能修改
             
         Returns:
             字典，键为机器人序列号，值为配置
         """
-        try:
-            with open(registry_path, 'r', encoding='utf-8') as f:
-                robots = json.load(f)
-        except FileNotFoundError:
-            return {}
+        # 注册文件按修改时间缓存，文件不存在时为空列表，内容无法解析时抛出 RegistryFileError
+        robots = get_registry_file_cache(registry_path).load()
         
         configs = {}
+        # 同一批机器人共用一个时间戳，client_id 由序列号区分
+        timestamp = int(time.time())
         for robot in robots:
             # 使用serialNumber作为唯一标识符，如果没有则生成默认值
-            robot_id = robot.get("serialNumber", f"ROBOT-{uuid.uuid4().hex[:8]}")
-            configs[robot_id] = self.generate_robot_config(robot)
+            robot_id = robot["serialNumber"] if "serialNumber" in robot else f"ROBOT-{uuid.uuid4().hex[:8]}"
+            configs[robot_id] = self.generate_robot_config(robot, unsafe=unsafe, timestamp=timestamp)
         
         return configs
     
-    def save_robot_config(self, robot_config: Dict[str, Any], output_path: str):
+    def save_robot_config(self, robot_config: Dict[str, Any], output_path: str, pretty: bool = False) -> bool:
         """
-        保存机器人配置到文件
+        保存机器人配置到文件，文件内容与新配置相同时不重复写入
         
         Args:
             robot_config: 机器人配置
             output_path: 输出文件路径
+            pretty: 是否输出缩进格式（便于人工查看），默认输出紧凑格式
+            
+        Returns:
+            是否写入了文件
         """
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(robot_config, f, indent=2, ensure_ascii=False)
+        data = to_json_bytes(robot_config, indent=2 if pretty else None)
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        key = os.path.abspath(output_path)
+        try:
+            st = os.stat(key)
+        except FileNotFoundError:
+            st = None
+        if st is not None and st.st_size == len(data):
+            written = _written_configs.get(key)
+            if written is not None and written[:2] == (st.st_mtime_ns, st.st_size):
+                # 文件仍是上次写入的内容，只需比较摘要
+                unchanged = written[2] == digest
+            else:
+                with open(key, 'rb') as f:
+                    unchanged = f.read() == data
+            if unchanged:
+                _written_configs[key] = (st.st_mtime_ns, st.st_size, digest)
+                return False
+        
+        # 缓冲写入会在短写时继续写完剩余内容
+        with open(key, 'wb') as f:
+            f.write(data)
+        st = os.stat(key)
+        _written_configs[key] = (st.st_mtime_ns, st.st_size, digest)
+        return True
     
     def update_base_config(self, new_config: Dict[str, Any]):
         """
@@ -1,28 +1,156 @@
+import asyncio
+import functools
 import threading
 import time
 import signal
 import sys
 import os
-from typing import Dict, List, Optional, Any
-from datetime import datetime
-import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import threading
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+import hashlib
+import logging
+import queue
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
 # 添加项目路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from SimulatorAGV.services.file_storage_manager import get_file_storage_manager
+from SimulatorAGV.services.registry_file_cache import RegistryFileError, get_registry_file_cache
 from SimulatorAGV.core.robot_factory import RobotFactory
+from SimulatorAGV.core.status_table import StatusTable
 from SimulatorAGV.instances.robot_instance import RobotInstance
-from shared import setup_logger
+from shared import setup_logger, to_json_bytes
+
+# 可选的ASGI服务器，安装后由 uvicorn 承载状态API
+try:
+    import uvicorn
+    _use_uvicorn = True
+except ImportError:
+    _use_uvicorn = False
 
 logger = setup_logger()
 
 
+# 最近一次 /api/status 响应体及其ETag，响应内容未变化时复用，不再重新计算摘要
+_status_etag_cache = (b'', '')
+
+
+def _status_etag(body: bytes) -> str:
+    """计算状态响应的弱ETag"""
+    global _status_etag_cache
+    cached_body, cached_etag = _status_etag_cache
+    if body == cached_body:
+        return cached_etag
+    etag = 'W/"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+    _status_etag_cache = (body, etag)
+    return etag
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断 If-None-Match 请求头是否与ETag匹配（弱比较）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:]
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+@functools.lru_cache(maxsize=4096)
+def _json_key(key: str) -> bytes:
+    """JSON对象键的编码结果（含冒号），同一机器人的键只编码一次"""
+    return to_json_bytes(key) + b':'
+
+
+def _render_status(instance_manager, query: str) -> bytes:
+    """生成 /api/status 的响应体"""
+    if query and parse_qs(query).get('pretty', ['0'])[0] == '1':
+        # 仅在显式请求时输出缩进格式
+        return to_json_bytes(instance_manager.get_robot_status(), indent=2)
+    # 各机器人的状态JSON在状态变化后才重新生成，这里只做拼接
+    return instance_manager.get_robot_status_json()
+
+
+def create_status_asgi_app(instance_manager):
+    """
+    创建状态API的ASGI应用
+    
+    Args:
+        instance_manager: 实例管理器
+        
+    Returns:
+        ASGI应用可调用对象
+    """
+    
+    async def send_response(send, status: int, body: bytes = b'', headers=()):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'access-control-allow-origin', b'*'), *headers,
+                        (b'content-length', str(len(body)).encode('latin-1'))]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+    
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+        
+        if scope['path'] != '/api/status':
+            await send_response(send, 404, b'{"error":"Not Found"}', [(b'content-type', b'application/json')])
+            return
+        if scope['method'] != 'GET':
+            await send_response(send, 501, b'{"error":"Unsupported method"}', [(b'content-type', b'application/json')])
+            return
+        
+        try:
+            # 读取状态需要获取锁并可能读取状态文件，放到线程池中执行，避免阻塞事件循环
+            query = scope.get('query_string', b'').decode('latin-1')
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, _render_status, instance_manager, query)
+        except Exception as e:
+            logger.error(f"生成状态响应失败: {e}")
+            await send_response(send, 500, to_json_bytes({"error": f"Internal Server Error: {e}"}),
+                                [(b'content-type', b'application/json')])
+            return
+        
+        # 客户端已持有相同内容时返回不带响应体的304
+        etag = _status_etag(response)
+        if_none_match = next((value.decode('latin-1') for name, value in scope['headers'] if name == b'if-none-match'), None)
+        etag_header = (b'etag', etag.encode('latin-1'))
+        if _etag_matches(if_none_match, etag):
+            await send_response(send, 304, headers=[etag_header])
+            return
+        await send_response(send, 200, response, [
+            (b'content-type', b'application/json; charset=utf-8'),
+            etag_header,
+            (b'cache-control', b'no-cache')
+        ])
+    
+    return app
+
+
 class StatusAPIHandler(BaseHTTPRequestHandler):
-    """状态API处理器"""
+    """状态API处理器（HTTP/1.1，支持长连接复用）"""
+    
+    # HTTP/1.1 默认保持连接，每个响应都必须带 Content-Length
+    protocol_version = 'HTTP/1.1'
+    # 空闲长连接的超时时间（秒）
+    timeout = 30
+    disable_nagle_algorithm = True
     
     def __init__(self, *args, instance_manager=None, **kwargs):
         self.instance_manager = instance_manager
@@ -30,54 +158,57 @@ class StatusAPIHandler(BaseHTTPRequestHandler):
     
     def do_GET(self):
         """处理GET请求"""
-        if self.path == '/api/status':
+        path, _, query = self.path.partition('?')
+        if path == '/api/status':
             try:
-                status = self.instance_manager.get_robot_status()
-                
-                # 确保所有对象都能被正确序列化
-                def serialize_object(obj):
-                    if hasattr(obj, 'to_dict'):
-                        return obj.to_dict()
-                    elif hasattr(obj, '__dict__'):
-                        return obj.__dict__
-                    return obj
-                
-                # 递归处理状态数据中的所有对象
-                def process_status_data(data):
-                    if isinstance(data, dict):
-                        result = {}
-                        for key, value in data.items():
-                            if key == 'position' and value is not None:
-                                result[key] = serialize_object(value)
-                            else:
-                                result[key] = process_status_data(value)
-                        return result
-                    elif isinstance(data, list):
-                        return [process_status_data(item) for item in data]
-                    else:
-                        return serialize_object(data) if hasattr(data, 'to_dict') or hasattr(data, '__dict__') else data
+                response = _render_status(self.instance_manager, query)
                 
-                processed_status = process_status_data(status)
-                response = json.dumps(processed_status, ensure_ascii=False, indent=2)
+                # 客户端已持有相同内容时返回不带响应体的304
+                etag = _status_etag(response)
+                if _etag_matches(self.headers.get('If-None-Match'), etag):
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.end_headers()
+                    return
                 
                 self.send_response(200)
                 self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(response)))
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.end_headers()
-                self.wfile.write(response.encode('utf-8'))
+                self.wfile.write(response)
             except Exception as e:
                 self.send_error(500, f"Internal Server Error: {e}")
         else:
             self.send_error(404, "Not Found")
     
+    def log_request(self, code='-', size='-'):
+        """记录请求日志（状态接口被频繁轮询，只在调试级别记录每个请求）"""
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('[API] "%s" %s %s', self.requestline, code, size)
+    
     def log_message(self, format, *args):
         """重写日志方法，使用项目的logger"""
-        logger.info(f"[API] {format % args}")
+        logger.info("[API] " + format, *args)
+
+
+class ThreadedStatusHTTPServer(ThreadingHTTPServer):
+    """多线程状态API服务器，并发的轮询请求互不阻塞"""
+    daemon_threads = True
 
 
 class InstanceManager:
     """实例管理器，管理多个机器人实例的生命周期"""
     
+    # 状态JSON缓存的有效期（秒），期间的状态查询直接返回缓存的字节串
+    status_cache_ttl = 0.5
+    # 监控线程整体检查一次存活状态的间隔，以及同一机器人两次自动重启的最小间隔（秒）
+    monitor_heartbeat = 30.0
+    restart_backoff = 5.0
+    
     def __init__(self, base_config_path: str = "config.json", registry_path: str = None):
         """
         初始化实例管理器
@@ -88,7 +219,13 @@ class InstanceManager:
         """
         logger.info(f"Debug InstanceManager init: base_config_path='{base_config_path}', registry_path='{registry_path}'")
         
+        # 写时复制：增删机器人时在锁内构造新字典再整体替换，已发布的字典不再修改，
+        # 读取方直接取当前引用即可无锁遍历
         self.robots: Dict[str, RobotInstance] = {}
+        # 各机器人状态码的紧凑表，供状态统计使用
+        self._status_table = StatusTable()
+        # 机器人被移除后以序列号回调（如API层清除该机器人的缓存响应）
+        self.removal_listener: Optional[Callable[[str], None]] = None
         
         # 尝试使用新的配置管理，如果失败则回退到原始方式
         try:
@@ -103,12 +240,21 @@ class InstanceManager:
         self._lock = threading.Lock()
         self._running = False
         self._monitor_thread = None
+        # 运行线程意外退出的机器人序列号，由监控线程取出并重启；None 用于唤醒监控线程
+        self._dead_robots = queue.SimpleQueue()
+        # 缓存的状态JSON：(生成时间, 生成时的版本号, 字节串)；
+        # 机器人增删和启停时递增版本号（需持有锁），使缓存立即失效
+        self._status_version = 0
+        self._status_json_cache = (0.0, -1, b'')
         self.base_config_path = base_config_path
         self.registry_path = registry_path
         
         # 文件监控相关
-        self.file_observer = None
-        self.registry_handler = None
+        self.registry_watcher = None
+        # 上次重新加载时注册文件的内容摘要、各条目内容以及加载后的机器人集合
+        self._registry_digest = None
+        self._registry_entries: Dict[str, Dict[str, Any]] = {}
+        self._registry_robot_ids = set()
         
         # HTTP API服务器
         self.api_server = None
@@ -142,17 +288,21 @@ class InstanceManager:
             logger.warning("未指定注册文件路径")
             return 0
 
+        # 创建机器人实例（在锁外并行创建，只在加入管理器时加锁）
+        new_robots = self.robot_factory.create_robots_from_registry(self.registry_path)
+        
         with self._lock:
-            # 创建机器人实例
-            new_robots = self.robot_factory.create_robots_from_registry(self.registry_path)
-            
             # 添加到管理器中
+            robots = dict(self.robots)
             for serial_number, robot_instance in new_robots.items():
-                if serial_number not in self.robots:
-                    self.robots[serial_number] = robot_instance
+                if serial_number not in robots:
+                    robots[serial_number] = robot_instance
+                    self._track_status(serial_number, robot_instance)
                     logger.info(f"加载机器人实例: {serial_number}")
                 else:
                     logger.warning(f"机器人实例已存在，跳过: {serial_number}")
+            self.robots = robots
+            self._status_version += 1
         
         return len(new_robots)
     
@@ -182,7 +332,9 @@ class InstanceManager:
                 # 创建机器人实例
                 robot_instance = self.robot_factory.create_robot_instance(robot_info)
                 if robot_instance:
-                    self.robots[serial_number] = robot_instance
+                    self.robots = {**self.robots, serial_number: robot_instance}
+                    self._status_version += 1
+                    self._track_status(serial_number, robot_instance)
                     
                     # 如果管理器正在运行，立即启动新机器人
                     if self._running:
@@ -219,7 +371,13 @@ class InstanceManager:
                 robot_instance.stop()
                 
                 # 从管理器中移除
-                del self.robots[serial_number]
+                robots = dict(self.robots)
+                del robots[serial_number]
+                self.robots = robots
+                self._status_version += 1
+                robot_instance.status_listener = None
+                robot_instance.death_listener = None
+                self._status_table.remove(serial_number)
                 
                 # 删除对应的文件存储目录
                 try:
@@ -228,6 +386,7 @@ class InstanceManager:
                 except Exception as e:
                     logger.error(f"删除机器人 {serial_number} 数据目录失败: {e}")
                 
+                self._notify_removed(serial_number)
                 logger.info(f"成功移除机器人实例: {serial_number}")
                 return True
         
@@ -235,45 +394,148 @@ class InstanceManager:
             logger.error(f"移除机器人实例时出错: {e}")
             return False
     
-    def start_all(self):
-        """启动所有机器人实例"""
-        logger.info("正在启动所有机器人实例...")
+    def _add_robots(self, robot_infos: List[Dict[str, Any]]) -> int:
+        """
+        批量添加机器人实例
+        实例在线程池中并行创建，之后一次加锁全部加入管理器，释放锁后再启动
         
-        with self._lock:
-            self._running = True
+        Args:
+            robot_infos: 机器人信息列表
             
-            # 启动所有机器人实例
-            for serial_number, robot_instance in self.robots.items():
+        Returns:
+            成功添加的数量
+        """
+        robot_infos = [info for info in robot_infos if self.robot_factory.validate_robot_info(info)]
+        if not robot_infos:
+            return 0
+        
+        # 线程池只在注册文件变更和停止时使用，按需导入
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(32, len(robot_infos))) as executor:
+            instances = list(executor.map(self.robot_factory.create_robot_instance, robot_infos))
+        
+        added = []
+        with self._lock:
+            robots = dict(self.robots)
+            for robot_info, robot_instance in zip(robot_infos, instances):
+                serial_number = robot_info["serialNumber"]
+                if robot_instance is None:
+                    logger.error(f"创建机器人实例失败: {serial_number}")
+                    continue
+                if serial_number in robots:
+                    logger.warning(f"机器人实例已存在: {serial_number}")
+                    continue
+                robots[serial_number] = robot_instance
+                self._track_status(serial_number, robot_instance)
+                added.append((serial_number, robot_instance))
+            if added:
+                self.robots = robots
+                self._status_version += 1
+            running = self._running
+        
+        for serial_number, robot_instance in added:
+            # 如果管理器正在运行，立即启动新机器人
+            if running:
                 try:
                     robot_instance.start()
-                    logger.info(f"机器人实例 {serial_number} 启动成功")
                 except Exception as e:
                     logger.error(f"机器人实例 {serial_number} 启动失败: {e}")
+            logger.info(f"成功添加机器人实例: {serial_number}")
+        return len(added)
+    
+    def _remove_robots(self, serial_numbers) -> int:
+        """
+        批量移除机器人实例
+        一次加锁将全部实例移出管理器，释放锁后再停止实例并删除数据目录
+        
+        Args:
+            serial_numbers: 机器人序列号集合
             
-            # 启动文件监控
+        Returns:
+            成功移除的数量
+        """
+        removed = []
+        with self._lock:
+            robots = dict(self.robots)
+            for serial_number in serial_numbers:
+                robot_instance = robots.pop(serial_number, None)
+                if robot_instance is None:
+                    logger.warning(f"机器人实例不存在: {serial_number}")
+                    continue
+                robot_instance.status_listener = None
+                robot_instance.death_listener = None
+                self._status_table.remove(serial_number)
+                removed.append((serial_number, robot_instance))
+            if removed:
+                self.robots = robots
+                self._status_version += 1
+        
+        self._stop_instances(removed)
+        storage = get_file_storage_manager() if removed else None
+        for serial_number, robot_instance in removed:
             try:
-                self._start_file_monitoring()
+                storage.remove_robot_folder(serial_number)
             except Exception as e:
-                logger.error(f"启动文件监控失败: {e}")
-            
-            # 启动API服务器
+                logger.error(f"删除机器人 {serial_number} 数据目录失败: {e}")
+            self._notify_removed(serial_number)
+            logger.info(f"成功移除机器人实例: {serial_number}")
+        return len(removed)
+    
+    def _notify_removed(self, serial_number: str):
+        """通知移除回调，回调出错不影响移除流程"""
+        listener = self.removal_listener
+        if listener is None:
+            return
+        try:
+            listener(serial_number)
+        except Exception as e:
+            logger.error(f"机器人 {serial_number} 移除回调失败: {e}")
+    
+    def start_all(self):
+        """启动所有机器人实例"""
+        logger.info("正在启动所有机器人实例...")
+        
+        with self._lock:
+            self._running = True
+            self._status_version += 1
+            robots = list(self.robots.items())
+        
+        # 启动所有机器人实例（start 只创建运行线程，连接在线程内进行）
+        for serial_number, robot_instance in robots:
             try:
-                self.start_api_server()
+                robot_instance.start()
+                logger.info(f"机器人实例 {serial_number} 启动成功")
             except Exception as e:
-                logger.error(f"启动API服务器失败: {e}")
+                logger.error(f"机器人实例 {serial_number} 启动失败: {e}")
+        
+        # 启动监控线程
+        if self._monitor_thread is None or not self._monitor_thread.is_alive():
+            self._monitor_thread = threading.Thread(target=self._monitor_robots, name="RobotMonitor", daemon=True)
+            self._monitor_thread.start()
+        
+        # 启动文件监控
+        try:
+            self._start_file_monitoring()
+        except Exception as e:
+            logger.error(f"启动文件监控失败: {e}")
+        
+        # 启动API服务器
+        try:
+            self.start_api_server()
+        except Exception as e:
+            logger.error(f"启动API服务器失败: {e}")
     
     def start_robot(self, serial_number: str) -> bool:
         """启动指定机器人实例"""
         try:
-            with self._lock:
-                if serial_number not in self.robots:
-                    logger.warning(f"机器人实例不存在: {serial_number}")
-                    return False
-                
-                robot_instance = self.robots[serial_number]
-                robot_instance.start()
-                logger.info(f"机器人实例 {serial_number} 启动成功")
-                return True
+            robot_instance = self.robots.get(serial_number)
+            if robot_instance is None:
+                logger.warning(f"机器人实例不存在: {serial_number}")
+                return False
+            
+            robot_instance.start()
+            logger.info(f"机器人实例 {serial_number} 启动成功")
+            return True
         except Exception as e:
             logger.error(f"启动机器人实例失败: {e}")
             return False
@@ -281,15 +543,14 @@ class InstanceManager:
     def stop_robot(self, serial_number: str) -> bool:
         """停止指定机器人实例"""
         try:
-            with self._lock:
-                if serial_number not in self.robots:
-                    logger.warning(f"机器人实例不存在: {serial_number}")
-                    return False
-                
-                robot_instance = self.robots[serial_number]
-                robot_instance.stop()
-                logger.info(f"机器人实例 {serial_number} 已停止")
-                return True
+            robot_instance = self.robots.get(serial_number)
+            if robot_instance is None:
+                logger.warning(f"机器人实例不存在: {serial_number}")
+                return False
+            
+            robot_instance.stop()
+            logger.info(f"机器人实例 {serial_number} 已停止")
+            return True
         except Exception as e:
             logger.error(f"停止机器人实例失败: {e}")
             return False
@@ -298,90 +559,188 @@ class InstanceManager:
         """停止所有机器人实例"""
         logger.info("正在停止所有机器人实例...")
         
+        # 锁内只取快照并清除运行标志（监控线程不再重启实例），停止操作在锁外进行
         with self._lock:
-            for serial_number, robot_instance in list(self.robots.items()):
-                try:
-                    robot_instance.stop()
-                    logger.info(f"机器人实例 {serial_number} 已停止")
-                except Exception as e:
-                    logger.error(f"停止机器人实例 {serial_number} 失败: {e}")
-            
-            # 停止文件监控
-            try:
-                self._stop_file_monitoring()
-            except Exception as e:
-                logger.error(f"停止文件监控失败: {e}")
-            
-            # 停止API服务器
+            robots = list(self.robots.items())
+            self._running = False
+            self._status_version += 1
+        # 唤醒阻塞等待的监控线程，使其检查运行标志后退出
+        self._dead_robots.put(None)
+        
+        self._stop_instances(robots)
+        if self._monitor_thread is not None:
+            self._monitor_thread.join(timeout=5)
+            self._monitor_thread = None
+        
+        # 停止文件监控
+        try:
+            self._stop_file_monitoring()
+        except Exception as e:
+            logger.error(f"停止文件监控失败: {e}")
+        
+        # 停止API服务器
+        try:
+            self.stop_api_server()
+        except Exception as e:
+            logger.error(f"停止API服务器失败: {e}")
+    
+    def _stop_instances(self, robots: List[Any]):
+        """
+        并行停止一组机器人实例
+        停止时需要等待消息发布、断开MQTT连接和运行线程结束，逐个停止的耗时随数量线性增长
+        
+        Args:
+            robots: (序列号, 机器人实例) 列表
+        """
+        if not robots:
+            return
+        
+        from concurrent.futures import ThreadPoolExecutor
+        
+        def stop(item):
+            serial_number, robot_instance = item
             try:
-                self.stop_api_server()
+                robot_instance.stop()
+                logger.info(f"机器人实例 {serial_number} 已停止")
             except Exception as e:
-                logger.error(f"停止API服务器失败: {e}")
-            
-            self._running = False
+                logger.error(f"停止机器人实例 {serial_number} 失败: {e}")
+        
+        with ThreadPoolExecutor(max_workers=min(16, len(robots))) as executor:
+            list(executor.map(stop, robots))
     
     def restart_robot(self, serial_number: str) -> bool:
         """重启指定机器人实例"""
         try:
+            robot_instance = self.robots.get(serial_number)
+            if robot_instance is None:
+                logger.warning(f"机器人实例不存在: {serial_number}")
+                return False
+            
+            # 停止和等待在锁外进行
+            robot_instance.stop()
+            time.sleep(1)
             with self._lock:
-                if serial_number not in self.robots:
-                    logger.warning(f"机器人实例不存在: {serial_number}")
+                if self.robots.get(serial_number) is not robot_instance:
+                    logger.warning(f"机器人实例 {serial_number} 在重启期间已被移除")
                     return False
-                
-                robot_instance = self.robots[serial_number]
-                robot_instance.stop()
-                time.sleep(1)
                 robot_instance.start()
-                logger.info(f"机器人实例 {serial_number} 重启成功")
-                return True
+            logger.info(f"机器人实例 {serial_number} 重启成功")
+            return True
         except Exception as e:
             logger.error(f"重启机器人实例失败: {e}")
             return False
     
     def get_robot_status(self, serial_number: str = None) -> Dict[str, Any]:
         """获取机器人状态信息"""
-        with self._lock:
-            if serial_number:
-                robot = self.robots.get(serial_number)
-                if robot:
-                    return robot.get_status()
-                else:
-                    return {
-                        "error": "Robot not found",
-                        "serial_number": serial_number
-                    }
+        # 直接在当前的机器人字典快照上读取，不加锁，不阻塞机器人的增删和启停
+        if serial_number:
+            robot = self.robots.get(serial_number)
+            if robot:
+                return robot.get_status()
             else:
-                status = {
-                    "total_robots": len(self.robots),
-                    "running_robots": sum(1 for r in self.robots.values() if r.is_alive()),
-                    "manager_running": self._running,
-                    "robots": {}
+                return {
+                    "error": "Robot not found",
+                    "serial_number": serial_number
                 }
-                for sn, robot in self.robots.items():
-                    status["robots"][sn] = robot.get_status()
-                return status
+        
+        robots = self.robots
+        return {
+            "total_robots": len(robots),
+            "running_robots": sum(1 for r in robots.values() if r.is_alive()),
+            "manager_running": self._running,
+            "robots": {sn: robot.get_status() for sn, robot in robots.items()}
+        }
+    
+    def get_robot_status_json(self) -> bytes:
+        """
+        获取所有机器人状态信息的JSON字节串
+        各机器人的状态使用其缓存的JSON片段直接拼接，内容与 get_robot_status() 的结果一致；
+        生成的字节串在 status_cache_ttl 内直接复用，机器人增删或启停后立即重新生成
+        """
+        # 缓存元组整体替换，无需加锁即可读取一致的内容
+        created, version, body = self._status_json_cache
+        if version == self._status_version and time.monotonic() - created < self.status_cache_ttl:
+            return body
+        
+        # 先取版本号再取机器人字典：写入方先替换字典再递增版本号，
+        # 期间发生变更时缓存的版本号偏旧，下次查询重新生成
+        created = time.monotonic()
+        version = self._status_version
+        robots = self.robots
+        header = to_json_bytes({
+            "total_robots": len(robots),
+            "running_robots": sum(1 for r in robots.values() if r.is_alive()),
+            "manager_running": self._running
+        })
+        # 所有片段收集到一个列表中一次拼接，响应体只复制一次
+        parts = [header[:-1], b',"robots":{']
+        for sn, robot in robots.items():
+            parts.append(_json_key(sn))
+            parts.append(robot.get_status_json())
+            parts.append(b',')
+        if robots:
+            parts.pop()
+        parts.append(b'}}')
+        body = b''.join(parts)
+        self._status_json_cache = (created, version, body)
+        return body
+    
+    def get_robot_summaries(self) -> List[Dict[str, Any]]:
+        """
+        获取所有机器人的状态摘要
+        
+        Returns:
+            各机器人预先构造的摘要字典列表（见 RobotInstance.get_summary），
+            返回的是引用而非副本，调用方只读，不得修改
+        """
+        return [robot.get_summary() for robot in self.robots.values()]
+    
+    def get_robot_summaries_versioned(self) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        获取所有机器人的状态摘要及其版本
+        
+        Returns:
+            (摘要列表, 版本)；版本由各摘要的序号计算，任一摘要重建或机器人增删后改变，
+            与摘要列表取自同一时刻，可在输出列表之前作为ETag使用
+        """
+        entries = [robot.get_summary_entry() for robot in self.robots.values()]
+        serials = ','.join([str(entry[0]) for entry in entries]).encode('ascii')
+        version = hashlib.blake2b(serials, digest_size=16).hexdigest()
+        return [entry[1] for entry in entries], version
+    
+    def _track_status(self, serial_number: str, robot_instance: RobotInstance):
+        """将机器人登记到状态统计表，并在其状态变化时同步更新；运行线程意外退出时通知监控线程"""
+        robot_instance.status_listener = self._status_table.set
+        robot_instance.death_listener = self._dead_robots.put
+        self._status_table.add(serial_number, robot_instance.status)
+    
+    def get_status_counts(self) -> Dict[str, int]:
+        """
+        按状态统计机器人数量
+        
+        Returns:
+            running/idle/error/fault -> 处于该状态的机器人数量
+        """
+        return self._status_table.counts()
     
     def get_robot_list(self) -> List[str]:
         """获取机器人列表"""
-        with self._lock:
-            return list(self.robots.keys())
+        return list(self.robots)
     
     def get_robot_instance(self, serial_number: str) -> Optional[RobotInstance]:
         """获取机器人实例对象"""
-        with self._lock:
-            return self.robots.get(serial_number)
+        return self.robots.get(serial_number)
     
     def send_order_to_robot(self, serial_number: str, order_data: Dict[str, Any]) -> bool:
         """向指定机器人发送订单"""
         try:
-            with self._lock:
-                robot = self.robots.get(serial_number)
-                if robot:
-                    robot.send_order(order_data)
-                    return True
-                else:
-                    logger.warning(f"机器人实例不存在: {serial_number}")
-                    return False
+            robot = self.robots.get(serial_number)
+            if robot:
+                robot.send_order(order_data)
+                return True
+            else:
+                logger.warning(f"机器人实例不存在: {serial_number}")
+                return False
         except Exception as e:
             logger.error(f"发送订单失败: {e}")
             return False
@@ -389,35 +748,71 @@ class InstanceManager:
     def send_instant_action_to_robot(self, serial_number: str, action_data: Dict[str, Any]) -> bool:
         """向指定机器人发送即时动作"""
         try:
-            with self._lock:
-                robot = self.robots.get(serial_number)
-                if robot:
-                    robot.send_instant_action(action_data)
-                    return True
-                else:
-                    logger.warning(f"机器人实例不存在: {serial_number}")
-                    return False
+            robot = self.robots.get(serial_number)
+            if robot:
+                robot.send_instant_action(action_data)
+                return True
+            else:
+                logger.warning(f"机器人实例不存在: {serial_number}")
+                return False
         except Exception as e:
             logger.error(f"发送即时动作失败: {e}")
             return False
     
     def _monitor_robots(self):
-        """监控机器人实例状态"""
+        """
+        监控机器人实例状态
+        阻塞等待运行线程意外退出的通知，只重启对应的机器人；同一机器人两次重启至少间隔
+        restart_backoff 秒，避免连接持续失败时反复重启；每隔 monitor_heartbeat 秒
+        再整体检查一次，补上未通知到的情况
+        """
+        # 序列号 -> 计划重启时间，以及上次重启时间
+        pending: Dict[str, float] = {}
+        last_restart: Dict[str, float] = {}
+        next_scan = time.monotonic() + self.monitor_heartbeat
         while self._running:
+            deadline = min(min(pending.values(), default=next_scan), next_scan)
             try:
-                with self._lock:
-                    for serial_number, robot in list(self.robots.items()):
-                        if not robot.is_alive():
-                            logger.warning(f"检测到机器人实例不存活，尝试重启: {serial_number}")
-                            try:
-                                robot.start()
-                                logger.info(f"机器人实例 {serial_number} 重启成功")
-                            except Exception as e:
-                                logger.error(f"机器人实例 {serial_number} 重启失败: {e}")
-                time.sleep(5)
+                serial_number = self._dead_robots.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                serial_number = None
+            if not self._running:
+                break
+            try:
+                now = time.monotonic()
+                if serial_number is not None:
+                    pending.setdefault(serial_number, max(now, last_restart.get(serial_number, 0.0) + self.restart_backoff))
+                if now >= next_scan:
+                    next_scan = now + self.monitor_heartbeat
+                    robots = self.robots
+                    # 运行标志仍设置但线程已退出的实例；已移除机器人的重启记录一并清理
+                    for sn, robot in robots.items():
+                        if robot.running and not robot.is_alive():
+                            pending.setdefault(sn, max(now, last_restart.get(sn, 0.0) + self.restart_backoff))
+                    last_restart = {sn: t for sn, t in last_restart.items() if sn in robots}
+                for sn in [sn for sn, due in pending.items() if due <= now]:
+                    del pending[sn]
+                    last_restart[sn] = now
+                    self._restart_dead_robot(sn)
             except Exception as e:
                 logger.error(f"监控线程出错: {e}")
-                time.sleep(5)
+    
+    def _restart_dead_robot(self, serial_number: str):
+        """重启运行线程已退出的机器人实例（实例已被移除或已恢复运行时跳过）"""
+        robot = self.robots.get(serial_number)
+        if robot is None or robot.is_alive():
+            return
+        logger.warning(f"检测到机器人实例不存活，尝试重启: {serial_number}")
+        try:
+            # 线程退出后运行标志仍然设置，先停止以清理连接和标志，再重新启动
+            robot.stop()
+            with self._lock:
+                if not self._running or self.robots.get(serial_number) is not robot:
+                    return
+                robot.start()
+            logger.info(f"机器人实例 {serial_number} 重启成功")
+        except Exception as e:
+            logger.error(f"机器人实例 {serial_number} 重启失败: {e}")
     
     def is_running(self) -> bool:
         """检查管理器是否正在运行"""
@@ -425,26 +820,57 @@ class InstanceManager:
     
     def get_robot_count(self) -> int:
         """获取机器人数量"""
-        with self._lock:
-            return len(self.robots)
+        return len(self.robots)
     
     def start_api_server(self):
-        """启动状态API服务器"""
+        """启动状态API服务器（安装了 uvicorn 时使用ASGI服务器，否则使用多线程 http.server）"""
+        if _use_uvicorn:
+            self._start_asgi_api_server()
+            return
         try:
             server_address = ('', self.api_port)
-            self.api_server = HTTPServer(server_address, lambda *args, **kwargs: StatusAPIHandler(*args, instance_manager=self, **kwargs))
+            self.api_server = ThreadedStatusHTTPServer(server_address, lambda *args, **kwargs: StatusAPIHandler(*args, instance_manager=self, **kwargs))
             self.api_thread = threading.Thread(target=self.api_server.serve_forever, daemon=True)
             self.api_thread.start()
             logger.info(f"状态API服务器已启动，端口: {self.api_port}")
         except Exception as e:
             logger.error(f"启动状态API服务器失败: {e}")
     
+    def _start_asgi_api_server(self):
+        """以 uvicorn 启动状态API的ASGI应用"""
+        try:
+            config = uvicorn.Config(
+                create_status_asgi_app(self), host='0.0.0.0', port=self.api_port,
+                loop='asyncio', log_level='warning'
+            )
+            server = uvicorn.Server(config)
+            self.api_thread = threading.Thread(target=server.run, daemon=True)
+            self.api_thread.start()
+            
+            # 等待监听端口就绪
+            deadline = time.monotonic() + 5
+            while not server.started and self.api_thread.is_alive() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            if not server.started:
+                server.should_exit = True
+                logger.error(f"启动状态API服务器失败: 无法监听端口 {self.api_port}")
+                return
+            self.api_server = server
+            logger.info(f"状态API服务器已启动(ASGI)，端口: {self.api_port}")
+        except Exception as e:
+            logger.error(f"启动状态API服务器失败: {e}")
+    
     def stop_api_server(self):
         """停止状态API服务器"""
         try:
             if self.api_server:
-                self.api_server.shutdown()
-                self.api_server.server_close()
+                if _use_uvicorn:
+                    self.api_server.should_exit = True
+                    if self.api_thread and self.api_thread.is_alive():
+                        self.api_thread.join(timeout=5)
+                else:
+                    self.api_server.shutdown()
+                    self.api_server.server_close()
                 self.api_server = None
                 logger.info("状态API服务器已停止")
         except Exception as e:
@@ -466,38 +892,38 @@ class InstanceManager:
             return
         
         try:
-            # 创建文件监控处理器
-            self.registry_handler = RobotRegistryHandler(self)
+            # 启动注册文件轮询线程
+            # 网络共享等修改时间更新较慢的文件系统可在配置中调大轮询间隔和稳定时间
+            storage = self.config.storage if self.config else None
+            self.registry_watcher = RegistryFileWatcher(
+                self.registry_path, self._reload_robots_from_registry,
+                interval=storage.registry_poll_interval if storage else 1.0,
+                settle=storage.registry_settle_time if storage else 0.5
+            )
+            self.registry_watcher.start()
             
-            # 创建观察者
-            self.file_observer = Observer()
-            
-            # 监控注册文件所在的目录
-            registry_dir = os.path.dirname(os.path.abspath(self.registry_path))
-            self.file_observer.schedule(self.registry_handler, registry_dir, recursive=False)
-            
-            # 启动观察者
-            self.file_observer.start()
-            
-            logger.info(f"文件监控已启动，监控目录: {registry_dir}")
+            logger.info(f"文件监控已启动，监控文件: {self.registry_watcher.path}，轮询间隔: {self.registry_watcher.interval}秒")
             
         except Exception as e:
             logger.error(f"启动文件监控失败: {e}")
     
     def _stop_file_monitoring(self):
         """停止文件监控"""
-        if self.file_observer:
+        if self.registry_watcher:
             try:
-                self.file_observer.stop()
-                self.file_observer.join()
-                self.file_observer = None
-                self.registry_handler = None
+                self.registry_watcher.stop()
+                self.registry_watcher = None
                 logger.info("文件监控已停止")
             except Exception as e:
                 logger.error(f"停止文件监控失败: {e}")
     
-    def _reload_robots_from_registry(self):
-        """重新加载注册文件中的机器人配置（仅热加载配置，不重新注册）"""
+    def _reload_robots_from_registry(self, digest: Optional[bytes] = None):
+        """
+        重新加载注册文件中的机器人配置（仅热加载配置，不重新注册）
+        
+        Args:
+            digest: 文件内容的 blake2b 摘要，由文件监控传入；未提供时在此读取文件计算
+        """
         try:
             logger.info("开始重新加载机器人注册文件配置...")
             
@@ -505,50 +931,62 @@ class InstanceManager:
                 logger.warning("注册文件不存在，跳过重新加载")
                 return
             
-            # 读取注册文件
-            with open(self.registry_path, 'r', encoding='utf-8') as f:
-                robots_data = json.load(f)
+            # 内容与上次重新加载时相同且机器人集合未变化时无需解析和比较
+            if digest is None:
+                with open(self.registry_path, 'rb') as f:
+                    digest = hashlib.blake2b(f.read(), digest_size=16).digest()
+            if digest == self._registry_digest and self.robots.keys() == self._registry_robot_ids:
+                logger.info("注册文件内容未变化，跳过重新加载")
+                return
             
-            # 获取当前已存在的机器人ID
-            existing_robot_ids = set(self.robots.keys())
+            # 读取注册文件（按修改时间缓存，文件未变化时不重复解析）；
+            # 内容无法解析（如写了一半）时放弃本次重新加载，不能当作空列表移除全部机器人
+            try:
+                robots_data = get_registry_file_cache(self.registry_path).load()
+            except RegistryFileError as e:
+                logger.error(f"注册文件内容无法解析，保留现有机器人，等待文件下次变化: {e}")
+                return
             
-            # 获取注册文件中的机器人serialNumber
-            registry_robot_ids = set(robot_info.get('serialNumber') for robot_info in robots_data if robot_info.get('serialNumber'))
+            # 一次遍历按序列号建立索引，重复的序列号以第一个条目为准
+            registry_by_id: Dict[str, Dict[str, Any]] = {}
+            for robot_info in robots_data:
+                serial = robot_info.get('serialNumber')
+                if serial:
+                    registry_by_id.setdefault(serial, robot_info)
             
+            robots = self.robots
+            existing_robot_ids = robots.keys() & registry_by_id.keys()
             # 找出已删除的机器人（从注册文件中移除的）
-            removed_robot_ids = existing_robot_ids - registry_robot_ids
+            removed_robot_ids = robots.keys() - registry_by_id.keys()
             
-            # 只处理已删除的机器人，不自动添加新机器人
-            for robot_id in removed_robot_ids:
-                success = self.remove_robot(robot_id)
-                if success:
-                    logger.info(f"动态移除机器人: {robot_id}")
-                else:
-                    logger.error(f"动态移除机器人失败: {robot_id}")
+            # 已删除的机器人一次性移出
+            removed_count = self._remove_robots(removed_robot_ids) if removed_robot_ids else 0
             
-            # 对于现有机器人，只更新配置（热加载）
+            # 对于现有机器人，只更新配置（热加载）；条目内容与上次加载时相同的机器人无需热加载
             updated_count = 0
-            for robot_info in robots_data:
-                robot_id = robot_info.get('serialNumber')
-                if robot_id in existing_robot_ids:
-                    # 热加载配置
+            for robot_id in existing_robot_ids:
+                robot_info = registry_by_id[robot_id]
+                if self._registry_entries.get(robot_id) != robot_info:
                     if self._hot_reload_robot_config(robot_id, robot_info):
                         updated_count += 1
             
-            # 计算新增机器人并启动
-            new_robot_ids = registry_robot_ids - existing_robot_ids
+            # 新增机器人按注册文件中的顺序并行创建，之后一次性加入并启动
+            new_robot_infos = [
+                robot_info for serial, robot_info in registry_by_id.items()
+                if serial not in self.robots
+            ]
             added_count = 0
-            for robot_info in robots_data:
-                serial = robot_info.get('serialNumber')
-                if serial and serial in new_robot_ids:
-                    try:
-                        if self.add_robot(robot_info):
-                            added_count += 1
-                            logger.info(f"动态添加并启动新机器人: {serial}")
-                    except Exception as e:
-                        logger.error(f"动态添加新机器人失败 {serial}: {e}")
+            if new_robot_infos:
+                try:
+                    added_count = self._add_robots(new_robot_infos)
+                except Exception as e:
+                    logger.error(f"动态添加新机器人失败: {e}")
+            
+            self._registry_digest = digest
+            self._registry_entries = registry_by_id
+            self._registry_robot_ids = set(self.robots.keys())
             
-            logger.info(f"机器人注册文件重新加载完成，移除: {len(removed_robot_ids)}, 新增: {added_count}, 配置更新: {updated_count}")
+            logger.info(f"机器人注册文件重新加载完成，移除: {removed_count}, 新增: {added_count}, 配置更新: {updated_count}")
             if added_count > 0:
                 logger.info(f"已自动启动{added_count}个新注册机器人")
             else:
@@ -560,11 +998,10 @@ class InstanceManager:
     def _hot_reload_robot_config(self, robot_id: str, new_config: Dict[str, Any]) -> bool:
         """热加载机器人配置，不重启机器人实例"""
         try:
-            if robot_id not in self.robots:
+            robot_instance = self.robots.get(robot_id)
+            if robot_instance is None:
                 return False
             
-            robot_instance = self.robots[robot_id]
-            
             # 更新机器人配置（这里可以根据需要实现具体的配置更新逻辑）
             # 例如更新MQTT配置、车辆信息等
             if hasattr(robot_instance, 'update_config'):
@@ -580,27 +1017,101 @@ class InstanceManager:
             return False
 
 
-class RobotRegistryHandler(FileSystemEventHandler):
-    """机器人注册文件监控处理器"""
+class RegistryFileWatcher:
+    """
+    机器人注册文件监控
+    后台线程定期检查单个注册文件的修改时间和大小，变化后等待文件稳定再比较内容摘要，
+    只有内容确实改变时才触发重新加载（仅更新修改时间的写入不会触发）；
+    编辑器保存时的连续写入、替换合并为一次重新加载，重新加载在监控线程内串行执行
+    """
     
-    def __init__(self, instance_manager):
-        super().__init__()
-        self.instance_manager = instance_manager
-        self.last_modified = 0
+    __slots__ = ('path', 'on_change', 'interval', 'settle', '_stop_event', '_thread', '_stat_key', '_digest')
+    
+    def __init__(self, path: str, on_change, interval: float = 1.0, settle: float = 0.5):
+        """
+        初始化注册文件监控
         
-    def on_modified(self, event):
-        """文件修改时的处理"""
-        if event.is_directory:
-            return
-            
-        # 检查是否是注册文件
-        if event.src_path.endswith('registered_robots.json'):
-            # 防止重复触发
-            current_time = time.time()
-            if current_time - self.last_modified < 1:  # 1秒内的重复事件忽略
-                return
-            self.last_modified = current_time
-            
-            logger.info(f"检测到注册文件变更: {event.src_path}")
-            # 延迟一点时间确保文件写入完成
-            threading.Timer(0.5, self.instance_manager._reload_robots_from_registry).start()
\ No newline at end of file
+        Args:
+            path: 注册文件路径
+            on_change: 文件内容变化时调用的回调，参数为新内容的 blake2b 摘要（文件不存在时为 None）
+            interval: 检查间隔（秒）
+            settle: 检测到变化后文件保持不变多久（秒）才视为写入完成
+        """
+        # 路径只在创建时解析一次，轮询时不受工作目录变化影响
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+        self.interval = interval
+        self.settle = settle
+        self._stop_event = threading.Event()
+        self._thread = None
+        # 上次检查时的 (修改时间, 大小) 和内容摘要
+        self._stat_key = None
+        self._digest = None
+    
+    def start(self):
+        """记录文件当前状态并启动监控线程"""
+        self._stat_key, self._digest = self._snapshot()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="RegistryFileWatcher", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """停止监控线程"""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=max(self.interval, self.settle) + 1)
+        self._thread = None
+    
+    def _stat(self):
+        """获取文件的 (修改时间, 大小)，文件不存在时为 None"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+    
+    def _wait_settled(self, stat_key) -> bool:
+        """
+        等待文件在 settle 时间内不再变化
+        
+        Returns:
+            文件已稳定时返回 True，等待期间监控被停止时返回 False
+        """
+        while not self._stop_event.wait(self.settle):
+            current = self._stat()
+            if current == stat_key:
+                return True
+            stat_key = current
+        return False
+    
+    def _snapshot(self):
+        """获取文件的 (修改时间, 大小) 和内容摘要，文件不存在时均为 None"""
+        try:
+            st = os.stat(self.path)
+            with open(self.path, 'rb') as f:
+                digest = hashlib.blake2b(f.read(), digest_size=16).digest()
+        except FileNotFoundError:
+            return None, None
+        return (st.st_mtime_ns, st.st_size), digest
+    
+    def _run(self):
+        """轮询注册文件"""
+        while not self._stop_event.wait(self.interval):
+            try:
+                stat_key = self._stat()
+                if stat_key == self._stat_key:
+                    continue
+                if not self._wait_settled(stat_key):
+                    break
+                
+                stat_key, digest = self._snapshot()
+                self._stat_key = stat_key
+                if digest == self._digest:
+                    continue
+                self._digest = digest
+                
+                logger.info(f"检测到注册文件变更: {self.path}")
+                # 摘要随回调传出，重新加载时不必再次读取文件计算
+                self.on_change(digest)
+            except Exception as e:
+                logger.error(f"检查注册文件变更失败: {e}")
\ No newline at end of file
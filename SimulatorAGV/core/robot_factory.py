@@ -1,16 +1,38 @@
 import os
 import sys
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional
 
 # 添加项目路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from ..instances.robot_instance import RobotInstance
 from .config_generator import ConfigGenerator
-from shared import setup_logger
+from shared import setup_logger, from_json_bytes
+
+# 可选的流式JSON解析器（自动选用可用的最快后端，如 yajl2_c）
+try:
+    import ijson
+    _use_ijson = True
+except ImportError:
+    _use_ijson = False
 
 logger = setup_logger()
 
+# 注册文件内容不是合法JSON时抛出的异常
+_JSON_ERRORS = (ValueError, ijson.JSONError) if _use_ijson else (ValueError,)
+
+
+def _iter_registry(registry_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    逐个读取注册文件中的机器人条目
+    安装了ijson时流式解析，不需要一次性构造整个列表；否则整体解析
+    """
+    with open(registry_path, 'rb') as f:
+        if _use_ijson:
+            yield from ijson.items(f, 'item', use_float=True)
+        else:
+            yield from from_json_bytes(f.read())
+
 
 class RobotFactory:
     """机器人工厂类，负责创建和管理机器人实例"""
@@ -76,12 +98,20 @@ class RobotFactory:
         robots = {}
         
         try:
-            import json
-            with open(registry_path, 'r', encoding='utf-8') as f:
-                robots_data = json.load(f)
+            # 实例创建包含配置生成和文件读写，在线程池中并行进行；条目边解析边提交，
+            # 解析与创建重叠进行，结果按注册文件中的顺序收集
+            from concurrent.futures import ThreadPoolExecutor
+            pending = []
+            with ThreadPoolExecutor(max_workers=32) as executor:
+                try:
+                    for robot_info in _iter_registry(registry_path):
+                        pending.append((robot_info, executor.submit(self.create_robot_instance, robot_info)))
+                except _JSON_ERRORS as e:
+                    # 流式解析到中途才发现文件损坏时，之前的条目已在创建，照常收集返回而不是丢弃
+                    logger.error(f"解析注册文件失败，仅创建之前读取的 {len(pending)} 个机器人: {e}")
             
-            for robot_info in robots_data:
-                robot_instance = self.create_robot_instance(robot_info)
+            for robot_info, future in pending:
+                robot_instance = future.result()
                 if robot_instance:
                     # 使用serialNumber作为字典的键
                     serial_number = robot_info.get('serialNumber')
@@ -97,8 +127,6 @@ class RobotFactory:
             
         except FileNotFoundError:
             logger.warning(f"注册文件不存在: {registry_path}")
-        except json.JSONDecodeError as e:
-            logger.error(f"解析注册文件失败: {e}")
         except Exception as e:
             logger.error(f"从注册文件创建机器人实例时出错: {e}")
         
@@ -0,0 +1,74 @@
+"""
+机器人状态统计表
+每个机器人的状态以一个字节的状态码紧凑保存，按状态计数由C实现的 bytes.count 完成，
+统计接口不再逐个遍历机器人
+"""
+
+import threading
+from typing import Dict, List, Tuple
+
+# 参与统计的状态，状态码即其下标；其余状态统一记为 STATUS_OTHER
+STATUS_NAMES: Tuple[str, ...] = ("running", "idle", "error", "fault")
+STATUS_OTHER = len(STATUS_NAMES)
+
+_STATUS_CODES: Dict[str, int] = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+
+def status_code(status: str) -> int:
+    """将状态名（不区分大小写）转换为状态码"""
+    return _STATUS_CODES.get(status.lower(), STATUS_OTHER) if status else STATUS_OTHER
+
+
+class StatusTable:
+    """按机器人保存状态码的紧凑表，删除时用末尾条目填补空位"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codes = bytearray()
+        # 机器人ID -> 下标，以及下标 -> 机器人ID
+        self._slots: Dict[str, int] = {}
+        self._ids: List[str] = []
+
+    def add(self, robot_id: str, status: str):
+        """登记机器人及其当前状态，已登记时更新状态"""
+        code = status_code(status)
+        with self._lock:
+            slot = self._slots.get(robot_id)
+            if slot is None:
+                self._slots[robot_id] = len(self._codes)
+                self._ids.append(robot_id)
+                self._codes.append(code)
+            else:
+                self._codes[slot] = code
+
+    def set(self, robot_id: str, status: str):
+        """更新已登记机器人的状态，未登记（如已移除）的机器人忽略"""
+        code = status_code(status)
+        with self._lock:
+            slot = self._slots.get(robot_id)
+            if slot is not None:
+                self._codes[slot] = code
+
+    def remove(self, robot_id: str):
+        """移除机器人"""
+        with self._lock:
+            slot = self._slots.pop(robot_id, None)
+            if slot is None:
+                return
+            last_id = self._ids.pop()
+            last_code = self._codes.pop()
+            if slot < len(self._codes):
+                self._codes[slot] = last_code
+                self._ids[slot] = last_id
+                self._slots[last_id] = slot
+
+    def counts(self) -> Dict[str, int]:
+        """
+        按状态计数
+
+        Returns:
+            STATUS_NAMES 中各状态 -> 处于该状态的机器人数量
+        """
+        with self._lock:
+            codes = bytes(self._codes)
+        return {name: codes.count(code) for code, name in enumerate(STATUS_NAMES)}
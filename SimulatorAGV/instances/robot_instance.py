@@ -1,7 +1,8 @@
+import itertools
 import threading
 import time
 import json
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional, Tuple
 from datetime import datetime
 
 # 导入现有的模块
@@ -13,11 +14,16 @@ from ..agv_simulator import AgvSimulator
 from ..mqtt_client import MqttClient
 from ..vda5050.connection import Connection
 from ..services.file_storage_manager import get_file_storage_manager
+from ..services.publish_batcher import PublishBatcher
+from vda5050.state import AgvPosition
 
-from shared import setup_logger
+from shared import setup_logger, to_json_bytes
 
 logger = setup_logger()
 
+# 状态摘要的全局序号，每次重建摘要时取下一个值
+_summary_serials = itertools.count(1)
+
 
 class RobotInstance:
     """单个机器人实例，封装AGV模拟器和MQTT客户端"""
@@ -34,6 +40,8 @@ class RobotInstance:
         self.config = config
         self.running = False
         self.thread: Optional[threading.Thread] = None
+        # 运行线程是否仍在执行，由线程在启动和退出时维护，存活检查只需读取该标志
+        self._thread_alive = False
         
         # 初始化文件存储管理器
         self.file_storage = get_file_storage_manager()
@@ -45,12 +53,34 @@ class RobotInstance:
         # 创建MQTT客户端
         self.mqtt_client = MqttClient(config, self._handle_mqtt_message)
         
+        # 状态/可视化消息经批处理器发布，减少逐条发布的开销；两者只需发布最新值
+        self.publish_batcher = PublishBatcher(
+            self.mqtt_client.publish,
+            latest_only=(self.agv_simulator.state_topic, self.agv_simulator.visualization_topic),
+            name=f"PublishBatcher-{robot_id}"
+        )
+        
         # 状态信息
         self.status = "offline"
         self.last_update = datetime.now()
         
-        # 线程锁
-        self._lock = threading.Lock()
+        # 状态变化时的回调 (robot_id, status)，由实例管理器设置，用于维护状态统计
+        self.status_listener: Optional[Callable[[str, str], None]] = None
+        # 运行线程意外退出（未调用 stop）时的回调 (robot_id)，由实例管理器设置，用于及时重启
+        self.death_listener: Optional[Callable[[str], None]] = None
+        
+        # 机器人列表接口使用的状态摘要，随状态变化整体替换，读取方只持有引用不做修改
+        self._summary: Dict[str, Any] = {}
+        # (摘要序号, 状态摘要)，与 _summary 同时替换，供需要版本信息的读取方一次取得一致的两者
+        self._summary_entry: Tuple[int, Dict[str, Any]] = (0, self._summary)
+        self._refresh_summary()
+        
+        # /api/status 使用的状态JSON缓存：(状态摘要, 运行标志, 状态文件修改时间, JSON字节串)，
+        # 摘要被替换、运行标志变化或状态文件被写入后失效，下次读取时重新生成
+        self._status_json = None
+        
+        # 线程锁（可重入：批处理器未启动时会在持锁的调用方线程中直接生成消息）
+        self._lock = threading.RLock()
         
         logger.info(f"机器人实例 {robot_id} 初始化完成")
     
@@ -90,6 +120,7 @@ class RobotInstance:
             return
         
         self.running = True
+        self._thread_alive = True
         self.thread = threading.Thread(target=self._run, daemon=True)
         self.thread.start()
         logger.info(f"机器人 {self.robot_id} 启动成功")
@@ -102,8 +133,9 @@ class RobotInstance:
         logger.info(f"正在停止机器人 {self.robot_id}...")
         self.running = False
         
-        # 发布离线消息
+        # 先发布队列中剩余的消息，再发布离线消息
         try:
+            self.publish_batcher.stop()
             self._publish_connection_message(Connection.CONNECTION_STATE_OFFLINE)
             self.mqtt_client.disconnect()
         except Exception as e:
@@ -114,6 +146,7 @@ class RobotInstance:
             self.thread.join(timeout=5)
         
         self.status = "offline"
+        self._refresh_summary()
         logger.info(f"机器人 {self.robot_id} 已停止")
     
     def _run(self):
@@ -124,6 +157,7 @@ class RobotInstance:
             
             # 发布初始连接消息
             self._publish_connection_message(Connection.CONNECTION_STATE_ONLINE)
+            self.publish_batcher.start()
 
             # 尝试从文件加载已有状态并同步到模拟器
             try:
@@ -140,7 +174,6 @@ class RobotInstance:
                             self.agv_simulator.state.agv_position.theta = theta
                             self.agv_simulator.state.agv_position.position_initialized = pos.get("positionInitialized", True)
                         else:
-                            from vda5050.state import AgvPosition
                             map_id = pos.get("mapId", self.config['settings']['map_id'])
                             self.agv_simulator.state.agv_position = AgvPosition(
                                 x=x, y=y, theta=theta,
@@ -154,6 +187,7 @@ class RobotInstance:
                             self.agv_simulator.visualization.agv_position.theta = theta
                         else:
                             self.agv_simulator.visualization.agv_position = self.agv_simulator.state.agv_position
+                        self._refresh_summary()
             except Exception as e:
                 logger.warning(f"加载机器人 {self.robot_id} 初始状态失败: {e}")
             
@@ -161,6 +195,7 @@ class RobotInstance:
             self._publish_state_message()
             
             self.status = "online"
+            self._refresh_summary()
             
             # 主循环
             while self.running:
@@ -175,6 +210,7 @@ class RobotInstance:
                         
                         # 更新最后更新时间
                         self.last_update = datetime.now()
+                        self._refresh_summary()
                     
                     # 等待指定的时间间隔
                     time.sleep(1.0 / self.config['settings']['state_frequency'])
@@ -186,16 +222,26 @@ class RobotInstance:
         except Exception as e:
             logger.error(f"机器人 {self.robot_id} 启动失败: {e}")
             self.status = "error"
+            self._refresh_summary()
         
         finally:
             # 确保发布离线消息
             try:
+                self.publish_batcher.stop()
                 self._publish_connection_message(Connection.CONNECTION_STATE_OFFLINE)
                 self.mqtt_client.disconnect()
             except:
                 pass
             
             self.status = "offline"
+            self._refresh_summary()
+            # 重启后已有新的运行线程时不清除标志
+            if self.thread is threading.current_thread():
+                self._thread_alive = False
+                # 运行标志仍然设置说明线程不是因 stop() 而退出
+                listener = self.death_listener
+                if self.running and listener is not None:
+                    listener(self.robot_id)
     
     def _publish_connection_message(self, state: str):
         """发布连接消息"""
@@ -217,53 +263,128 @@ class RobotInstance:
             logger.error(f"机器人 {self.robot_id} 发布连接消息失败: {e}")
     
     def _publish_state_message(self):
-        """发布状态消息"""
+        """发布状态消息（消息在批处理器发布时才生成）"""
+        self.publish_batcher.add(
+            self.agv_simulator.state_topic,
+            self._render_state_message,
+            qos=0,
+            priority=True
+        )
+    
+    def _render_state_message(self) -> Optional[str]:
+        """生成状态消息并保存到文件"""
         try:
-            message = self.agv_simulator.get_state_message()
+            with self._lock:
+                message = self.agv_simulator.get_state_message()
             
             # 保存状态消息到文件
             state_data = json.loads(message) if isinstance(message, str) else message
             self.file_storage.save_state(self.robot_id, state_data)
-            
-            self.mqtt_client.publish(
-                self.agv_simulator.state_topic,
-                message,
-                qos=0
-            )
+            return message
         except Exception as e:
             logger.error(f"机器人 {self.robot_id} 发布状态消息失败: {e}")
+            return None
     
     def _publish_visualization_message(self):
-        """发布可视化消息"""
+        """发布可视化消息（消息在批处理器发布时才生成）"""
+        self.publish_batcher.add(
+            self.agv_simulator.visualization_topic,
+            self._render_visualization_message,
+            qos=0
+        )
+    
+    def _render_visualization_message(self) -> Optional[str]:
+        """生成可视化消息并保存到文件"""
         try:
-            message = self.agv_simulator.get_visualization_message()
+            with self._lock:
+                message = self.agv_simulator.get_visualization_message()
             
             # 保存可视化消息到文件
             visualization_data = json.loads(message) if isinstance(message, str) else message
             self.file_storage.save_visualization(self.robot_id, visualization_data)
-            
-            self.mqtt_client.publish(
-                self.agv_simulator.visualization_topic,
-                message,
-                qos=0
-            )
+            return message
         except Exception as e:
             logger.error(f"机器人 {self.robot_id} 发布可视化消息失败: {e}")
+            return None
+    
+    def _refresh_summary(self):
+        """
+        根据内存中的AGV状态重建状态摘要（整体替换，不修改已发出的字典）
+        未运行的机器人尚未把状态文件加载到模拟器，位置以 current_state.json 为准，与 get_status 一致
+        """
+        state = self.agv_simulator.state
+        position = None if self.running else self._stored_position()
+        if position is None:
+            agv_position = getattr(state, 'agv_position', None)
+            if agv_position is not None:
+                position = {"x": agv_position.x, "y": agv_position.y, "theta": agv_position.theta}
+            else:
+                position = {"x": 0.0, "y": 0.0, "theta": 0.0}
+        battery_state = getattr(state, 'battery_state', None)
+        listener = self.status_listener
+        if listener is not None and self._summary.get("status") != self.status:
+            listener(self.robot_id, self.status)
+        summary = {
+            "id": self.robot_id,
+            "status": self.status,
+            "position": position,
+            "battery": getattr(battery_state, 'battery_charge', 100),
+            # 状态信息中尚无告警/故障字段，与 get_status 的结果保持一致
+            "is_warning": False,
+            "is_fault": False
+        }
+        self._summary_entry = (next(_summary_serials), summary)
+        self._summary = summary
+    
+    def _stored_position(self) -> Optional[Dict[str, Any]]:
+        """从状态文件读取位置，文件不存在或读取失败时返回 None"""
+        try:
+            state_data = self.file_storage.get_state(self.robot_id)
+        except Exception as e:
+            logger.warning(f"从状态文件读取机器人 {self.robot_id} 位置信息失败: {e}")
+            return None
+        if not state_data or not isinstance(state_data, dict):
+            return None
+        pos = state_data.get("agvPosition") or {}
+        return {"x": pos.get("x", 0.0), "y": pos.get("y", 0.0), "theta": pos.get("theta", 0.0)}
+    
+    def get_summary(self) -> Dict[str, Any]:
+        """
+        获取状态摘要
+        
+        Returns:
+            形如 {id, status, position, battery, is_warning, is_fault} 的字典；
+            该字典在状态变化时被整体替换，调用方只读，不得修改
+        """
+        return self._summary
+    
+    def get_summary_entry(self) -> Tuple[int, Dict[str, Any]]:
+        """
+        获取带序号的状态摘要
+        
+        Returns:
+            (摘要序号, 状态摘要)；每次重建摘要都取新的序号，进程内不会重复，
+            序号相同即摘要内容相同
+        """
+        return self._summary_entry
     
     def get_status(self) -> Dict[str, Any]:
-        """获取机器人状态信息"""
+        """
+        获取机器人状态信息
+        
+        Returns:
+            只由基本类型（字符串、数字、布尔、None、字典）组成的状态字典，可直接编码为JSON
+        """
         with self._lock:
-            # 安全获取电池状态
+            # 电池电量和订单ID直接读取模拟器的 State 数据类字段
             battery_charge = 100  # 默认值
+            current_order = None
             try:
-                if hasattr(self.agv_simulator.state, 'battery_state'):
-                    battery_state = self.agv_simulator.state.battery_state
-                    if hasattr(battery_state, 'battery_charge'):
-                        battery_charge = battery_state.battery_charge
-                    elif isinstance(battery_state, dict):
-                        battery_charge = battery_state.get('battery_charge', 100)
+                state = self.agv_simulator.state
+                battery_charge = state.battery_state.battery_charge
+                current_order = state.order_id
             except Exception as e:
-                logger.warning(f"获取机器人 {self.robot_id} 电池状态失败: {e}")
+                logger.warning(f"获取机器人 {self.robot_id} 电池或订单信息失败: {e}")
             
             # 从文件读取位置信息，确保与current_state.json一致
             position = {"x": 0.0, "y": 0.0, "theta": 0.0}
@@ -279,14 +400,6 @@ class RobotInstance:
             except Exception as e:
                 logger.warning(f"从状态文件读取机器人 {self.robot_id} 位置信息失败: {e}")
             
-            # 安全获取订单ID
-            current_order = None
-            try:
-                if hasattr(self.agv_simulator.state, 'order_id'):
-                    current_order = self.agv_simulator.state.order_id
-            except Exception as e:
-                logger.warning(f"获取机器人 {self.robot_id} 订单信息失败: {e}")
-            
             return {
                 "robot_id": self.robot_id,
                 "status": self.status,
@@ -299,6 +412,23 @@ class RobotInstance:
                 "current_order": current_order
             }
     
+    def get_status_json(self) -> bytes:
+        """
+        获取序列化后的状态信息
+        
+        Returns:
+            get_status() 结果的JSON字节串；状态未变化时直接返回缓存
+        """
+        summary = self._summary
+        running = self.running
+        state_mtime = self.file_storage.get_state_mtime(self.robot_id)
+        cached = self._status_json
+        if cached is not None and cached[0] is summary and cached[1] == running and cached[2] == state_mtime:
+            return cached[3]
+        data = to_json_bytes(self.get_status())
+        self._status_json = (summary, running, state_mtime, data)
+        return data
+    
     def send_order(self, order_data: Dict[str, Any]):
         """发送订单给机器人"""
         try:
@@ -321,7 +451,7 @@ class RobotInstance:
     
     def is_alive(self) -> bool:
         """检查机器人实例是否存活"""
-        return self.running and (self.thread is not None and self.thread.is_alive())
+        return self.running and self._thread_alive
     
     def get_serial_number(self) -> str:
         """获取机器人序列号"""
@@ -349,7 +479,6 @@ class RobotInstance:
                         self.agv_simulator.state.agv_position.theta = theta
                         self.agv_simulator.state.agv_position.position_initialized = True
                     else:
-                        from vda5050.state import AgvPosition
                         self.agv_simulator.state.agv_position = AgvPosition(
                             x=x, y=y, theta=theta, 
                             map_id=self.config['settings']['map_id'],
@@ -367,6 +496,7 @@ class RobotInstance:
                     # 立即发布更新后的状态和可视化消息
                     self._publish_state_message()
                     self._publish_visualization_message()
+                    self._refresh_summary()
                 
                 logger.info(f"机器人 {self.robot_id} 位置已更新并发布MQTT消息: x={x}, y={y}, theta={theta}")
             
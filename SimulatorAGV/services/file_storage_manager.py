@@ -149,6 +149,21 @@ class FileStorageManager:
             logger.error(f"获取机器人 {robot_id} 状态失败: {e}")
             return None
     
+    def get_state_mtime(self, robot_id: str) -> Optional[int]:
+        """
+        获取机器人状态文件的修改时间
+        
+        Args:
+            robot_id: 机器人ID
+            
+        Returns:
+            修改时间（纳秒），文件不存在时返回 None
+        """
+        try:
+            return os.stat(self.base_path / robot_id / "state" / "current_state.json").st_mtime_ns
+        except OSError:
+            return None
+    
     def save_connection(self, robot_id: str, connection_data: Dict[str, Any]) -> bool:
         """
         保存机器人连接数据
@@ -547,12 +562,18 @@ class FileStorageManager:
 
 
 # 全局文件存储管理器实例
-_file_storage_manager = None
+_file_storage_manager: Optional[FileStorageManager] = None
+# 保护单例的创建，已创建后的读取不需要加锁
+_file_storage_manager_lock = threading.Lock()
 
 
 def get_file_storage_manager() -> FileStorageManager:
-    """获取全局文件存储管理器实例"""
+    """获取全局文件存储管理器实例（线程安全，并行创建机器人时只创建一个实例）"""
     global _file_storage_manager
-    if _file_storage_manager is None:
-        _file_storage_manager = FileStorageManager()
-    return _file_storage_manager
\ No newline at end of file
+    manager = _file_storage_manager
+    if manager is not None:
+        return manager
+    with _file_storage_manager_lock:
+        if _file_storage_manager is None:
+            _file_storage_manager = FileStorageManager()
+        return _file_storage_manager
\ No newline at end of file
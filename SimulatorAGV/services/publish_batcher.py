@@ -0,0 +1,144 @@
+"""
+MQTT发布批处理器
+将高频的状态/可视化消息先写入内存队列，由后台线程批量发布；队列为空时线程阻塞等待，不做空转轮询。
+对只关心最新值的主题（latest_only），新消息直接覆盖尚未发布的旧消息，且立即发布；
+普通消息不足一批时最多等待空闲超时以凑批；
+消息内容可以是无参可调用对象，在发布时才生成，被覆盖的消息不会产生序列化开销。
+"""
+
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared import setup_logger
+
+logger = setup_logger()
+
+
+class PublishBatcher:
+    """MQTT发布批处理器"""
+
+    def __init__(self, publish: Callable[..., None], batch_size: int = 8,
+                 idle_timeout: float = 0.02, max_pending: int = 256,
+                 latest_only: Iterable[str] = (), name: str = "PublishBatcher"):
+        """
+        初始化发布批处理器
+
+        Args:
+            publish: 实际的发布函数，签名为 publish(topic, payload, qos=..., retain=...)
+            batch_size: 待发布消息达到该数量时立即刷新
+            idle_timeout: 普通消息不足 batch_size 时等待凑批的最长时间（秒）
+            max_pending: 每个队列的最大长度，超出时丢弃最旧的消息
+            latest_only: 只保留最新一条待发布消息的主题
+            name: 后台线程名称
+        """
+        self._publish = publish
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.name = name
+        self.latest_only = frozenset(latest_only)
+
+        # latest_only 主题的最新待发布消息: topic -> (payload, qos, retain)
+        self._latest: Dict[str, Tuple[Any, int, bool]] = {}
+        # 高优先级队列（状态消息）先于普通队列发布
+        self._high: Deque[Tuple[str, Any, int, bool]] = deque(maxlen=max_pending)
+        self._normal: Deque[Tuple[str, Any, int, bool]] = deque(maxlen=max_pending)
+
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, topic: str, payload: Any, qos: int = 0, retain: bool = False, priority: bool = False):
+        """
+        添加待发布消息，批处理器未启动时直接发布
+
+        Args:
+            topic: MQTT主题
+            payload: 消息内容，或在发布时调用以生成内容的无参函数（返回 None 时跳过）
+            qos: 服务质量等级
+            retain: 是否保留消息
+            priority: 是否放入高优先级队列
+        """
+        with self._cond:
+            if self._running:
+                # 队列由空变为非空或达到批量阈值时唤醒后台线程
+                was_empty = not self._pending()
+                if topic in self.latest_only:
+                    self._latest[topic] = (payload, qos, retain)
+                else:
+                    queue = self._high if priority else self._normal
+                    queue.append((topic, payload, qos, retain))
+                if was_empty or self._pending() >= self.batch_size:
+                    self._cond.notify()
+                return
+
+        self._send([(topic, payload, qos, retain)])
+
+    def flush(self):
+        """立即发布所有待发布消息"""
+        with self._cond:
+            batch = self._drain()
+        self._send(batch)
+
+    def start(self):
+        """启动后台刷新线程"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台刷新线程并发布剩余消息"""
+        if not self._running:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self._thread = None
+        self.flush()
+
+    def _pending(self) -> int:
+        """待发布消息数量（调用方需持有 _cond）"""
+        return len(self._latest) + len(self._high) + len(self._normal)
+
+    def _drain(self) -> List[Tuple[str, Any, int, bool]]:
+        """取出所有待发布消息（调用方需持有 _cond）"""
+        batch = [(topic, payload, qos, retain) for topic, (payload, qos, retain) in self._latest.items()]
+        batch.extend(self._high)
+        batch.extend(self._normal)
+        self._latest.clear()
+        self._high.clear()
+        self._normal.clear()
+        return batch
+
+    def _send(self, batch: List[Tuple[str, Any, int, bool]]):
+        """在锁外逐条发布消息"""
+        for topic, payload, qos, retain in batch:
+            try:
+                if callable(payload):
+                    payload = payload()
+                    if payload is None:
+                        continue
+                self._publish(topic, payload, qos=qos, retain=retain)
+            except Exception as e:
+                logger.error(f"批量发布消息到 {topic} 失败: {e}")
+
+    def _run(self):
+        """后台刷新循环，剩余消息在 stop() 中发布"""
+        while True:
+            with self._cond:
+                while self._running and not self._pending():
+                    self._cond.wait()
+                if not self._running:
+                    return
+                # 只有普通/高优先级队列能通过等待凑批；latest_only 主题只保留最新值，等待只会增加延迟
+                if (self._high or self._normal) and self._pending() < self.batch_size:
+                    self._cond.wait(self.idle_timeout)
+                batch = self._drain()
+            self._send(batch)
@@ -0,0 +1,318 @@
+"""
+机器人注册文件缓存
+在内存中保存 registered_robots.json 的内容，按文件修改时间判断是否需要重新读取；
+修改在内存中完成后延迟写回，短时间内的多次修改合并为一次写入，
+写入时先写临时文件再原子替换，避免读取方看到写了一半的文件。
+文件内容无法解析（如写了一半）时抛出 RegistryFileError，不把解析失败当作空列表缓存。
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared import setup_logger, to_json_bytes, from_json_bytes
+
+# 可选的按模式解码的JSON解析器
+try:
+    import msgspec
+    _use_msgspec = True
+except ImportError:
+    _use_msgspec = False
+
+logger = setup_logger()
+
+# 写回失败后重试的最长间隔（秒），每次失败间隔加倍直到该值
+FLUSH_RETRY_MAX_DELAY = 30.0
+
+
+class RegistryFileError(ValueError):
+    """注册文件内容无法解析"""
+
+
+if _use_msgspec:
+    class RobotEntry(msgspec.Struct, forbid_unknown_fields=True):
+        """注册文件中的机器人条目，未出现的字段保持 UNSET，转换回字典时省略"""
+        serialNumber: str
+        manufacturer: Union[str, msgspec.UnsetType] = msgspec.UNSET
+        type: Union[str, msgspec.UnsetType] = msgspec.UNSET
+        ip: Union[str, msgspec.UnsetType] = msgspec.UNSET
+        name: Union[Optional[str], msgspec.UnsetType] = msgspec.UNSET
+
+    _registry_decoder = msgspec.json.Decoder(List[RobotEntry])
+
+
+def _decode_registry(data: bytes) -> List[Dict[str, Any]]:
+    """
+    解析注册文件内容
+    安装了msgspec且内容符合 RobotEntry 模式时按模式解码，否则（如含有额外字段）按普通JSON解析
+
+    Raises:
+        RegistryFileError: 内容不是合法JSON或顶层不是列表（包括空文件）
+    """
+    if _use_msgspec:
+        try:
+            return msgspec.to_builtins(_registry_decoder.decode(data))
+        except msgspec.ValidationError:
+            pass
+        except msgspec.DecodeError as e:
+            raise RegistryFileError(f"注册文件不是合法的JSON: {e}") from e
+    try:
+        robots = from_json_bytes(data)
+    except ValueError as e:
+        raise RegistryFileError(f"注册文件不是合法的JSON: {e}") from e
+    if not isinstance(robots, list):
+        raise RegistryFileError("注册文件顶层不是列表")
+    return robots
+
+
+class RegistryFileCache:
+    """注册文件的内存视图，支持延迟合并写回"""
+
+    def __init__(self, path: str, flush_delay: float = 0.2):
+        """
+        初始化注册文件缓存
+
+        Args:
+            path: 注册文件路径
+            flush_delay: 修改后延迟写回的时间（秒），期间的修改合并为一次写入
+        """
+        self.path = path
+        self.flush_delay = flush_delay
+        # _lock 保护内存中的列表和索引；_flush_lock 使文件写入串行进行，
+        # 写文件时不持有 _lock，写入期间的修改不被阻塞
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._data: List[Dict[str, Any]] = []
+        # 已加载内容对应的文件修改时间，None 表示尚未加载
+        self._mtime_ns: Optional[int] = None
+        # 序列号 -> 列表下标，以及建立索引时列表的长度
+        self._index: Dict[str, int] = {}
+        self._indexed_len = 0
+        # 内存中存在尚未写回的修改，以及每次修改递增的版本号
+        self._dirty = False
+        self._version = 0
+        self._timer: Optional[threading.Timer] = None
+        # 写回失败后的重试间隔，成功写回后清零
+        self._retry_delay = 0.0
+        # 存在未写回修改期间已提示过的外部修改时间，避免重复告警
+        self._warned_mtime_ns: Optional[int] = None
+        # edit() 块内的撤销记录：(块开始时的列表长度, id(条目) -> (条目, 修改前的副本))，块外为 None
+        self._undo: Optional[Tuple[int, Dict[int, Tuple[Dict[str, Any], Dict[str, Any]]]]] = None
+
+    def _load(self) -> List[Dict[str, Any]]:
+        """
+        加载注册文件内容（调用方需持有锁），文件未变化时直接复用已加载的内容
+
+        Raises:
+            RegistryFileError: 文件内容无法解析；已加载的内容保持不变，下次访问时重新读取
+        """
+        if self._dirty:
+            # 尚未写回的修改比文件内容更新，写回时会覆盖文件；文件被外部修改时提示一次
+            self._check_external_change()
+            return self._data
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._data, self._mtime_ns = [], None
+            self._build_index()
+            return self._data
+        if mtime_ns != self._mtime_ns:
+            with open(self.path, 'rb') as f:
+                data = _decode_registry(f.read())
+            self._data = data
+            self._mtime_ns = mtime_ns
+            self._build_index()
+        return self._data
+
+    def _check_external_change(self):
+        """存在未写回修改时检查文件是否被外部修改（调用方需持有锁），被修改时记录告警"""
+        if self._flush_lock.locked():
+            # 正在写回，文件修改时间稍后才会更新
+            return
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+        if mtime_ns != self._mtime_ns and mtime_ns != self._warned_mtime_ns:
+            self._warned_mtime_ns = mtime_ns
+            logger.warning(f"注册文件在存在未写回修改时被外部修改，外部修改将被内存中的内容覆盖: {self.path}")
+
+    def _build_index(self):
+        """按序列号重建下标索引（调用方需持有锁），重复的序列号以第一个条目为准"""
+        index: Dict[str, int] = {}
+        for i, robot in enumerate(self._data):
+            serial_number = robot.get('serialNumber')
+            if serial_number and serial_number not in index:
+                index[serial_number] = i
+        self._index = index
+        self._indexed_len = len(self._data)
+
+    def load(self) -> List[Dict[str, Any]]:
+        """获取注册的机器人列表（返回副本）"""
+        with self._lock:
+            return [dict(robot) for robot in self._load()]
+
+    def find(self, serial_number: str) -> Optional[Dict[str, Any]]:
+        """
+        按序列号查找注册条目（返回内部对象，修改需在 edit() 块内进行）
+
+        Args:
+            serial_number: 机器人序列号
+
+        Returns:
+            注册条目，不存在时返回 None
+        """
+        with self._lock:
+            data = self._load()
+            idx = self._index.get(serial_number)
+            if idx is None or idx >= len(data) or data[idx].get('serialNumber') != serial_number:
+                if idx is None and len(data) == self._indexed_len:
+                    return None
+                # 列表在索引之外被修改过，重建后再查一次
+                self._build_index()
+                idx = self._index.get(serial_number)
+                if idx is None:
+                    return None
+            entry = data[idx]
+            undo = self._undo
+            if undo is not None and id(entry) not in undo[1]:
+                # 在 edit() 块内取出的条目可能被修改，先保存副本供异常时恢复
+                undo[1][id(entry)] = (entry, dict(entry))
+            return entry
+
+    def append(self, entry: Dict[str, Any]):
+        """追加注册条目并更新索引（需在 edit() 块内调用，块内抛出异常时移除）"""
+        with self._lock:
+            data = self._load()
+            data.append(entry)
+            serial_number = entry.get('serialNumber')
+            if self._indexed_len == len(data) - 1:
+                if serial_number and serial_number not in self._index:
+                    self._index[serial_number] = len(data) - 1
+                self._indexed_len = len(data)
+
+    @contextmanager
+    def edit(self) -> Iterator[List[Dict[str, Any]]]:
+        """
+        修改注册的机器人列表
+
+        在 with 块内通过 find() 取得条目后原地修改，新增条目使用 append()，
+        正常退出后标记为待写回并安排延迟写入；
+        块内抛出异常时只撤销本次经 find() 取得的条目上的修改和 append() 追加的条目，
+        之前已完成但尚未写回的修改保留；
+        文件内容无法解析时抛出 RegistryFileError，不进入 with 块
+        """
+        with self._lock:
+            data = self._load()
+            if self._undo is not None:
+                # 嵌套的 edit() 由最外层统一提交或撤销
+                yield data
+                return
+            self._undo = (len(data), {})
+            try:
+                yield data
+            except BaseException:
+                self._rollback()
+                raise
+            finally:
+                self._undo = None
+            self._dirty = True
+            self._version += 1
+            self._schedule_flush(self.flush_delay)
+
+    def _rollback(self):
+        """撤销当前 edit() 块内的修改（调用方需持有锁）"""
+        start_len, entries = self._undo
+        for entry, original in entries.values():
+            entry.clear()
+            entry.update(original)
+        data = self._data
+        if len(data) > start_len:
+            for entry in data[start_len:]:
+                serial_number = entry.get('serialNumber')
+                if serial_number and self._index.get(serial_number, -1) >= start_len:
+                    del self._index[serial_number]
+            del data[start_len:]
+            self._indexed_len = min(self._indexed_len, start_len)
+
+    def _schedule_flush(self, delay: float):
+        """安排延迟写回（调用方需持有锁），已有等待中的写回时不重复安排"""
+        if self._timer is None:
+            self._timer = threading.Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> bool:
+        """
+        立即写回尚未保存的修改
+
+        Returns:
+            写回成功或没有待写回的修改时返回 True
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return True
+                # 在锁内将当前内容完整序列化为字节串，落盘在锁外进行
+                try:
+                    data = to_json_bytes(self._data, indent=2)
+                except Exception as e:
+                    logger.error(f"序列化注册文件失败: {e}")
+                    return False
+                version = self._version
+            tmp_path = f"{self.path}.tmp"
+            try:
+                # 一次写入临时文件并落盘，最后原子替换
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                mtime_ns = os.stat(self.path).st_mtime_ns
+            except Exception as e:
+                # 保留待写回状态，按逐次加倍的间隔重试
+                with self._lock:
+                    delay = self._retry_delay = min(max(self._retry_delay * 2, self.flush_delay), FLUSH_RETRY_MAX_DELAY)
+                    self._schedule_flush(delay)
+                logger.error(f"写入注册文件失败，{delay:.2f} 秒后重试: {e}")
+                return False
+            with self._lock:
+                self._retry_delay = 0.0
+                self._warned_mtime_ns = None
+                self._mtime_ns = mtime_ns
+                # 写入期间又有新的修改时保持待写回状态，由其安排的延迟写入继续保存
+                if self._version == version:
+                    self._dirty = False
+            return True
+
+
+# 注册文件路径 -> 缓存实例
+_caches: Dict[str, RegistryFileCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_registry_file_cache(path: str) -> RegistryFileCache:
+    """获取指定注册文件的缓存实例（同一文件共享一个实例）"""
+    key = os.path.abspath(path)
+    cache = _caches.get(key)
+    if cache is not None:
+        return cache
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = RegistryFileCache(key)
+        return cache
+
+
+def flush_registry_file_caches():
+    """写回所有缓存中尚未保存的修改，在服务停止时调用"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.flush()
@@ -0,0 +1,12 @@
+"""
+测试公共配置
+模拟器模块使用 `from vda5050...` 这样的顶层导入，需要把 SimulatorAGV 目录和项目根目录加入搜索路径
+"""
+
+import os
+import sys
+
+_SIMULATOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _path in (_SIMULATOR_DIR, os.path.dirname(_SIMULATOR_DIR)):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
@@ -0,0 +1,125 @@
+"""
+AgvSimulator 状态消息测试
+get_state_message 使用预先序列化的不变字段前缀拼接变化字段，解析后必须与 State.to_json() 的内容一致
+"""
+
+import json
+
+import pytest
+
+from SimulatorAGV.services import file_storage_manager
+from agv_simulator import AgvSimulator
+from vda5050.instant_actions import InstantActions
+from vda5050.order import Order
+
+
+CONFIG = {
+    "mqtt_broker": {"host": "localhost", "port": 1883, "vda_interface": "uagv"},
+    "vehicle": {
+        "serial_number": "TEST-01",
+        "manufacturer": "SimulatorAGV",
+        "vda_version": "v2",
+        "vda_full_version": "2.0.0"
+    },
+    "settings": {
+        "map_id": "default",
+        "state_frequency": 1,
+        "visualization_frequency": 1,
+        "action_time": 1.0,
+        "robot_count": 1,
+        "speed": 0.05
+    }
+}
+
+
+@pytest.fixture
+def simulator(tmp_path, monkeypatch):
+    """使用临时存储目录创建的模拟器，不读取已持久化的状态"""
+    storage = file_storage_manager.FileStorageManager(str(tmp_path / "robot_data"))
+    monkeypatch.setattr(file_storage_manager, "_file_storage_manager", storage)
+    return AgvSimulator(CONFIG)
+
+
+def assert_state_message_matches(sim: AgvSimulator) -> dict:
+    message = json.loads(sim.get_state_message())
+    assert message == json.loads(sim.state.to_json())
+    return message
+
+
+def test_state_message_default_state(simulator):
+    assert_state_message_matches(simulator)
+    simulator.update_state()
+    assert_state_message_matches(simulator)
+
+
+def test_state_message_after_order(simulator):
+    order = Order.from_dict({
+        "headerId": 1,
+        "orderId": "order-1",
+        "orderUpdateId": 0,
+        "nodes": [
+            {
+                "nodeId": "n1", "sequenceId": 0, "released": True,
+                "nodePosition": {"x": 1.0, "y": 2.0, "theta": 0.0, "mapId": "default"},
+                "actions": [{"actionId": "a1", "actionType": "pick", "blockingType": "HARD"}]
+            },
+            {"nodeId": "n2", "sequenceId": 2, "released": True, "actions": []}
+        ],
+        "edges": [
+            {"edgeId": "e1", "sequenceId": 1, "startNodeId": "n1", "endNodeId": "n2", "released": True, "actions": []}
+        ]
+    })
+    simulator.accept_order(order)
+    message = assert_state_message_matches(simulator)
+    assert message["orderId"] == "order-1"
+    assert [node["nodeId"] for node in message["nodeStates"]] == ["n1", "n2"]
+    assert [action["actionId"] for action in message["actionStates"]] == ["a1"]
+    simulator.update_state()
+    assert_state_message_matches(simulator)
+
+
+def test_state_message_after_instant_actions(simulator):
+    instant_actions = InstantActions.from_dict({
+        "headerId": 1,
+        "actions": [{
+            "actionId": "init-1",
+            "actionType": "initPosition",
+            "blockingType": "NONE",
+            "actionParameters": [
+                {"key": "x", "value": 3.5},
+                {"key": "y", "value": "4.5"},
+                {"key": "theta", "value": 0.5},
+                {"key": "mapId", "value": "map-2"},
+                {"key": "lastNodeId", "value": "n9"}
+            ]
+        }]
+    })
+    simulator.accept_instant_actions(instant_actions)
+    message = assert_state_message_matches(simulator)
+    assert message["actionStates"][0]["actionStatus"] == "WAITING"
+    simulator.update_state()
+    message = assert_state_message_matches(simulator)
+    assert message["agvPosition"]["x"] == 3.5
+    assert message["lastNodeId"] == "n9"
+
+
+def test_init_position_with_null_parameters(simulator):
+    instant_actions = InstantActions.from_dict({
+        "headerId": 1,
+        "actions": [{
+            "actionId": "init-2",
+            "actionType": "initPosition",
+            "blockingType": "NONE",
+            "actionParameters": [
+                {"key": "x", "value": None},
+                {"key": "y", "value": 2.0},
+                {"key": "theta", "value": None}
+            ]
+        }]
+    })
+    simulator.accept_instant_actions(instant_actions)
+    simulator.update_state()
+    assert simulator.instant_actions.actions == []
+    message = assert_state_message_matches(simulator)
+    assert message["agvPosition"]["x"] == 0.0
+    assert message["agvPosition"]["y"] == 2.0
@@ -1,8 +1,9 @@
 import json
+import math
 import random
 import sys
 import os
-from datetime import datetime, timezone
+import time
 from typing import Dict, Any
 
 # 添加项目根目录到Python路径
@@ -14,9 +15,26 @@ if project_root not in sys.path:
 from shared import get_config
 
 
+# 时间戳格式化缓存: (秒, 秒级前缀) 与 (毫秒, 完整时间戳)，均以整体替换保证线程安全
+_second_prefix = (-1, "")
+_last_timestamp = (-1, "")
+
+
 def get_timestamp() -> str:
-    """获取当前UTC时间戳"""
-    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+    """获取当前UTC时间戳（同一毫秒内复用已格式化的字符串）"""
+    global _second_prefix, _last_timestamp
+    ms = time.time_ns() // 1_000_000
+    cached_ms, cached = _last_timestamp
+    if ms == cached_ms:
+        return cached
+    second, millis = divmod(ms, 1000)
+    cached_second, prefix = _second_prefix
+    if second != cached_second:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        _second_prefix = (second, prefix)
+    timestamp = f"{prefix}.{millis:03d}Z"
+    _last_timestamp = (ms, timestamp)
+    return timestamp
 
 
 def load_config(config_path: str = "config.json") -> Dict[str, Any]:
@@ -56,7 +74,7 @@ def get_topic_type(topic: str) -> str:
 
 def get_distance(x1: float, y1: float, x2: float, y2: float) -> float:
     """计算两点之间的距离"""
-    return ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5
+    return math.hypot(x2 - x1, y2 - y1)
 
 
 def generate_random_position(min_val: float = -2.5, max_val: float = 2.5) -> tuple:
@@ -0,0 +1,45 @@
+"""
+AGV运动计算内核
+安装了numba时使用JIT编译版本，否则回退到纯Python实现
+"""
+import math
+
+try:
+    from numba import njit
+    _use_numba = True
+except ImportError:
+    _use_numba = False
+
+
+# 到达判定阈值（米）
+ARRIVAL_THRESHOLD = 0.1
+
+_hypot = math.hypot
+
+
+def _step_toward_py(ax: float, ay: float, tx: float, ty: float, speed: float) -> tuple:
+    """
+    向目标点前进一步
+
+    Returns:
+        (新x, 新y, 是否到达, 是否行驶)，标志位以1.0/0.0表示
+    """
+    dx = tx - ax
+    dy = ty - ay
+    length = _hypot(dx, dy)
+    if length < ARRIVAL_THRESHOLD:
+        return ax, ay, 1.0, 0.0
+    # 未到达时距离不小于阈值，可直接用于方向归一化，只做一次除法
+    scale = speed / length
+    return ax + dx * scale, ay + dy * scale, 0.0, 1.0
+
+
+step_toward = _step_toward_py
+if _use_numba:
+    # 不启用 fastmath，到达判定的比较结果与纯Python实现保持一致
+    try:
+        step_toward = njit('UniTuple(f8,4)(f8,f8,f8,f8,f8)', cache=True)(_step_toward_py)
+    except Exception as e:
+        # numba 安装不完整时按签名预编译会失败，回退到纯Python实现而不是导入失败
+        from shared import setup_logger
+        setup_logger().warning(f"numba编译运动内核失败，使用纯Python实现: {e}")
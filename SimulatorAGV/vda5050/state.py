@@ -1,7 +1,11 @@
 import json
+import sys
 from typing import List, Optional
 from dataclasses import dataclass, field
 
+# 高频访问的数据类使用 __slots__（需要 Python 3.10+），省去实例字典
+_slots = {"slots": True} if sys.version_info >= (3, 10) else {}
+
 @dataclass
 class BatteryState:
     battery_charge: float = 0.0
@@ -26,7 +30,7 @@ class SafetyState:
             "fieldViolation": self.field_violation
         }
 
-@dataclass
+@dataclass(**_slots)
 class AgvPosition:
     x: float = 0.0
     y: float = 0.0
@@ -49,7 +53,7 @@ class AgvPosition:
             "deviationRange": self.deviation_range
         }
 
-@dataclass
+@dataclass(**_slots)
 class NodeState:
     node_id: str = ""
     sequence_id: int = 0
@@ -68,7 +72,7 @@ class NodeState:
             result["nodePosition"] = self.node_position.to_dict()
         return result
 
-@dataclass
+@dataclass(**_slots)
 class EdgeState:
     edge_id: str = ""
     sequence_id: int = 0
@@ -83,7 +87,7 @@ class EdgeState:
             "released": self.released
         }
 
-@dataclass
+@dataclass(**_slots)
 class ActionState:
     action_id: str = ""
     action_type: str = ""
@@ -135,7 +139,24 @@ class State:
             "timestamp": self.timestamp,
             "version": self.version,
             "manufacturer": self.manufacturer,
-            "serialNumber": self.serial_number,
+            "serialNumber": self.serial_number
+        }
+        result.update(self.to_dynamic_dict())
+        return result
+    
+    def to_static_dict(self):
+        """运行期间不会变化的字段"""
+        return {
+            "version": self.version,
+            "manufacturer": self.manufacturer,
+            "serialNumber": self.serial_number
+        }
+    
+    def to_dynamic_dict(self):
+        """除 version/manufacturer/serialNumber 之外、随运行变化的字段"""
+        result = {
+            "headerId": self.header_id,
+            "timestamp": self.timestamp,
             "orderId": self.order_id,
             "orderUpdateId": self.order_update_id,
             "lastNodeId": self.last_node_id,
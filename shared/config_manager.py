@@ -61,6 +61,9 @@ class StorageConfig:
     base_path: str = "robot_data"
     max_history_entries: int = 100
     auto_cleanup_days: int = 30
+    # 注册文件监控的轮询间隔，以及检测到变化后等待文件稳定的时间（秒）
+    registry_poll_interval: float = 1.0
+    registry_settle_time: float = 0.5
 
 
 @dataclass
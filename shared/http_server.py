@@ -9,11 +9,11 @@ from abc import ABC, abstractmethod
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from socketserver import ThreadingMixIn
 from typing import Dict, Any, Callable, Optional, Tuple
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import parse_qs
 import threading
 import time
 
-from .serialization import create_json_response, from_json
+from .serialization import create_json_response_bytes, from_json
 from .logger_config import setup_logger
 
 
@@ -63,10 +63,9 @@ class BaseHTTPHandler(BaseHTTPRequestHandler):
     
     def _handle_request(self, method: str):
         """统一处理请求"""
-        # 解析URL和查询参数
-        parsed_url = urlparse(self.path)
-        path = parsed_url.path
-        query_params = parse_qs(parsed_url.query)
+        # 解析URL和查询参数：请求行中的路径只需在 ? 处切分，没有查询字符串时不做解析
+        path, _, query = self.path.partition('?')
+        query_params = parse_qs(query) if query else {}
         
         # 获取请求体数据
         request_data = None
@@ -94,22 +93,23 @@ class BaseHTTPHandler(BaseHTTPRequestHandler):
     def _send_response(self, data: Any, status_code: int = 200):
         """发送响应"""
         try:
+            # 响应体只编码一次，长度和写入使用同一个字节串
             if isinstance(data, str):
-                response_body = data
+                response_body = data.encode('utf-8')
                 content_type = 'text/plain; charset=utf-8'
             else:
-                response_body, _ = create_json_response(data)
+                response_body, _ = create_json_response_bytes(data)
                 content_type = 'application/json; charset=utf-8'
             
             self.send_response(status_code)
             self.send_header('Content-Type', content_type)
-            self.send_header('Content-Length', str(len(response_body.encode('utf-8'))))
+            self.send_header('Content-Length', str(len(response_body)))
             self.send_header('Access-Control-Allow-Origin', '*')
             self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
             self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
             self.end_headers()
             
-            self.wfile.write(response_body.encode('utf-8'))
+            self.wfile.write(response_body)
             
         except Exception as e:
             self.logger.error(f"发送响应失败: {e}")
@@ -124,15 +124,15 @@ class BaseHTTPHandler(BaseHTTPRequestHandler):
                 "status": status_code,
                 "timestamp": time.time()
             }
-            response_body, _ = create_json_response(error_data)
+            response_body, _ = create_json_response_bytes(error_data)
             
             self.send_response(status_code)
             self.send_header('Content-Type', 'application/json; charset=utf-8')
-            self.send_header('Content-Length', str(len(response_body.encode('utf-8'))))
+            self.send_header('Content-Length', str(len(response_body)))
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            self.wfile.write(response_body.encode('utf-8'))
+            self.wfile.write(response_body)
             
         except Exception as e:
             self.logger.error(f"发送错误响应失败: {e}")
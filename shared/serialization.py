@@ -3,11 +3,18 @@
 简化项目中的JSON序列化/反序列化逻辑
 """
 import json
-from typing import Any, Dict, List, Union, Type, TypeVar
+from typing import Any, Dict, List, Tuple, Union, Type, TypeVar
 from dataclasses import is_dataclass, asdict
 from datetime import datetime
 from enum import Enum
 
+# 可选的高性能JSON编码器
+try:
+    import orjson
+    _use_orjson = True
+except ImportError:
+    _use_orjson = False
+
 T = TypeVar('T')
 
 
@@ -36,52 +43,83 @@ class SerializationMixin:
         return cls.from_dict(data)
 
 
-def safe_serialize(obj: Any) -> Any:
+# 可直接返回的基本类型（精确类型，子类仍按下面的规则逐项判断）
+_PRIMITIVE_TYPES = frozenset((str, int, float, bool, type(None)))
+
+# 嵌套层级上限，超过时视为存在循环引用
+_MAX_SERIALIZE_DEPTH = 1000
+
+
+def _convert_object(obj: Any) -> Tuple[Any, bool]:
     """
-    安全序列化对象
-    处理各种Python对象类型，转换为JSON可序列化的格式
+    按 safe_serialize 的规则转换内置 dict/list/tuple 以外的对象
+
+    Returns:
+        (转换结果, 是否为最终结果)；不是最终结果时还需继续遍历其中的元素
     """
-    if obj is None:
-        return None
-    
-    # 基本类型直接返回
+    # 基本类型的子类（如 IntEnum）直接返回
     if isinstance(obj, (str, int, float, bool)):
-        return obj
-    
-    # 日期时间类型
+        return obj, True
     if isinstance(obj, datetime):
-        return obj.isoformat()
-    
-    # 枚举类型
+        return obj.isoformat(), True
     if isinstance(obj, Enum):
-        return obj.value
-    
-    # 有to_dict方法的对象
-    if hasattr(obj, 'to_dict') and callable(getattr(obj, 'to_dict')):
-        return obj.to_dict()
-    
-    # dataclass对象
+        return obj.value, True
+    to_dict = getattr(obj, 'to_dict', None)
+    if callable(to_dict):
+        return to_dict(), True
     if is_dataclass(obj):
-        return safe_serialize(asdict(obj))
-    
-    # 字典类型
+        return asdict(obj), False
     if isinstance(obj, dict):
-        return {key: safe_serialize(value) for key, value in obj.items()}
-    
-    # 列表/元组类型
-    if isinstance(obj, (list, tuple)):
-        return [safe_serialize(item) for item in obj]
-    
-    # 集合类型
-    if isinstance(obj, set):
-        return [safe_serialize(item) for item in obj]
-    
-    # 其他对象，尝试使用__dict__
+        return dict(obj), False
+    if isinstance(obj, (list, tuple, set)):
+        return list(obj), False
     if hasattr(obj, '__dict__'):
-        return safe_serialize(obj.__dict__)
-    
+        return obj.__dict__, False
     # 无法序列化的对象，转换为字符串
-    return str(obj)
+    return str(obj), True
+
+
+def safe_serialize(obj: Any) -> Any:
+    """
+    安全序列化对象
+    处理各种Python对象类型，转换为JSON可序列化的格式
+
+    使用显式栈遍历嵌套结构，内置 dict/list/tuple 和基本类型按精确类型直接处理，
+    其他对象由 _convert_object 转换；不修改传入的对象
+    """
+    root: List[Any] = [None]
+    stack = [(root, 0, obj, 0)]
+    while stack:
+        parent, key, value, depth = stack.pop()
+        if depth > _MAX_SERIALIZE_DEPTH:
+            raise RecursionError("序列化的对象嵌套过深，可能存在循环引用")
+        while True:
+            cls = type(value)
+            if cls in _PRIMITIVE_TYPES:
+                parent[key] = value
+                break
+            if cls is dict:
+                # 先按原顺序放入全部键，非基本类型的值稍后填入
+                out = dict.fromkeys(value)
+                parent[key] = out
+                for k, v in value.items():
+                    if type(v) in _PRIMITIVE_TYPES:
+                        out[k] = v
+                    else:
+                        stack.append((out, k, v, depth + 1))
+                break
+            if cls is list or cls is tuple:
+                out = list(value)
+                parent[key] = out
+                for i, v in enumerate(out):
+                    if type(v) not in _PRIMITIVE_TYPES:
+                        stack.append((out, i, v, depth + 1))
+                break
+            value, done = _convert_object(value)
+            if done:
+                parent[key] = value
+                break
+    return root[0]
 
 
 def safe_deserialize(data: Any, target_type: Type[T] = None) -> Any:
@@ -111,17 +149,65 @@ def safe_deserialize(data: Any, target_type: Type[T] = None) -> Any:
     return data
 
 
-def to_json(obj: Any, indent: int = None, ensure_ascii: bool = False) -> str:
+def _json_default(obj: Any) -> Any:
     """
-    将对象转换为JSON字符串
+    编码器回调，只在遇到无法直接编码的对象时调用
+    转换规则与 safe_serialize 一致，但不需要预先遍历整个对象
+    """
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if hasattr(obj, 'to_dict') and callable(getattr(obj, 'to_dict')):
+        return obj.to_dict()
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return asdict(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, '__dict__'):
+        return obj.__dict__
+    return str(obj)
+
+
+def to_json_bytes(obj: Any, indent: int = None, ensure_ascii: bool = False) -> bytes:
+    """
+    将对象转换为UTF-8编码的JSON字节串
+    安装了orjson且参数受支持（ensure_ascii=False，indent为None或2）时使用orjson
     """
     try:
-        serialized = safe_serialize(obj)
-        return json.dumps(serialized, indent=indent, ensure_ascii=ensure_ascii)
+        if _use_orjson and not ensure_ascii and indent in (None, 2):
+            # dataclass 交给回调处理，以便优先使用其 to_dict 输出的字段名
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            try:
+                return orjson.dumps(obj, default=_json_default, option=option)
+            except TypeError:
+                # orjson 不支持的情况（如超过64位的整数）回退到标准库
+                pass
+        return json.dumps(obj, default=_json_default, indent=indent,
+                          ensure_ascii=ensure_ascii).encode('utf-8')
     except Exception as e:
         raise ValueError(f"序列化失败: {e}")
 
 
+def to_json(obj: Any, indent: int = None, ensure_ascii: bool = False) -> str:
+    """
+    将对象转换为JSON字符串
+    """
+    return to_json_bytes(obj, indent=indent, ensure_ascii=ensure_ascii).decode('utf-8')
+
+
+def from_json_bytes(data: Union[bytes, str]) -> Any:
+    """
+    将JSON字节串（或字符串）解析为Python对象，不做类型转换
+    安装了orjson时使用orjson；解析失败抛出 json.JSONDecodeError（orjson 的异常是其子类）
+    """
+    if _use_orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 def from_json(json_str: str, target_type: Type[T] = None) -> Union[Any, T]:
     """
     从JSON字符串反序列化对象
@@ -143,14 +229,14 @@ class JSONEncoder(json.JSONEncoder):
         return safe_serialize(obj)
 
 
-def create_json_response(data: Any, status_code: int = 200, 
-                        indent: int = 2, ensure_ascii: bool = False) -> tuple:
+def create_json_response_bytes(data: Any, status_code: int = 200,
+                               indent: int = 2, ensure_ascii: bool = False) -> tuple:
     """
     创建JSON响应
-    返回 (json_string, status_code)
+    返回 (UTF-8编码的json字节串, status_code)，可直接写入响应体
     """
     try:
-        json_data = to_json(data, indent=indent, ensure_ascii=ensure_ascii)
+        json_data = to_json_bytes(data, indent=indent, ensure_ascii=ensure_ascii)
         return json_data, status_code
     except Exception as e:
         error_data = {
@@ -159,7 +245,17 @@ def create_json_response(data: Any, status_code: int = 200,
             "status": 500
         }
         json_data = json.dumps(error_data, indent=indent, ensure_ascii=ensure_ascii)
-        return json_data, 500
+        return json_data.encode('utf-8'), 500
+
+
+def create_json_response(data: Any, status_code: int = 200, 
+                        indent: int = 2, ensure_ascii: bool = False) -> tuple:
+    """
+    创建JSON响应
+    返回 (json_string, status_code)
+    """
+    json_data, status_code = create_json_response_bytes(data, status_code, indent, ensure_ascii)
+    return json_data.decode('utf-8'), status_code
 
 
 def batch_serialize(objects: List[Any]) -> List[Dict[str, Any]]: